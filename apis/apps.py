@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apis'
+
+    def ready(self):
+        # connect the cache invalidation and sqlite connection receivers and
+        # register the deploy checks
+        from . import checks, database, signals
@@ -0,0 +1,62 @@
+import functools
+import json
+
+from django.http import JsonResponse, QueryDict
+from django.http.multipartparser import MultiPartParser, MultiPartParserError
+from rest_framework import status
+
+# drf's @api_view only wraps sync functions, async_api_view gives the views in
+# the async_*_views modules the parts of it they rely on: the method check,
+# request.data and request.query_params
+
+
+def parse_data(request):
+    # json bodies like drf's JSONParser, form posts fall back to request.POST
+    if request.content_type == "application/json":
+        if not request.body:
+            return {}
+        return json.loads(request.body)
+    if request.method == "POST":
+        return request.POST
+
+    # django fills request.POST for POST only, other methods parse the form
+    # body themselves like drf's FormParser and MultiPartParser
+    if request.content_type == "application/x-www-form-urlencoded":
+        return QueryDict(request.body, encoding=request.encoding)
+    if request.content_type == "multipart/form-data":
+        return MultiPartParser(
+            request.META, request, request.upload_handlers, request.encoding
+        ).parse()[0]
+    return QueryDict()
+
+
+def async_api_view(methods):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapped_view(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse(
+                    {"detail": f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                    headers={"Allow": ", ".join(methods)},
+                )
+
+            try:
+                request.data = parse_data(request)
+            except ValueError as e:
+                return JsonResponse(
+                    {"detail": f"JSON parse error - {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            except MultiPartParserError as e:
+                return JsonResponse(
+                    {"detail": f"Multipart form parse error - {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            request.query_params = request.GET
+
+            return await view(request, *args, **kwargs)
+
+        return wrapped_view
+
+    return decorator
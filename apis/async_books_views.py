@@ -0,0 +1,68 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from .validators import book_validators
+from .async_api import async_api_view
+from .validation import validate
+from .handlers import arespond, respond, books as book_handlers
+from . import suggest
+
+# async versions of the views in books_views.py, mounted under api/v1/async/
+# and meant to be served through asgi.py. both run the handlers in
+# apis/handlers/books.py. the bulk import and the export stay sync only
+
+
+@async_api_view(["POST"])
+@validate(body=book_validators.create_book_validator)
+async def create_book(request, validate_data):
+    return await arespond(book_handlers.create_book, validate_data)
+
+
+@async_api_view(["GET"])
+@validate(query=book_validators.get_books_query_validators)
+async def get_books(request, validate_query):
+    return await arespond(book_handlers.get_books, request, validate_query)
+
+
+@async_api_view(["GET"])
+@validate(query=book_validators.search_books_query_validators)
+async def search_books(request, validate_query):
+    return await arespond(book_handlers.search_books, request, validate_query)
+
+
+@async_api_view(["GET"])
+@validate(query=book_validators.suggest_books_query_validators)
+async def suggest_books(request, validate_query):
+    # only the first request of the process loads the index from the table and
+    # one every few seconds polls for other processes' writes, every other one
+    # is answered in place without a thread
+    if suggest.refresh_due():
+        await sync_to_async(suggest.ensure_current)()
+    return respond(book_handlers.suggest_books(validate_query), JsonResponse)
+
+
+@async_api_view(["GET", "PUT", "DELETE"])
+@validate(
+    path=book_validators.books_actions_validators,
+    query=book_validators.books_actions_query_validators,
+    body=book_validators.update_book_by_id,
+)
+async def books_actions(request, validate_param, validate_query, validate_data):
+    return await arespond(
+        book_handlers.books_actions,
+        request,
+        validate_param,
+        validate_query,
+        validate_data,
+    )
+
+
+@async_api_view(["GET"])
+@validate(path=book_validators.books_actions_validators)
+async def book_borrow_summary(request, validate_param):
+    return await arespond(book_handlers.book_borrow_summary, validate_param)
+
+
+@async_api_view(["GET"])
+@validate(query=book_validators.books_borrow_summary_validators)
+async def books_borrow_summary(request, validate_query):
+    return await arespond(book_handlers.books_borrow_summary, validate_query)
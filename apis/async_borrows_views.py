@@ -0,0 +1,31 @@
+from .validators import borrow_validators
+from .async_api import async_api_view
+from .validation import validate
+from .handlers import arespond, borrows as borrow_handlers
+
+# async versions of the views in borrows_views.py, mounted under api/v1/async/
+# and meant to be served through asgi.py. both run the handlers in
+# apis/handlers/borrows.py. the batch endpoint and the export stay sync only
+
+
+@async_api_view(["POST"])
+@validate(body=borrow_validators.create_borrow_validators)
+async def create_borrow(request, validate_data):
+    return await arespond(borrow_handlers.create_borrow, validate_data)
+
+
+@async_api_view(["GET"])
+@validate(query=borrow_validators.get_borrows_validator)
+async def get_borrows(request, validate_query):
+    return await arespond(borrow_handlers.get_borrows, request, validate_query)
+
+
+@async_api_view(["GET", "PUT", "DELETE"])
+@validate(
+    path=borrow_validators.borrow_actions_validators,
+    query=borrow_validators.borrow_actions_query_validators,
+)
+async def borrow_actions(request, validate_param, validate_query):
+    return await arespond(
+        borrow_handlers.borrow_actions, request, validate_param, validate_query
+    )
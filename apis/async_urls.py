@@ -0,0 +1,43 @@
+from django.urls import path
+from . import async_users_views, async_books_views, async_borrows_views
+
+# the async views, same paths as urls.py under api/v1/async/. the imports and
+# the borrow batch are cpu and write heavy and only exist on the sync routes
+
+urlpatterns = [
+    # users urls
+    # create user
+    path("users", async_users_views.create_user),
+    # update membership status
+    path("users/membership/<uuid:id>", async_users_views.update_membership),
+    # get a list of users
+    path("users/q", async_users_views.get_users),
+    # user action using an id
+    path("users/<uuid:id>", async_users_views.user_actions),
+    # borrow counts of many users at once, ?ids=<uuid>,<uuid>
+    path("users/borrow-summary", async_users_views.users_borrow_summary),
+    # active, returned and overdue borrow counts of a user
+    path("users/<uuid:id>/borrow-summary", async_users_views.user_borrow_summary),
+    # books urls
+    # create book
+    path("books", async_books_views.create_book),
+    # get a list of books through query filtering
+    path("books/q", async_books_views.get_books),
+    # ranked full text search over book and author names, ?q=
+    path("books/search", async_books_views.search_books),
+    # book and author names starting with ?prefix=, for a search box
+    path("books/suggest", async_books_views.suggest_books),
+    # books actions by id
+    path("books/<uuid:id>", async_books_views.books_actions),
+    # borrow counts of many books at once, ?ids=<uuid>,<uuid>
+    path("books/borrow-summary", async_books_views.books_borrow_summary),
+    # outstanding, returned and overdue loans of a book
+    path("books/<uuid:id>/borrow-summary", async_books_views.book_borrow_summary),
+    # borrow url
+    # route for creating a borrow
+    path("borrows", async_borrows_views.create_borrow),
+    # get a list of borrows based on queries
+    path("borrows/q", async_borrows_views.get_borrows),
+    # borrow actions using the id url parameter
+    path("borrows/<uuid:id>", async_borrows_views.borrow_actions),
+]
@@ -0,0 +1,68 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from .validators import user_validators
+from .async_api import async_api_view
+from .validation import validate
+from .handlers import arespond, internal_error, respond, users as user_handlers
+from . import passwords
+
+# async versions of the views in users_views.py, mounted under api/v1/async/
+# and meant to be served through asgi.py. both run the handlers in
+# apis/handlers/users.py. the bulk import and the export stay sync only
+
+
+@async_api_view(["POST"])
+@validate(body=user_validators.create_user_validator)
+async def create_user(request, validate_data):
+    # check duplicate values exists
+    duplicate = await sync_to_async(user_handlers.duplicate_user)(validate_data)
+    if duplicate is not None:
+        return respond(duplicate, JsonResponse)
+
+    try:
+        # password hashing, the event loop keeps serving while the pool hashes
+        hashed_password = await passwords.ahash_password(validate_data.password)
+    except Exception:
+        return respond(internal_error(), JsonResponse)
+
+    return await arespond(user_handlers.insert_user, validate_data, hashed_password)
+
+
+@async_api_view(["PUT"])
+@validate(path=user_validators.update_membership_validator)
+async def update_membership(request, validate_param):
+    return await arespond(user_handlers.update_membership, validate_param)
+
+
+@async_api_view(["GET"])
+@validate(query=user_validators.get_users)
+async def get_users(request, validate_query):
+    return await arespond(user_handlers.get_users, request, validate_query)
+
+
+@async_api_view(["GET", "PUT", "DELETE"])
+@validate(
+    path=user_validators.update_membership_validator,
+    query=user_validators.user_actions_query_validator,
+    body=user_validators.UpdateUser,
+)
+async def user_actions(request, validate_param, validate_query, validate_data):
+    return await arespond(
+        user_handlers.user_actions,
+        request,
+        validate_param,
+        validate_query,
+        validate_data,
+    )
+
+
+@async_api_view(["GET"])
+@validate(path=user_validators.update_membership_validator)
+async def user_borrow_summary(request, validate_param):
+    return await arespond(user_handlers.user_borrow_summary, validate_param)
+
+
+@async_api_view(["GET"])
+@validate(query=user_validators.users_borrow_summary_validator)
+async def users_borrow_summary(request, validate_query):
+    return await arespond(user_handlers.users_borrow_summary, validate_query)
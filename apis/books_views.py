@@ -2,17 +2,38 @@ from rest_framework.decorators import api_view
 from pydantic import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import StreamingHttpResponse
 from .validators import book_validators
-from books.models import Book
-from .serializers.serializers import BookSerializer
-from borrows.models import Borrow
+from .validation import validate
+from .serializers.rows import book_rows
+from .handlers import respond, books as book_handlers
+from . import exporters, importers, queries
+
+# rejected rows listed in an import response
+MAX_REPORTED_REJECTIONS = 1000
+
+
+@api_view(["POST"])
+@validate(body=book_validators.create_book_validator)
+def create_book(request, validate_data):
+    return respond(book_handlers.create_book(validate_data))
 
 
 @api_view(["POST"])
-def create_book(request):
+def import_books(request):
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response(
+            {"status": "error", "message": "No file has been uploaded."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     try:
-        # req data validation
-        validate_data = book_validators.create_book_validator(**request.data)
+        # validate the format, guessed from the file name when not given
+        format_raw = (
+            request.data.get("format") or upload.name.rsplit(".", 1)[-1].lower()
+        )
+        validate_data = book_validators.import_books_validator(format=format_raw)
     except ValidationError as e:
         return Response(
             {
@@ -23,25 +44,30 @@ def create_book(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-        # check if a book with this name already exists
-    if Book.objects.filter(book_name=validate_data.book_name).exists():
-        return Response(
-            {"status": "error", "message": "A book with this name already exists."},
-            status=status.HTTP_409_CONFLICT,
-        )
+    # keep the response bounded, the counts still cover every row
+    rejections = []
+
+    def on_reject(number, errors):
+        if len(rejections) < MAX_REPORTED_REJECTIONS:
+            rejections.append({"row": number, "errors": errors})
 
     try:
-        # create the book
-        Book.objects.create(
-            book_name=validate_data.book_name,
-            author_name=validate_data.author_name,
-            category=validate_data.category,
-            quantity=validate_data.quantity,
+        # the upload is read line by line, large files are spooled to disk
+        imported, rejected = importers.import_books(
+            importers.iter_rows(upload, validate_data.format), on_reject=on_reject
         )
 
         return Response(
-            {"status": "success", "message": "A book has been created."},
-            status=status.HTTP_201_CREATED,
+            {
+                "status": "success",
+                "message": f"{imported} books have been imported.",
+                "data": {
+                    "imported": imported,
+                    "rejected": rejected,
+                    "rejections": rejections,
+                },
+            },
+            status=status.HTTP_200_OK,
         )
     except Exception:
         return Response(
@@ -51,161 +77,60 @@ def create_book(request):
 
 
 @api_view(["GET"])
-def get_books(request):
-    try:
-        # validate the queries
-        category_raw_query = request.query_params.get("category")
-        author_name_raw_query = request.query_params.get("author_name")
-        limit_raw_query = request.query_params.get("limit") or 10
-        offset_raw_query = request.query_params.get("offset") or 0
-
-        validate_query = book_validators.get_books_query_validators(
-            category=category_raw_query,
-            author_name=author_name_raw_query,
-            limit=limit_raw_query,
-            offset=offset_raw_query,
-        )
-
-    except ValidationError as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Failed in type validation.",
-                "errors": e.errors(),
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+@validate(query=book_validators.get_books_query_validators)
+def get_books(request, validate_query):
+    return respond(book_handlers.get_books(request, validate_query))
 
-    try:
-        # get data based on query and return it
-        filters = {}
 
-        if validate_query.author_name is not None:
-            filters["author_name"] = validate_query.author_name
+@api_view(["GET"])
+@validate(query=book_validators.search_books_query_validators)
+def search_books(request, validate_query):
+    return respond(book_handlers.search_books(request, validate_query))
 
-        if validate_query.category is not None:
-            filters["category"] = validate_query.category
 
-        book_data = Book.objects.filter(**filters)[
-            validate_query.offset : validate_query.offset + validate_query.limit
-        ]
+@api_view(["GET"])
+@validate(query=book_validators.suggest_books_query_validators)
+def suggest_books(request, validate_query):
+    return respond(book_handlers.suggest_books(validate_query))
 
-        # serialize the data
-        serialized_books_data = BookSerializer(book_data, many=True)
 
-        return Response(
-            {
-                "status": "success",
-                "message": "Books data have been fetched.",
-                "data": serialized_books_data.data,
-            },
-            status=status.HTTP_200_OK,
-        )
+@api_view(["GET"])
+@validate(query=book_validators.export_books_validator)
+def export_books(request, validate_query):
+    # stream every matching book in a stable order, one chunk at a time
+    books = queries.books_export_queryset(validate_query)
 
-    except Exception as e:
-        return Response(
-            {"status": "error", "message": "Internal server error"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    response = StreamingHttpResponse(
+        exporters.iter_export(books, book_rows, validate_query.format),
+        content_type=exporters.CONTENT_TYPES[validate_query.format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="books.{validate_query.format}"'
+    )
+    return response
 
 
 @api_view(["GET", "PUT", "DELETE"])
-def books_actions(request, id):
-    try:
-        # validate the param
-        validate_data = book_validators.books_actions_validators(id=id)
-    except ValidationError as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Failed in type validation.",
-                "errors": e.errors(),
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    try:
-        # check if book exists
-        found_book = Book.objects.get(id=validate_data.id)
-    except Book.DoesNotExist:
-        return Response(
-            {"status": "error", "message": "No books were found with this id."},
-            status=status.HTTP_404_NOT_FOUND,
+@validate(
+    path=book_validators.books_actions_validators,
+    query=book_validators.books_actions_query_validators,
+    body=book_validators.update_book_by_id,
+)
+def books_actions(request, validate_param, validate_query, validate_data):
+    return respond(
+        book_handlers.books_actions(
+            request, validate_param, validate_query, validate_data
         )
-    if request.method == "GET":
-        try:
-            # serialize the data and send back to user
-            serialized_book_data = BookSerializer(found_book)
-            return Response(
-                {
-                    "status": "success",
-                    "message": "Book data has been fetched.",
-                    "data": serialized_book_data.data,
-                },
-                status=status.HTTP_200_OK,
-            )
-        except Exception:
-            return Response(
-                {"status": "error", "message": "Internal server error."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-
-    elif request.method == "PUT":
-        # validate quantity
-        try:
-            validate_data_update = book_validators.update_book_by_id(**request.data)
-        except ValidationError as e:
-            return Response(
-                {
-                    "status": "error",
-                    "message": "Failed in type validation.",
-                    "errors": e.errors(),
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # if the quantity is the same
-        if found_book.quantity == validate_data_update.quantity:
-            return Response(
-                {"status": "error", "message": "No changes found in the quantity."},
-                status=status.HTTP_409_CONFLICT,
-            )
-
-        try:
-            # update the books
-            found_book.quantity = validate_data_update.quantity
-            found_book.save()
-
-            return Response(
-                {"status": "success", "message": "Book has been updated."},
-                status=status.HTTP_200_OK,
-            )
-        except Exception:
-            return Response(
-                {"status": "error", "message": "Internal server error."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-    elif request.method == "DELETE":
-        # check if the books has some borrowed books
-        found_borrows_by_book = Borrow.objects.filter(book_id=found_book.id)
-        if len(found_borrows_by_book) > 0:
-            return Response(
-                {
-                    "status": "error",
-                    "message": f"Books has borrowed {len(found_borrows_by_book)} times.",
-                },
-                status=status.HTTP_409_CONFLICT,
-            )
-
-        try:
-            # delete the book
-            Book.objects.filter(id=found_book.id).delete()
-
-            return Response(
-                {"status": "success", "message": "Book has been deleted."},
-                status=status.HTTP_200_OK,
-            )
-        except Exception:
-            return Response(
-                {"status": "error", "message": "Internal server error."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+    )
+
+
+@api_view(["GET"])
+@validate(path=book_validators.books_actions_validators)
+def book_borrow_summary(request, validate_param):
+    return respond(book_handlers.book_borrow_summary(validate_param))
+
+
+@api_view(["GET"])
+@validate(query=book_validators.books_borrow_summary_validators)
+def books_borrow_summary(request, validate_query):
+    return respond(book_handlers.books_borrow_summary(validate_query))
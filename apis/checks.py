@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import connections
+
+from . import search
+
+# the caches behind apis/object_cache.py and apis/response_cache.py are
+# invalidated by the process that writes, so every process must read the same
+# entries, as well as the recent write noted by apis/replicas.py. a locmem cache
+# keeps its entries inside one process
+
+PROCESS_LOCAL_BACKENDS = {"django.core.cache.backends.locmem.LocMemCache"}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    for setting in [
+        "OBJECT_CACHE_ALIAS",
+        "RESPONSE_CACHE_ALIAS",
+        "REPLICA_CACHE_ALIAS",
+    ]:
+        backend = settings.CACHES[getattr(settings, setting)]["BACKEND"]
+        if backend in PROCESS_LOCAL_BACKENDS:
+            errors.append(
+                Error(
+                    f"{setting} uses {backend}, which each worker process keeps "
+                    "on its own.",
+                    hint=(
+                        "Set REDIS_URL, or point the alias at a cache every "
+                        "worker shares, so a write invalidates the cached "
+                        "entries of all of them."
+                    ),
+                    id="apis.E001",
+                )
+            )
+    return errors
+
+
+# the book search index follows books_book through triggers, which sqlite drops
+# when a migration rebuilds the table. database checks run with `migrate`, the
+# test runner and `manage.py check --database default`
+
+
+@register(Tags.database)
+def check_book_search_triggers(app_configs, databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        if connections[alias].vendor != "sqlite":
+            continue
+        for name in search.missing_triggers(connections[alias]):
+            errors.append(
+                Error(
+                    f"The book search trigger {name} is missing from the "
+                    f"{alias} database, book writes no longer reach the index.",
+                    hint=(
+                        "A migration that rebuilds books_book drops it. Run "
+                        "`manage.py rebuild_book_search` to create the triggers "
+                        "again and reindex the books."
+                    ),
+                    id="apis.E002",
+                )
+            )
+    return errors
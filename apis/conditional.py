@@ -0,0 +1,115 @@
+import hashlib
+import operator
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import object_cache
+
+# ETag and Last-Modified support for the GET endpoints, validators are derived
+# from updated_at values alone so a 304 can be answered before any row is
+# loaded in full or serialized
+
+# the columns a row's version is read from, responses that inline related rows
+# add the updated_at of each of those
+VERSION_COLUMNS = ("id", "updated_at")
+
+
+def is_conditional(request):
+    return (
+        "HTTP_IF_NONE_MATCH" in request.META or "HTTP_IF_MODIFIED_SINCE" in request.META
+    )
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(usedforsecurity=False)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return quote_etag(digest.hexdigest())
+
+
+def detail_etag(request, instance_id, updated_at, *related):
+    # the query string is part of it since it can change the representation,
+    # related holds the versions of any rows inlined into the response
+    return make_etag(
+        request.path,
+        request.META.get("QUERY_STRING", ""),
+        instance_id,
+        updated_at,
+        *related,
+    )
+
+
+def page_etag(request, rows, has_more=False):
+    # a page changes when any of its (id, updated_at) pairs does, when rows
+    # move in or out of it and when a next page appears or goes away
+    return make_etag(request.get_full_path(), has_more, *rows)
+
+
+def rows_etag(request, rows, has_more=False, columns=VERSION_COLUMNS):
+    version = operator.attrgetter(*columns)
+    return page_etag(request, [version(row) for row in rows], has_more)
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Return a 304 response when the request validators match, otherwise None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def detail_not_modified(request, model, id):
+    """
+    Answer a conditional GET for one row from its updated_at only, read from
+    the object cache or with a single-column query. Returns None when the
+    request is not conditional, the row is missing or it has changed.
+    """
+    if not is_conditional(request):
+        return None
+
+    cached = object_cache.peek(model, id)
+    if cached is not None:
+        updated_at = cached.updated_at
+    else:
+        updated_at = (
+            model.objects.filter(id=id).values_list("updated_at", flat=True).first()
+        )
+        if updated_at is None:
+            return None
+
+    return not_modified(request, detail_etag(request, id, updated_at), updated_at)
+
+
+def page_not_modified(request, page, limit=None, columns=VERSION_COLUMNS):
+    """
+    Answer a conditional GET for a list page by reading only the (id,
+    updated_at) pairs of ``page``, the sliced queryset the view is about to
+    load. In cursor mode pass the keyset queryset sliced to ``limit + 1`` and
+    the ``limit``, the extra row only tells whether there is a next page.
+    Pages with related rows inlined pass their ``columns`` as well.
+    """
+    if not is_conditional(request):
+        return None
+
+    rows = list(page.values_list(*columns))
+    return _rows_not_modified(request, rows, limit)
+
+
+def _rows_not_modified(request, rows, limit):
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+
+    return not_modified(request, page_etag(request, rows, has_more))
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
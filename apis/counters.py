@@ -0,0 +1,130 @@
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from books.models import Book
+from borrows.models import Borrow
+from users.models import User
+from . import stock
+
+# active_borrow_count and total_borrow_count of books and users, changed with
+# single UPDATEs by the same transactions that create, return and delete the
+# borrows, so a guard reads one row instead of counting borrows. instances in
+# the object cache may hold old counts, read them from the database.
+# rebuild_borrow_counters fixes counters after borrows changed some other way
+
+# the borrow foreign key of each counted model
+COUNTED = {Book: "book_id", User: "user_id"}
+
+
+def add_borrows(book_id, user_id, active=0, total=0):
+    # move the counters of one book and one user by the same amounts
+    changes = {}
+    if active:
+        changes["active_borrow_count"] = F("active_borrow_count") + active
+    if total:
+        changes["total_borrow_count"] = F("total_borrow_count") + total
+    if changes:
+        Book.objects.filter(id=book_id).update(**changes)
+        User.objects.filter(id=user_id).update(**changes)
+
+
+def borrows_created(borrows):
+    # new, unreturned borrows, one UPDATE per distinct book and user
+    for model, counts in [
+        (Book, Counter(borrow.book_id_id for borrow in borrows)),
+        (User, Counter(borrow.user_id_id for borrow in borrows)),
+    ]:
+        for id, count in counts.items():
+            model.objects.filter(id=id).update(
+                active_borrow_count=F("active_borrow_count") + count,
+                total_borrow_count=F("total_borrow_count") + count,
+            )
+
+
+def delete_borrow(borrow_id):
+    """
+    Delete a borrow and take it off the counters of its book and user, an open
+    borrow puts its copy back on the shelf. Returns False when the borrow was
+    already gone.
+    """
+    with transaction.atomic():
+        borrow = (
+            Borrow.objects.select_for_update()
+            .filter(id=borrow_id)
+            .values_list("book_id", "user_id", "is_returned", named=True)
+            .first()
+        )
+        if borrow is None:
+            return False
+
+        Borrow.objects.filter(id=borrow_id).delete()
+        add_borrows(
+            borrow.book_id,
+            borrow.user_id,
+            active=0 if borrow.is_returned else -1,
+            total=-1,
+        )
+        if not borrow.is_returned:
+            stock.put_back_copies(borrow.book_id)
+    return True
+
+
+def total_borrows(model, id):
+    return (
+        model.objects.filter(id=id).values_list("total_borrow_count", flat=True).first()
+        or 0
+    )
+
+
+def counted_borrows(model):
+    # the counters as the borrow table has them, one index lookup per row
+    foreign_key = COUNTED[model]
+
+    def counted(**filters):
+        return Coalesce(
+            models.Subquery(
+                Borrow.objects.filter(**{foreign_key: models.OuterRef("id")}, **filters)
+                .values(foreign_key)
+                .annotate(count=models.Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+
+    return {
+        "active_borrow_count": counted(is_returned=False),
+        "total_borrow_count": counted(),
+    }
+
+
+def drifted(model):
+    """
+    The rows of ``model`` whose stored counters differ from a fresh count, as
+    (id, stored active, stored total, counted active, counted total) rows.
+    """
+    counted = counted_borrows(model)
+    return (
+        model.objects.annotate(
+            counted_active=counted["active_borrow_count"],
+            counted_total=counted["total_borrow_count"],
+        )
+        .exclude(
+            active_borrow_count=F("counted_active"),
+            total_borrow_count=F("counted_total"),
+        )
+        .values_list(
+            "id",
+            "active_borrow_count",
+            "total_borrow_count",
+            "counted_active",
+            "counted_total",
+        )
+    )
+
+
+def rebuild(model):
+    # recount every row in one UPDATE, returns the number of rows written
+    return model.objects.update(**counted_borrows(model))
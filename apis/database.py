@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# every new sqlite connection gets the PRAGMAs of settings.SQLITE_PRAGMAS, most
+# of them only hold for the connection that ran them. with CONN_MAX_AGE set a
+# connection lives on between requests, so this runs once per thread rather
+# than once per request. under ASGI CONN_MAX_AGE is 0 and it runs per request
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
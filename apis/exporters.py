@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from .importers import chunked
+
+# rows fetched from the database and written to the response at a time, the
+# export holds one chunk in memory whatever the size of the table
+DEFAULT_CHUNK_SIZE = 2000
+
+# rows in the first chunk, small so the client gets bytes without waiting for
+# a full chunk to be fetched and encoded
+FIRST_CHUNK_SIZE = 100
+
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def export_chunks(rows, chunk_size):
+    rows = iter(rows)
+    if first_chunk := list(islice(rows, FIRST_CHUNK_SIZE)):
+        yield first_chunk
+    yield from chunked(rows, chunk_size)
+
+
+def iter_export(queryset, rows, format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield ``queryset`` as csv or jsonl text, one string per chunk of rows, with
+    the fields and conversions of the ``rows`` serializer. Rows are read with
+    a chunked database cursor as plain tuples, so memory stays flat, and the
+    first chunk is kept small so bytes go out right away.
+    """
+    values = queryset.values_list(*rows.fields).iterator(chunk_size=chunk_size)
+
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # the header goes out before the query runs
+        writer.writerow(rows.fields)
+        yield buffer.getvalue()
+
+        for chunk in export_chunks(values, chunk_size):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(row.values() for row in rows.serialize(chunk))
+            yield buffer.getvalue()
+        return
+
+    for chunk in export_chunks(values, chunk_size):
+        yield "".join(json.dumps(row) + "\n" for row in rows.serialize(chunk))
@@ -0,0 +1,68 @@
+from typing import Annotated, Literal
+
+from django.db.models import Count, Q
+from pydantic import BeforeValidator
+
+from books.models import BOOK_CATEGORIES
+from . import queries, response_cache
+from .relations import comma_separated
+
+# ?facets=category,author_name on the book list counts the books and the books
+# in stock per value of each field, one GROUP BY per facet. a facet applies the
+# other filters of the query but not its own, so every value shows what picking
+# it would return. counts are cached under the books generation like the lists
+
+FACET_FIELDS = ("category", "author_name")
+
+# authors with the most books listed in the author_name facet
+AUTHOR_FACET_LIMIT = 50
+
+Facets = Annotated[
+    frozenset[Literal["category", "author_name"]], BeforeValidator(comma_separated)
+]
+
+
+def facet_queryset(validate_query, field):
+    # (value, count, in_stock) rows with the filter on ``field`` left out
+    books = queries.books_queryset(validate_query.model_copy(update={field: None}))
+    rows = (
+        books.values_list(field)
+        .annotate(count=Count("id"), in_stock=Count("id", filter=Q(quantity__gt=0)))
+        .order_by()
+    )
+    if field == "author_name":
+        rows = rows.order_by("-count", "author_name")[:AUTHOR_FACET_LIMIT]
+    return rows
+
+
+def facet_counts(validate_query, field):
+    rows = list(facet_queryset(validate_query, field))
+    if field == "category":
+        # every category in the order of BOOK_CATEGORIES, zero when empty
+        counts = {value: (count, in_stock) for value, count, in_stock in rows}
+        rows = [
+            (category, *counts.get(category, (0, 0))) for category, _ in BOOK_CATEGORIES
+        ]
+    return [
+        {"value": value, "count": count, "in_stock": in_stock}
+        for value, count, in_stock in rows
+    ]
+
+
+def book_facets(validate_query):
+    """
+    The facets asked for in ``validate_query.facets``, from the cache when the
+    same filters were counted since the last book write.
+    """
+    cache_key = response_cache.books_list_key(
+        "facets", validate_query, include={"category", "author_name", "facets"}
+    )
+    facets = response_cache.load(cache_key)
+    if facets is None:
+        facets = {
+            field: facet_counts(validate_query, field)
+            for field in FACET_FIELDS
+            if field in validate_query.facets
+        }
+        response_cache.store(cache_key, facets)
+    return facets
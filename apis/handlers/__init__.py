@@ -0,0 +1,49 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBase, JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from .. import conditional
+
+# the endpoints served both by the drf views and the async views under
+# api/v1/async/ are written once here. a handler takes the validated input and
+# returns a Reply, the sync view turns it into a drf Response and the async
+# view runs the handler with one sync_to_async call and turns it into a
+# JsonResponse. transactions are bound to a thread, so a whole handler runs in
+# the same one
+
+
+class Reply:
+    def __init__(self, body, status=status.HTTP_200_OK, etag=None, last_modified=None):
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+def success(message, status=status.HTTP_200_OK, **fields):
+    return Reply({"status": "success", "message": message, **fields}, status)
+
+
+def error(message, status):
+    return Reply({"status": "error", "message": message}, status)
+
+
+def internal_error(message="Internal server error."):
+    return error(message, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def respond(reply, response_class=Response):
+    # a 304 from apis/conditional.py is already a response
+    if isinstance(reply, HttpResponseBase):
+        return reply
+
+    response = response_class(reply.body, status=reply.status)
+    if reply.etag is not None:
+        conditional.set_validators(response, reply.etag, reply.last_modified)
+    return response
+
+
+async def arespond(handler, *args):
+    # the async views' way of calling a handler
+    return respond(await sync_to_async(handler)(*args), JsonResponse)
@@ -0,0 +1,248 @@
+from rest_framework import status
+
+from books.models import Book
+from ..serializers.serializers import BookSerializer
+from ..serializers.rows import book_rows
+from ..pagination import keyset_page
+from .. import (
+    conditional,
+    counters,
+    facets,
+    object_cache,
+    queries,
+    relations,
+    response_cache,
+    search,
+    suggest,
+)
+from . import Reply, error, internal_error, success
+
+
+def create_book(validate_data):
+    # check if a book with this name already exists
+    if Book.objects.filter(book_name=validate_data.book_name).exists():
+        return error("A book with this name already exists.", status.HTTP_409_CONFLICT)
+
+    try:
+        # create the book
+        Book.objects.create(
+            book_name=validate_data.book_name,
+            author_name=validate_data.author_name,
+            category=validate_data.category,
+            quantity=validate_data.quantity,
+        )
+
+        return success("A book has been created.", status.HTTP_201_CREATED)
+    except Exception:
+        return internal_error()
+
+
+def get_books(request, validate_query):
+    try:
+        # the cache key changes with every book write, so it doubles as the
+        # ETag and a matching client gets a 304 without touching the database
+        cache_key = response_cache.books_list_key("list", validate_query)
+        etag = conditional.make_etag(cache_key)
+        not_modified = conditional.not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        # serve the same query from the cache until a book changes
+        cached_body = response_cache.load(cache_key)
+        if cached_body is not None:
+            return Reply(cached_body, etag=etag)
+
+        # get data based on query and return it
+        books = queries.books_queryset(validate_query)
+
+        # cursor mode seeks on (created_at, id) instead of skipping rows
+        if validate_query.cursor is not None:
+            book_data, next_cursor = keyset_page(
+                book_rows.values(books),
+                "created_at",
+                validate_query.cursor,
+                validate_query.limit,
+            )
+
+            body = {
+                "status": "success",
+                "message": "Books data have been fetched.",
+                "data": book_rows.serialize(book_data),
+                "next_cursor": next_cursor,
+            }
+        else:
+            book_data = book_rows.values(books)[
+                validate_query.offset : validate_query.offset + validate_query.limit
+            ]
+
+            body = {
+                "status": "success",
+                "message": "Books data have been fetched.",
+                "data": book_rows.serialize(book_data),
+            }
+
+        # counts per category and author next to the page, cached on their own
+        # so paging through the list reuses them
+        if validate_query.facets:
+            body["facets"] = facets.book_facets(validate_query)
+
+        response_cache.store(cache_key, body)
+        return Reply(body, etag=etag)
+    except Exception:
+        return internal_error("Internal server error")
+
+
+def search_books(request, validate_query):
+    try:
+        # cached and tagged like the book list, a book write moves both on
+        cache_key = response_cache.books_list_key("search", validate_query)
+        etag = conditional.make_etag(cache_key)
+        not_modified = conditional.not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        cached_body = response_cache.load(cache_key)
+        if cached_body is not None:
+            return Reply(cached_body, etag=etag)
+
+        # ranked matches from the full text index, best first
+        book_data = search.search_books(
+            validate_query.q, validate_query.limit, validate_query.offset
+        )
+
+        body = {
+            "status": "success",
+            "message": "Books data have been fetched.",
+            "data": book_rows.serialize(book_data),
+        }
+
+        response_cache.store(cache_key, body)
+        return Reply(body, etag=etag)
+    except Exception:
+        return internal_error()
+
+
+def suggest_books(validate_query):
+    try:
+        # answered from the in-process prefix index, no query once it is loaded
+        suggestions = suggest.suggestions(validate_query.prefix, validate_query.limit)
+
+        return success("Suggestions have been fetched.", data=suggestions)
+    except Exception:
+        return internal_error()
+
+
+def books_actions(request, validate_param, validate_query, validate_data):
+    include = validate_query.include if request.method == "GET" else frozenset()
+
+    # answer conditional GETs from updated_at before loading the book
+    if request.method == "GET" and not include:
+        not_modified = conditional.detail_not_modified(request, Book, validate_param.id)
+        if not_modified is not None:
+            return not_modified
+
+    try:
+        # check if book exists
+        if include:
+            # the open borrows come with one prefetch query, past the object cache
+            found_book = relations.prefetch_included(Book.objects, include).get(
+                id=validate_param.id
+            )
+        else:
+            found_book = object_cache.get_object(Book, validate_param.id)
+    except Book.DoesNotExist:
+        return error("No books were found with this id.", status.HTTP_404_NOT_FOUND)
+
+    if request.method == "GET":
+        try:
+            etag = conditional.detail_etag(
+                request,
+                found_book.id,
+                found_book.updated_at,
+                *relations.included_versions(found_book, include),
+            )
+            # included rows can drop out of the response without anything
+            # getting newer, so those responses go without Last-Modified
+            last_modified = None if include else found_book.updated_at
+            if include:
+                not_modified = conditional.not_modified(request, etag)
+                if not_modified is not None:
+                    return not_modified
+
+            # serialize the data and send back to user
+            serialized_book_data = relations.add_included(
+                BookSerializer(found_book).data, found_book, include
+            )
+
+            return Reply(
+                {
+                    "status": "success",
+                    "message": "Book data has been fetched.",
+                    "data": serialized_book_data,
+                },
+                etag=etag,
+                last_modified=last_modified,
+            )
+        except Exception:
+            return internal_error()
+
+    elif request.method == "PUT":
+        # if the quantity is the same
+        if found_book.quantity == validate_data.quantity:
+            return error("No changes found in the quantity.", status.HTTP_409_CONFLICT)
+
+        try:
+            # update the books
+            found_book.quantity = validate_data.quantity
+            found_book.save(update_fields=["quantity", "updated_at"])
+
+            return success("Book has been updated.")
+        except Exception:
+            return internal_error()
+    elif request.method == "DELETE":
+        # check if the book has been borrowed, its deletion would take the
+        # borrow history with it. the counter is one row read
+        borrow_count = counters.total_borrows(Book, found_book.id)
+        if borrow_count > 0:
+            return error(
+                f"Books has borrowed {borrow_count} times.", status.HTTP_409_CONFLICT
+            )
+
+        try:
+            # delete the book, post_delete drops it from the object cache
+            Book.objects.filter(id=found_book.id).delete()
+
+            return success("Book has been deleted.")
+        except Exception:
+            return internal_error()
+
+
+def book_borrow_summary(validate_param):
+    try:
+        # one grouped query, no row back means no such book
+        summary = queries.borrow_summaries(Book, [validate_param.id]).first()
+    except Exception:
+        return internal_error()
+
+    if summary is None:
+        return error("No books were found with this id.", status.HTTP_404_NOT_FOUND)
+
+    return success("Borrow summary has been fetched.", data=summary)
+
+
+def books_borrow_summary(validate_query):
+    try:
+        # every requested book in the same grouped query, answered in the
+        # order asked for with repeated ids once
+        ids = list(dict.fromkeys(validate_query.ids))
+        summaries = {
+            summary["id"]: summary for summary in queries.borrow_summaries(Book, ids)
+        }
+
+        return success(
+            "Borrow summaries have been fetched.",
+            data=[summaries[id] for id in ids if id in summaries],
+            not_found=[id for id in ids if id not in summaries],
+        )
+    except Exception:
+        return internal_error()
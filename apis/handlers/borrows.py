@@ -0,0 +1,220 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from borrows.models import Borrow
+from books.models import Book
+from users.models import User
+from ..serializers.rows import expanded_borrow_rows
+from ..pagination import keyset_page, keyset_queryset
+from .. import conditional, counters, object_cache, queries, relations, stock
+from . import Reply, error, internal_error, success
+
+
+def create_borrow(validate_data):
+    try:
+        with transaction.atomic():
+            # take a copy off the shelf, the update only matches while stock lasts
+            if not stock.take_copies(validate_data.book_id):
+                # nothing was updated, tell a missing book apart from no stock
+                if not Book.objects.filter(id=validate_data.book_id).exists():
+                    return error(
+                        "No book found with this id", status.HTTP_404_NOT_FOUND
+                    )
+
+                return error("Not enough books in stock.", status.HTTP_409_CONFLICT)
+
+            # check if user exists with the id, undo the stock change if not
+            if not User.objects.filter(id=validate_data.user_id).exists():
+                transaction.set_rollback(True)
+                return error("No user found with this id", status.HTTP_404_NOT_FOUND)
+
+            # create a borrow
+            Borrow.objects.create(
+                user_id_id=validate_data.user_id,
+                book_id_id=validate_data.book_id,
+                to_return_at=validate_data.to_return_at.isoformat(),
+            )
+            counters.add_borrows(
+                validate_data.book_id, validate_data.user_id, active=1, total=1
+            )
+
+        return success("Borrow has been created.")
+    except Exception:
+        return internal_error()
+
+
+def get_borrows(request, validate_query):
+    try:
+        # get the data serialize and then return to the client, ?expand= joins
+        # the book and user columns into the same query
+        rows = expanded_borrow_rows(validate_query.expand)
+        borrows = rows.values(queries.borrows_queryset(validate_query))
+
+        # cursor mode seeks on (borrowed_at, id) instead of skipping rows
+        if validate_query.cursor is not None:
+            # answer conditional requests from (id, updated_at) pairs alone
+            not_modified = conditional.page_not_modified(
+                request,
+                keyset_queryset(borrows, "borrowed_at", validate_query.cursor)[
+                    : validate_query.limit + 1
+                ],
+                validate_query.limit,
+                columns=rows.version_columns,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            found_borrows, next_cursor = keyset_page(
+                borrows,
+                "borrowed_at",
+                validate_query.cursor,
+                validate_query.limit,
+            )
+
+            return Reply(
+                {
+                    "status": "success",
+                    "message": "Borrow data has been fetched.",
+                    "data": rows.serialize(found_borrows),
+                    "next_cursor": next_cursor,
+                },
+                etag=conditional.rows_etag(
+                    request,
+                    found_borrows,
+                    next_cursor is not None,
+                    columns=rows.version_columns,
+                ),
+            )
+
+        found_borrows = borrows[
+            validate_query.offset : validate_query.offset + validate_query.limit
+        ]
+
+        not_modified = conditional.page_not_modified(
+            request, found_borrows, columns=rows.version_columns
+        )
+        if not_modified is not None:
+            return not_modified
+
+        return Reply(
+            {
+                "status": "success",
+                "message": "Borrow data has been fetched.",
+                "data": rows.serialize(found_borrows),
+            },
+            etag=conditional.rows_etag(
+                request, found_borrows, columns=rows.version_columns
+            ),
+        )
+    except Exception:
+        return internal_error()
+
+
+def toggle_returned(found_borrow):
+    # update to true if its none type and set to none if set to true
+    with transaction.atomic():
+        if found_borrow.is_returned == False:
+            # flip the flag only if no concurrent request already did
+            if not Borrow.objects.filter(id=found_borrow.id, is_returned=False).update(
+                is_returned=True, updated_at=timezone.now()
+            ):
+                return error(
+                    "Borrow has already been returned.", status.HTTP_409_CONFLICT
+                )
+
+            object_cache.invalidate(Borrow, found_borrow.id)
+
+            # the returned copy goes back on the shelf
+            stock.put_back_copies(found_borrow.book_id_id)
+            counters.add_borrows(
+                found_borrow.book_id_id, found_borrow.user_id_id, active=-1
+            )
+
+            return success("Borrowed book has been returned.")
+        elif found_borrow.is_returned == True:
+            if not Borrow.objects.filter(id=found_borrow.id, is_returned=True).update(
+                is_returned=False, updated_at=timezone.now()
+            ):
+                return error(
+                    "Borrow has already been marked as not returned.",
+                    status.HTTP_409_CONFLICT,
+                )
+
+            object_cache.invalidate(Borrow, found_borrow.id)
+
+            # the copy leaves the shelf again, only if one is left
+            if not stock.take_copies(found_borrow.book_id_id):
+                transaction.set_rollback(True)
+                return error("Not enough books in stock.", status.HTTP_409_CONFLICT)
+            counters.add_borrows(
+                found_borrow.book_id_id, found_borrow.user_id_id, active=1
+            )
+
+            return success("Borrowed book has not been returned.")
+        else:
+            return internal_error()
+
+
+def borrow_actions(request, validate_param, validate_query):
+    expand = validate_query.expand if request.method == "GET" else frozenset()
+
+    # answer conditional GETs from updated_at before loading the borrow
+    if request.method == "GET" and not expand:
+        not_modified = conditional.detail_not_modified(
+            request, Borrow, validate_param.id
+        )
+        if not_modified is not None:
+            return not_modified
+
+    try:
+        if expand:
+            # the book and user come in the same query, past the object cache
+            found_borrow = relations.select_expanded(Borrow.objects, expand).get(
+                id=validate_param.id
+            )
+        else:
+            found_borrow = object_cache.get_object(Borrow, validate_param.id)
+    except Borrow.DoesNotExist:
+        return error("No borrow found with the id provided.", status.HTTP_404_NOT_FOUND)
+
+    if request.method == "GET":
+        # serialize data and then send back to the user
+        try:
+            related = relations.expanded_versions(found_borrow, expand)
+            etag = conditional.detail_etag(
+                request, found_borrow.id, found_borrow.updated_at, *related
+            )
+            # the newest of the borrow and the rows inlined into it
+            last_modified = max(
+                [found_borrow.updated_at] + [updated_at for _, updated_at in related]
+            )
+            if expand:
+                not_modified = conditional.not_modified(request, etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+
+            return Reply(
+                {
+                    "status": "success",
+                    "message": "Borrow data has been fetched.",
+                    "data": relations.expanded_data(found_borrow, expand),
+                },
+                etag=etag,
+                last_modified=last_modified,
+            )
+        except Exception:
+            return internal_error()
+    elif request.method == "PUT":
+        try:
+            return toggle_returned(found_borrow)
+        except Exception:
+            return internal_error()
+    elif request.method == "DELETE":
+        # delete the found borrow, its book and user counters go down with it
+        try:
+            counters.delete_borrow(found_borrow.id)
+
+            return success("Borrow has been returned.")
+        except Exception:
+            return internal_error()
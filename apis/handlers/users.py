@@ -0,0 +1,262 @@
+from rest_framework import status
+
+from users.models import User
+from ..serializers import serializers
+from ..serializers.rows import user_rows
+from ..pagination import keyset_page, keyset_queryset
+from .. import conditional, counters, object_cache, passwords, queries, relations
+from . import Reply, error, internal_error, success
+
+
+def duplicate_user(validate_data):
+    # the conflict a new user would run into, None when there is none
+    if User.objects.filter(email=validate_data.email).exists():
+        return error("User with this email already exists.", status.HTTP_409_CONFLICT)
+
+    if User.objects.filter(phone_number=validate_data.phone_number).exists():
+        return error(
+            "User with this phone number already exists.", status.HTTP_409_CONFLICT
+        )
+
+    return None
+
+
+def insert_user(validate_data, hashed_password):
+    try:
+        # create the user
+        User.objects.create(
+            name=validate_data.name,
+            email=validate_data.email,
+            phone_number=validate_data.phone_number,
+            password=hashed_password,
+            membership_paid=validate_data.membership_paid,
+        )
+
+        return success("User has been created", status.HTTP_201_CREATED)
+    except Exception:
+        return internal_error()
+
+
+def create_user(validate_data):
+    # check duplicate values exists
+    duplicate = duplicate_user(validate_data)
+    if duplicate is not None:
+        return duplicate
+
+    try:
+        # password hashing, in this thread since it would wait for a pool anyway
+        hashed_password = passwords.make_password(validate_data.password)
+    except Exception:
+        return internal_error()
+
+    return insert_user(validate_data, hashed_password)
+
+
+def update_membership(validate_param):
+    try:
+        # find the user
+        found_user = object_cache.get_object(User, validate_param.id)
+    except User.DoesNotExist:
+        return error("No user has been found.", status.HTTP_404_NOT_FOUND)
+
+    # if the membership is already paid
+    if found_user.membership_paid == True:
+        return error("Membership is already paid.", status.HTTP_409_CONFLICT)
+
+    try:
+        # update the user
+        found_user.membership_paid = True
+        found_user.save(update_fields=["membership_paid", "updated_at"])
+
+        return success("User has been updated.")
+    except Exception:
+        return internal_error()
+
+
+def get_users(request, validate_query):
+    try:
+        # get data based on query and return data
+        users = user_rows.values(queries.users_queryset(validate_query))
+
+        # cursor mode seeks on (created_at, id) instead of skipping rows
+        if validate_query.cursor is not None:
+            descending = validate_query.filter_by == "last_to_add"
+
+            # answer conditional requests from (id, updated_at) pairs alone
+            not_modified = conditional.page_not_modified(
+                request,
+                keyset_queryset(users, "created_at", validate_query.cursor, descending)[
+                    : validate_query.limit + 1
+                ],
+                validate_query.limit,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            user_data, next_cursor = keyset_page(
+                users,
+                "created_at",
+                validate_query.cursor,
+                validate_query.limit,
+                descending=descending,
+            )
+
+            return Reply(
+                {
+                    "status": "success",
+                    "message": "User data has been fetched.",
+                    "data": user_rows.serialize(user_data),
+                    "next_cursor": next_cursor,
+                },
+                etag=conditional.rows_etag(request, user_data, next_cursor is not None),
+            )
+
+        user_data = users[
+            validate_query.offset : validate_query.offset + validate_query.limit
+        ]
+
+        not_modified = conditional.page_not_modified(request, user_data)
+        if not_modified is not None:
+            return not_modified
+
+        return Reply(
+            {
+                "status": "success",
+                "message": "User data has been fetched.",
+                "data": user_rows.serialize(user_data),
+            },
+            etag=conditional.rows_etag(request, user_data),
+        )
+    except Exception:
+        return internal_error()
+
+
+def user_actions(request, validate_param, validate_query, validate_data):
+    include = validate_query.include if request.method == "GET" else frozenset()
+
+    # answer conditional GETs from updated_at before loading the user
+    if request.method == "GET" and not include:
+        not_modified = conditional.detail_not_modified(request, User, validate_param.id)
+        if not_modified is not None:
+            return not_modified
+
+    try:
+        # check if the data exists
+        if include:
+            # the open borrows come with one prefetch query, past the object cache
+            found_user = relations.prefetch_included(User.objects, include).get(
+                id=validate_param.id
+            )
+        else:
+            found_user = object_cache.get_object(User, validate_param.id)
+    except User.DoesNotExist:
+        return error("No user found with this id.", status.HTTP_404_NOT_FOUND)
+
+    # if the method was get
+    if request.method == "GET":
+        try:
+            etag = conditional.detail_etag(
+                request,
+                found_user.id,
+                found_user.updated_at,
+                *relations.included_versions(found_user, include),
+            )
+            # included rows can drop out of the response without anything
+            # getting newer, so those responses go without Last-Modified
+            last_modified = None if include else found_user.updated_at
+            if include:
+                not_modified = conditional.not_modified(request, etag)
+                if not_modified is not None:
+                    return not_modified
+
+            # serialize and then send the data
+            serialized_data = relations.add_included(
+                serializers.UserSerializer(found_user).data, found_user, include
+            )
+
+            return Reply(
+                {
+                    "status": "success",
+                    "message": "User data has been fetched.",
+                    "data": serialized_data,
+                },
+                etag=etag,
+                last_modified=last_modified,
+            )
+        except Exception:
+            return internal_error()
+
+    # if the method was put
+    elif request.method == "PUT":
+        # check if the data is same as the current values
+        if (
+            (found_user.name == validate_data.name)
+            or (found_user.email == validate_data.email)
+            or (found_user.phone_number == validate_data.phone_number)
+        ):
+            return error("No changes found to update.", status.HTTP_409_CONFLICT)
+
+        # check for duplicate values
+        duplicate = duplicate_user(validate_data)
+        if duplicate is not None:
+            return duplicate
+
+        try:
+            # update the user
+            found_user.name = validate_data.name
+            found_user.email = validate_data.email
+            found_user.phone_number = validate_data.phone_number
+
+            found_user.save(
+                update_fields=["name", "email", "phone_number", "updated_at"]
+            )
+            return success("User has been updated.")
+        except Exception:
+            return internal_error()
+    # if the method is a delete
+    elif request.method == "DELETE":
+        # check if the user has some borrowed books, read from the counter
+        borrow_count = counters.total_borrows(User, found_user.id)
+        if borrow_count > 0:
+            return error(
+                f"User has {borrow_count} books borrowed.", status.HTTP_409_CONFLICT
+            )
+
+        try:
+            # delete the user, post_delete drops it from the object cache
+            User.objects.filter(id=found_user.id).delete()
+
+            return success("User has been deleted.")
+        except Exception:
+            return internal_error()
+
+
+def user_borrow_summary(validate_param):
+    try:
+        # one grouped query, no row back means no such user
+        summary = queries.borrow_summaries(User, [validate_param.id]).first()
+    except Exception:
+        return internal_error()
+
+    if summary is None:
+        return error("No user found with this id.", status.HTTP_404_NOT_FOUND)
+
+    return success("Borrow summary has been fetched.", data=summary)
+
+
+def users_borrow_summary(validate_query):
+    try:
+        # every requested user in the same grouped query, answered in the
+        # order asked for with repeated ids once
+        ids = list(dict.fromkeys(validate_query.ids))
+        summaries = {
+            summary["id"]: summary for summary in queries.borrow_summaries(User, ids)
+        }
+
+        return success(
+            "Borrow summaries have been fetched.",
+            data=[summaries[id] for id in ids if id in summaries],
+            not_found=[id for id in ids if id not in summaries],
+        )
+    except Exception:
+        return internal_error()
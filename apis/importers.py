@@ -0,0 +1,327 @@
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from pydantic import ValidationError
+
+from books.models import Book
+from users.models import User
+from . import response_cache, suggest
+from .passwords import hash_password
+from .validators import book_validators, user_validators
+
+# rows per duplicate lookup and insert, sqlite allows at most 999 parameters
+# per statement on older builds so an IN query must stay below that
+DEFAULT_CHUNK_SIZE = 500
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def decode_lines(lines, bad_lines):
+    # a line that is not utf-8 is decoded with replacement characters and its
+    # number kept in bad_lines, so its row is rejected instead of the error
+    # stopping the import halfway through
+    for number, line in enumerate(lines, start=1):
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            bad_lines.add(number)
+            yield line.decode("utf-8", errors="replace")
+
+
+def encoding_error(number):
+    return [{"type": "encoding_invalid", "msg": f"Line {number} is not UTF-8."}]
+
+
+def iter_rows(lines, format):
+    """
+    Yield (row number, row, errors) from an iterable of encoded lines, one row
+    at a time so the whole file is never held in memory. ``errors`` is set
+    when the line could not be decoded or parsed.
+    """
+    bad_lines = set()
+    lines = decode_lines(lines, bad_lines)
+
+    if format == "csv":
+        yield from iter_csv_rows(lines, bad_lines)
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if number in bad_lines:
+            yield number, None, encoding_error(number)
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, [{"type": "json_invalid", "msg": str(e)}]
+
+
+def iter_csv_rows(lines, bad_lines):
+    # a quoted value may span lines, so a row is rejected when any of the
+    # lines read for it was not utf-8
+    reader = csv.DictReader(lines)
+    last_line = 0
+    number = 0
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            number += 1
+            last_line = reader.line_num
+            yield number, None, [{"type": "csv_invalid", "msg": str(e)}]
+            continue
+
+        number += 1
+        read_lines = range(last_line + 1, reader.line_num + 1)
+        last_line = reader.line_num
+        bad_line = next((line for line in read_lines if line in bad_lines), None)
+        if bad_line is not None:
+            yield number, None, encoding_error(bad_line)
+        else:
+            yield number, row, None
+
+
+def chunked(rows, chunk_size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def import_books(rows, chunk_size=DEFAULT_CHUNK_SIZE, on_reject=None):
+    """
+    Validate and insert books from ``iter_rows`` output chunk by chunk. Each
+    chunk costs one IN query for the duplicate check and one bulk insert.
+    Rejected rows are passed to ``on_reject(row number, errors)``. Returns the
+    number of imported and rejected rows.
+    """
+    imported = 0
+    rejected = 0
+
+    def reject(number, errors):
+        nonlocal rejected
+        rejected += 1
+        if on_reject is not None:
+            on_reject(number, errors)
+
+    for chunk in chunked(rows, chunk_size):
+        valid_rows = []
+        for number, row, errors in chunk:
+            if errors is not None:
+                reject(number, errors)
+                continue
+            try:
+                valid_rows.append(
+                    (number, book_validators.create_book_validator.model_validate(row))
+                )
+            except ValidationError as e:
+                reject(number, e.errors(include_url=False))
+
+        # one query finds every name of the chunk that is already taken,
+        # earlier chunks are inserted by now so they are caught here too
+        existing_names = set(
+            Book.objects.filter(
+                book_name__in={book.book_name for _, book in valid_rows}
+            ).values_list("book_name", flat=True)
+        )
+
+        new_books = []
+        for number, book in valid_rows:
+            if book.book_name in existing_names:
+                reject(
+                    number,
+                    [
+                        {
+                            "type": "duplicate",
+                            "msg": "A book with this name already exists.",
+                        }
+                    ],
+                )
+                continue
+
+            # names repeated inside the file count as duplicates as well
+            existing_names.add(book.book_name)
+            new_books.append(
+                Book(
+                    book_name=book.book_name,
+                    author_name=book.author_name,
+                    category=book.category,
+                    quantity=book.quantity,
+                )
+            )
+
+        with transaction.atomic():
+            Book.objects.bulk_create(new_books, batch_size=chunk_size)
+            # bulk_create sends no signals, cached book lists go stale and the
+            # suggest index takes the new names here
+            if new_books:
+                response_cache.bump_books_generation()
+                suggest.books_saved(new_books)
+        imported += len(new_books)
+
+    return imported, rejected
+
+
+def new_pool(workers):
+    # spawned workers only import apis.passwords, not a copy of this process
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def pool_workers():
+    return settings.USER_IMPORT_WORKERS or os.cpu_count() or 1
+
+
+def get_pool():
+    """
+    The hashing pool shared by every import of this process, started on first
+    use. Concurrent uploads queue their hashes on the same USER_IMPORT_WORKERS
+    processes instead of each starting a pool of their own.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = new_pool(pool_workers())
+    return _pool
+
+
+def drop_pool(pool):
+    # a pool with a dead worker fails every later map, the next import
+    # starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def import_users(
+    rows, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, on_reject=None, on_chunk=None
+):
+    """
+    Validate and insert users from ``iter_rows`` output chunk by chunk. Email
+    and phone number uniqueness is checked with one IN query each per chunk,
+    and the bcrypt hashing of a chunk is spread over the shared pool of
+    ``get_pool``, or a pool of ``workers`` processes for this import alone
+    when given, since it dominates the cost of every row. Rejected rows are
+    passed to ``on_reject(row number, errors)`` and ``on_chunk(imported,
+    rejected)`` is called after every inserted chunk. Returns the number of
+    imported and rejected rows.
+    """
+    imported = 0
+    rejected = 0
+    if workers is None:
+        workers = pool_workers()
+        pool_context = contextlib.nullcontext(get_pool())
+    else:
+        pool_context = new_pool(workers)
+
+    def reject(number, errors):
+        nonlocal rejected
+        rejected += 1
+        if on_reject is not None:
+            on_reject(number, errors)
+
+    with pool_context as pool:
+        for chunk in chunked(rows, chunk_size):
+            valid_rows = []
+            for number, row, errors in chunk:
+                if errors is not None:
+                    reject(number, errors)
+                    continue
+                try:
+                    valid_rows.append(
+                        (
+                            number,
+                            user_validators.create_user_validator.model_validate(row),
+                        )
+                    )
+                except ValidationError as e:
+                    # leave the inputs out, they would echo plaintext passwords
+                    reject(number, e.errors(include_url=False, include_input=False))
+
+            # one query per unique column for the whole chunk
+            existing_emails = set(
+                User.objects.filter(
+                    email__in={user.email for _, user in valid_rows}
+                ).values_list("email", flat=True)
+            )
+            existing_phone_numbers = set(
+                User.objects.filter(
+                    phone_number__in={user.phone_number for _, user in valid_rows}
+                ).values_list("phone_number", flat=True)
+            )
+
+            new_rows = []
+            for number, user in valid_rows:
+                if user.email in existing_emails:
+                    reject(
+                        number,
+                        [
+                            {
+                                "type": "duplicate",
+                                "msg": "User with this email already exists.",
+                            }
+                        ],
+                    )
+                elif user.phone_number in existing_phone_numbers:
+                    reject(
+                        number,
+                        [
+                            {
+                                "type": "duplicate",
+                                "msg": "User with this phone number already exists.",
+                            }
+                        ],
+                    )
+                else:
+                    # values repeated inside the file count as duplicates as well
+                    existing_emails.add(user.email)
+                    existing_phone_numbers.add(user.phone_number)
+                    new_rows.append(user)
+
+            try:
+                hashed_passwords = list(
+                    pool.map(
+                        partial(hash_password, rounds=settings.BCRYPT_ROUNDS),
+                        [user.password for user in new_rows],
+                        chunksize=max(1, len(new_rows) // (workers * 4)),
+                    )
+                )
+            except BrokenProcessPool:
+                drop_pool(pool)
+                raise
+            new_users = [
+                User(
+                    name=user.name,
+                    email=user.email,
+                    phone_number=user.phone_number,
+                    password=hashed_password,
+                    membership_paid=user.membership_paid,
+                )
+                for user, hashed_password in zip(new_rows, hashed_passwords)
+            ]
+
+            with transaction.atomic():
+                User.objects.bulk_create(new_users, batch_size=chunk_size)
+            imported += len(new_users)
+
+            if on_chunk is not None:
+                on_chunk(imported, rejected)
+
+    return imported, rejected
@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default sqlite database over every replica file, standing in "
+        "for replication when testing the replica router locally."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas are set up, see SQLITE_REPLICA.")
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only sqlite databases can be copied.")
+
+        # the backup api copies a consistent snapshot while the primary is in use
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            name = connections[alias].settings_dict["NAME"]
+            target = sqlite3.connect(name)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"{alias}: copied to {name}.")
+
+        self.stdout.write(self.style.SUCCESS("Every replica is up to date."))
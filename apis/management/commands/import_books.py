@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apis import importers
+
+
+class Command(BaseCommand):
+    help = "Stream books from a CSV or JSONL file into the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or JSONL file.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format, guessed from the extension when left out.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=importers.DEFAULT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        format = options["format"] or path.suffix.lstrip(".").lower()
+        if format not in ("csv", "jsonl"):
+            raise CommandError("Cannot tell the file format, pass --format.")
+
+        def on_reject(number, errors):
+            messages = "; ".join(error["msg"] for error in errors)
+            self.stderr.write(f"row {number} rejected: {messages}")
+
+        try:
+            with path.open("rb") as file:
+                imported, rejected = importers.import_books(
+                    importers.iter_rows(file, format),
+                    chunk_size=options["chunk_size"],
+                    on_reject=on_reject,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{imported} books imported, {rejected} rows rejected.")
+        )
@@ -0,0 +1,67 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apis import importers
+
+
+class Command(BaseCommand):
+    help = "Import users from a CSV or JSONL file, hashing passwords in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or JSONL file.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format, guessed from the extension when left out.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=importers.DEFAULT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.USER_IMPORT_WORKERS,
+            help="Password hashing processes, defaults to USER_IMPORT_WORKERS.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        format = options["format"] or path.suffix.lstrip(".").lower()
+        if format not in ("csv", "jsonl"):
+            raise CommandError("Cannot tell the file format, pass --format.")
+
+        started_at = time.perf_counter()
+
+        def on_reject(number, errors):
+            messages = "; ".join(error["msg"] for error in errors)
+            self.stderr.write(f"row {number} rejected: {messages}")
+
+        def on_chunk(imported, rejected):
+            elapsed = time.perf_counter() - started_at
+            self.stdout.write(
+                f"{imported} imported, {rejected} rejected, "
+                f"{imported / elapsed:.0f} users/s"
+            )
+
+        try:
+            with path.open("rb") as file:
+                imported, rejected = importers.import_users(
+                    importers.iter_rows(file, format),
+                    chunk_size=options["chunk_size"],
+                    workers=options["workers"],
+                    on_reject=on_reject,
+                    on_chunk=on_chunk if options["verbosity"] > 1 else None,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{imported} users imported, {rejected} rows rejected "
+                f"in {elapsed:.1f}s ({imported / elapsed:.0f} users/s)."
+            )
+        )
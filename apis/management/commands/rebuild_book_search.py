@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apis import search
+
+
+class Command(BaseCommand):
+    help = "Create the search triggers again and reindex every book."
+
+    def handle(self, *args, **options):
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("The book search index is rebuilt."))
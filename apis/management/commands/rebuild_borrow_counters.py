@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apis import counters
+
+
+class Command(BaseCommand):
+    help = "Recount the active and total borrow counters of every book and user."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report counters that differ from the borrow table, "
+            "and fail if any do.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model in counters.COUNTED:
+            name = model._meta.verbose_name_plural
+            rows = list(counters.drifted(model))
+            drifted += len(rows)
+            for id, active, total, counted_active, counted_total in rows:
+                self.stderr.write(
+                    f"{model._meta.verbose_name} {id}: active {active} != "
+                    f"{counted_active} or total {total} != {counted_total}"
+                )
+
+            if not options["verify"]:
+                updated = counters.rebuild(model)
+                self.stdout.write(f"{updated} {name} recounted.")
+
+        if options["verify"]:
+            if drifted:
+                raise CommandError(f"{drifted} counters differ from the borrows.")
+            self.stdout.write(self.style.SUCCESS("Every counter matches."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"{drifted} drifted counters have been fixed.")
+            )
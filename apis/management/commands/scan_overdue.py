@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from apis import overdue
+
+
+class Command(BaseCommand):
+    help = "Record the borrows that went overdue since the last scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=overdue.DEFAULT_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--rescan",
+            action="store_true",
+            help="Start over from the oldest open borrow instead of the watermark.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rescan"]:
+            overdue.reset_watermark()
+
+        batch_number = 0
+        total_seconds = 0.0
+
+        def on_batch(checked, recorded, seconds):
+            nonlocal batch_number, total_seconds
+            batch_number += 1
+            total_seconds += seconds
+            self.stdout.write(
+                f"batch {batch_number}: {checked} checked, {recorded} recorded "
+                f"in {seconds * 1000:.1f} ms"
+            )
+
+        checked, recorded = overdue.scan_overdue(
+            batch_size=options["batch_size"], on_batch=on_batch
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{checked} overdue borrows checked, {recorded} recorded, "
+                f"{batch_number} batches in {total_seconds:.3f}s."
+            )
+        )
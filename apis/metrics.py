@@ -0,0 +1,368 @@
+import bisect
+import contextlib
+import ipaddress
+import threading
+import time
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import object_cache, suggest, validation
+
+# per route, method and status: a latency histogram, the number of sql queries
+# and the time spent in them, served in the prometheus text format at /metrics
+# to staff users and the addresses in METRICS_ALLOWED_IPS.
+# each thread counts into its own dict without a lock, a scrape adds the dicts
+# of every thread up. streamed responses like the exports are timed, and their
+# queries counted, until the stream has been sent
+
+# upper bounds in seconds of the latency buckets, +Inf comes on top
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# positions in a series list, the bucket counts follow
+COUNT, SECONDS, QUERIES, SQL_SECONDS, FIRST_BUCKET = range(5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_local = threading.local()
+# the series dict of every live thread that served a request, a thread's dict
+# is added into _retired_series when the thread ends so the counters never go
+# down and the list stays as long as the thread pool
+_thread_series = []
+_retired_series = {}
+_thread_series_lock = threading.Lock()
+
+
+class ThreadSeries:
+    # the thread-local handle of a series dict, dropped with the thread
+    def __init__(self, series):
+        self.series = series
+
+
+def add_series(total, series):
+    # list() copies the items in one step, the owning thread may be adding
+    for key, values in list(series.items()):
+        current = total.get(key)
+        if current is None:
+            total[key] = list(values)
+        else:
+            for position, value in enumerate(values):
+                current[position] += value
+
+
+def retire(series):
+    # the thread is gone, nothing writes into its series anymore
+    with _thread_series_lock:
+        _thread_series.remove(series)
+        add_series(_retired_series, series)
+
+
+def thread_series():
+    holder = getattr(_local, "holder", None)
+    if holder is None:
+        series = {}
+        holder = _local.holder = ThreadSeries(series)
+        # the finalizer keeps the dict and not the handle, so the handle goes
+        # away with the thread's locals and the dict is retired then
+        weakref.finalize(holder, retire, series)
+        with _thread_series_lock:
+            _thread_series.append(series)
+    return holder.series
+
+
+def record(route, method, status, seconds, queries, sql_seconds):
+    series = thread_series()
+    key = (route, method, status)
+    values = series.get(key)
+    if values is None:
+        values = series[key] = [0, 0.0, 0, 0.0] + [0] * (len(BUCKETS) + 1)
+    values[COUNT] += 1
+    values[SECONDS] += seconds
+    values[QUERIES] += queries
+    values[SQL_SECONDS] += sql_seconds
+    values[FIRST_BUCKET + bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+def merged_series():
+    # under the lock so a thread retiring meanwhile is counted exactly once
+    merged = {}
+    with _thread_series_lock:
+        add_series(merged, _retired_series)
+        for series in _thread_series:
+            add_series(merged, series)
+    return merged
+
+
+class SQLTally:
+    # an execute_wrapper counting the queries of one request and their time
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started_at
+
+    def wrapping(self):
+        # on every database alias, replicas included
+        stack = contextlib.ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+class TalliedStream:
+    """
+    The chunks of a streamed response, read under ``tally`` chunk by chunk in
+    whichever thread the server reads them. ``on_close`` runs once, when the
+    stream is used up or the server closes it early.
+    """
+
+    def __init__(self, chunks, tally, on_close):
+        self.chunks = iter(chunks)
+        self.tally = tally
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            with self.tally.wrapping():
+                return next(self.chunks)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+
+
+def route_of(request):
+    # the url pattern, so every id of a detail route counts as one route
+    if request.resolver_match is None:
+        return "unmatched"
+    return request.resolver_match.route
+
+
+class MetricsMiddleware:
+    # works for the sync and the async views alike
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        tally = SQLTally()
+        started_at = time.perf_counter()
+        with tally.wrapping():
+            response = self.get_response(request)
+        return self.finish(request, response, started_at, tally)
+
+    async def __acall__(self, request):
+        # the async orm queries through the connections of the thread that
+        # runs this request's sync code, so the wrappers go on those
+        tally = SQLTally()
+        started_at = time.perf_counter()
+        with await sync_to_async(tally.wrapping)():
+            response = await self.get_response(request)
+        return self.finish(request, response, started_at, tally)
+
+    def finish(self, request, response, started_at, tally):
+        def record_request():
+            record(
+                route_of(request),
+                request.method,
+                response.status_code,
+                time.perf_counter() - started_at,
+                tally.queries,
+                tally.seconds,
+            )
+
+        # a sync stream runs its queries while it is read, after this returns
+        if response.streaming and not response.is_async:
+            response.streaming_content = TalliedStream(
+                response.streaming_content, tally, record_request
+            )
+        else:
+            record_request()
+        return response
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values):
+    return ",".join(f'{name}="{escape(value)}"' for name, value in values.items())
+
+
+def sample(name, value, **label_values):
+    if label_values:
+        return f"{name}{{{labels(**label_values)}}} {value}"
+    return f"{name} {value}"
+
+
+def header(name, kind, help):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+
+
+def request_lines():
+    merged = sorted(merged_series().items())
+
+    lines = header(
+        "http_request_duration_seconds",
+        "histogram",
+        "Time from the request reaching the middleware to its response.",
+    )
+    for (route, method, status), values in merged:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), values[FIRST_BUCKET:]):
+            cumulative += count
+            lines.append(
+                sample(
+                    "http_request_duration_seconds_bucket",
+                    cumulative,
+                    route=route,
+                    method=method,
+                    status=status,
+                    le=bound,
+                )
+            )
+        for suffix, position in [("sum", SECONDS), ("count", COUNT)]:
+            lines.append(
+                sample(
+                    f"http_request_duration_seconds_{suffix}",
+                    values[position],
+                    route=route,
+                    method=method,
+                    status=status,
+                )
+            )
+
+    for name, position, help in [
+        ("http_request_sql_queries_total", QUERIES, "SQL queries run by requests."),
+        (
+            "http_request_sql_seconds_total",
+            SQL_SECONDS,
+            "Time requests spent in SQL queries.",
+        ),
+    ]:
+        lines += header(name, "counter", help)
+        for (route, method, status), values in merged:
+            lines.append(
+                sample(
+                    name, values[position], route=route, method=method, status=status
+                )
+            )
+    return lines
+
+
+def cache_lines():
+    stats = object_cache.stats()
+    lines = header(
+        "bookstore_object_cache_lookups_total",
+        "counter",
+        "Object cache lookups by result.",
+    )
+    for result in ["hits", "misses"]:
+        lines.append(
+            sample("bookstore_object_cache_lookups_total", stats[result], result=result)
+        )
+    return lines
+
+
+def validation_lines():
+    timings = sorted(validation.timings().items())
+    lines = []
+    for name, key, help in [
+        ("bookstore_validation_calls_total", "calls", "Validated requests."),
+        (
+            "bookstore_validation_failures_total",
+            "failures",
+            "Requests rejected by validation.",
+        ),
+        (
+            "bookstore_validation_seconds_total",
+            "seconds",
+            "Time spent validating requests.",
+        ),
+    ]:
+        lines += header(name, "counter", help)
+        for endpoint, timing in timings:
+            lines.append(sample(name, timing[key], endpoint=endpoint))
+    return lines
+
+
+def suggest_lines():
+    stats = suggest.stats()
+    lines = []
+    for name, key, kind, help in [
+        ("bookstore_suggest_keys", "keys", "gauge", "Keys in the prefix index."),
+        (
+            "bookstore_suggest_bytes",
+            "bytes",
+            "gauge",
+            "Estimated memory of the prefix index.",
+        ),
+        (
+            "bookstore_suggest_lookups_total",
+            "lookups",
+            "counter",
+            "Prefix index lookups.",
+        ),
+        (
+            "bookstore_suggest_lookup_seconds_total",
+            "lookup_seconds",
+            "counter",
+            "Time spent in prefix index lookups.",
+        ),
+    ]:
+        lines += header(name, kind, help)
+        lines.append(sample(name, stats[key]))
+    return lines
+
+
+def render():
+    lines = request_lines() + cache_lines() + validation_lines() + suggest_lines()
+    return "\n".join(lines) + "\n"
+
+
+def may_read_metrics(request):
+    # staff users, or clients on METRICS_ALLOWED_IPS like a prometheus scraper
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(allowed.strip(), strict=False)
+        for allowed in settings.METRICS_ALLOWED_IPS
+        if allowed.strip()
+    )
+
+
+def metrics_view(request):
+    if not may_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
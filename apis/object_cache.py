@@ -0,0 +1,66 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import replicas
+
+# read-through cache for single rows looked up by primary key, entries are
+# dropped by the signal receivers in apis/signals.py and by the code paths
+# that change rows with queryset.update()
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _cache():
+    return caches[settings.OBJECT_CACHE_ALIAS]
+
+
+def cache_key(model, id):
+    return f"object:{model._meta.label_lower}:{id}"
+
+
+def get_object(model, id):
+    """
+    Return the ``model`` row with this id from the cache, loading and caching
+    it on a miss. Raises ``model.DoesNotExist`` like ``objects.get`` does,
+    missing rows are not cached.
+    """
+    key = cache_key(model, id)
+    found = _cache().get(key)
+    if found is not None:
+        _count("hits")
+        return found
+
+    _count("misses")
+    found = model.objects.get(id=id)
+    if not replicas.replica_may_lag():
+        _cache().set(key, found, settings.OBJECT_CACHE_TIMEOUT)
+    return found
+
+
+def peek(model, id):
+    # the cached row or None, never touches the database
+    found = _cache().get(cache_key(model, id))
+    if found is not None:
+        _count("hits")
+    return found
+
+
+def invalidate(model, id):
+    # after commit, so a concurrent miss can not cache the row being replaced,
+    # runs right away outside of a transaction
+    key = cache_key(model, id)
+    transaction.on_commit(lambda: _cache().delete(key))
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
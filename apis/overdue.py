@@ -0,0 +1,123 @@
+import time
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from borrows.models import Borrow, OverdueBorrow, OverdueScan
+from .pagination import encode_cursor, keyset_queryset
+
+# borrows checked per query and transaction
+DEFAULT_BATCH_SIZE = 1000
+
+SCAN_NAME = "overdue"
+
+
+def overdue_queryset(now):
+    # open borrows already due, walked in (to_return_at, id) order on borrow_due_idx
+    return Borrow.objects.filter(is_returned=False, to_return_at__lt=now).values_list(
+        "id", "to_return_at", named=True
+    )
+
+
+def changed_queryset(now, scan):
+    # open borrows already due at or behind the watermark whose row changed
+    # since the last scan: reopened after the scan passed them while returned,
+    # or created with a due date it had passed. walked in (updated_at, id)
+    # order on borrow_open_changed_idx
+    behind = Q(to_return_at__lt=scan.last_due_at) | Q(
+        to_return_at=scan.last_due_at, id__lte=scan.last_borrow_id
+    )
+    return Borrow.objects.filter(
+        behind, is_returned=False, to_return_at__lt=now, updated_at__gte=scan.scanned_at
+    ).values_list("id", "to_return_at", "updated_at", named=True)
+
+
+def watermark_cursor(scan):
+    # the keyset position after the last checked borrow, "" for a first run
+    if scan.last_due_at is None:
+        return ""
+    return encode_cursor(scan.last_due_at, scan.last_borrow_id)
+
+
+def reset_watermark(name=SCAN_NAME):
+    OverdueScan.objects.filter(name=name).update(last_due_at=None, last_borrow_id=None)
+
+
+def scan_batches(queryset, sort_field, cursor, batch_size):
+    # batches of queryset in keyset order, starting after cursor
+    while True:
+        batch = list(keyset_queryset(queryset, sort_field, cursor)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+        cursor = encode_cursor(getattr(last, sort_field), last.id)
+
+
+def record_overdue(batch, now):
+    # a borrow is only ever recorded once, also after a reset, in both passes
+    # or when two scans overlap
+    recorded_ids = set(
+        OverdueBorrow.objects.filter(
+            borrow_id__in=[borrow.id for borrow in batch]
+        ).values_list("borrow_id", flat=True)
+    )
+    new_rows = [
+        OverdueBorrow(
+            borrow_id_id=borrow.id, due_at=borrow.to_return_at, detected_at=now
+        )
+        for borrow in batch
+        if borrow.id not in recorded_ids
+    ]
+    OverdueBorrow.objects.bulk_create(new_rows, ignore_conflicts=True)
+    return len(new_rows)
+
+
+def scan_overdue(
+    now=None, batch_size=DEFAULT_BATCH_SIZE, on_batch=None, name=SCAN_NAME
+):
+    """
+    Record the borrows that went overdue since the last scan in OverdueBorrow.
+    Open borrows due before ``now`` are read in index-ordered batches starting
+    after the watermark, so each run only checks borrows that fell due since
+    the previous one. Each batch is recorded and moves the watermark in one
+    transaction, an interrupted scan resumes where it stopped.
+
+    A second pass checks the open borrows behind the watermark that changed
+    since the previous run, a borrow reopened or created after the watermark
+    passed its due date. It starts over when interrupted.
+
+    ``on_batch(checked, recorded, seconds)`` is called after each batch.
+    Returns the (checked, recorded) totals.
+    """
+    now = now or timezone.now()
+    scan, _ = OverdueScan.objects.get_or_create(name=name)
+
+    passes = [(overdue_queryset(now), "to_return_at", watermark_cursor(scan), True)]
+    # nothing is behind the watermark of a first run
+    if scan.scanned_at is not None and scan.last_due_at is not None:
+        passes.append((changed_queryset(now, scan), "updated_at", "", False))
+
+    checked = recorded = 0
+    for queryset, sort_field, cursor, moves_watermark in passes:
+        started_at = time.perf_counter()
+        for batch in scan_batches(queryset, sort_field, cursor, batch_size):
+            last = batch[-1]
+            with transaction.atomic():
+                new_count = record_overdue(batch, now)
+                if moves_watermark:
+                    OverdueScan.objects.filter(name=name).update(
+                        last_due_at=last.to_return_at, last_borrow_id=last.id
+                    )
+
+            checked += len(batch)
+            recorded += new_count
+            if on_batch is not None:
+                on_batch(len(batch), new_count, time.perf_counter() - started_at)
+            started_at = time.perf_counter()
+
+    OverdueScan.objects.filter(name=name).update(scanned_at=now)
+    return checked, recorded
@@ -0,0 +1,90 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Annotated
+
+from django.db.models import Q
+from pydantic import AfterValidator
+from pydantic_core import PydanticCustomError
+
+
+def encode_cursor(sort_value, id):
+    # pack the (sort value, id) pair of the last row into an opaque token
+    payload = json.dumps([sort_value.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    # an empty cursor asks for the first page in cursor mode
+    if cursor == "":
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), uuid.UUID(id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid cursor.")
+
+
+def check_cursor(cursor):
+    try:
+        decode_cursor(cursor)
+    except ValueError:
+        raise PydanticCustomError("cursor_invalid", "Invalid cursor.")
+    return cursor
+
+
+# query parameter type for the validators, rejects tokens we did not issue
+Cursor = Annotated[str, AfterValidator(check_cursor)]
+
+
+def keyset_queryset(queryset, sort_field, cursor, descending=False):
+    # order by (sort_field, id) and seek past the position held in the cursor
+    if descending:
+        queryset = queryset.order_by(f"-{sort_field}", "-id")
+    else:
+        queryset = queryset.order_by(sort_field, "id")
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        sort_value, last_id = position
+        # the range filter lets the database seek on the index, the second
+        # filter breaks ties between rows sharing the same timestamp
+        if descending:
+            queryset = queryset.filter(**{f"{sort_field}__lte": sort_value}).filter(
+                Q(**{f"{sort_field}__lt": sort_value})
+                | Q(**{sort_field: sort_value, "id__lt": last_id})
+            )
+        else:
+            queryset = queryset.filter(**{f"{sort_field}__gte": sort_value}).filter(
+                Q(**{f"{sort_field}__gt": sort_value})
+                | Q(**{sort_field: sort_value, "id__gt": last_id})
+            )
+
+    return queryset
+
+
+def keyset_page(queryset, sort_field, cursor, limit, descending=False):
+    """
+    Return one page of ``queryset`` ordered by (sort_field, id) and the cursor
+    for the next page. Rows are found by seeking past the last seen key instead
+    of counting off an offset, so deep pages cost the same as the first one.
+    """
+    queryset = keyset_queryset(queryset, sort_field, cursor, descending)
+
+    # fetch one extra row to know if there is a next page
+    rows = list(queryset[: limit + 1])
+    return _split_page(rows, sort_field, limit)
+
+
+def _split_page(rows, sort_field, limit):
+    # a page with no rows has no last row to continue from
+    next_cursor = None
+    if 0 < limit < len(rows):
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(getattr(last_row, sort_field), last_row.id)
+
+    return rows, next_cursor
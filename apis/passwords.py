@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+# hash_password stays free of settings access so pool worker processes of the
+# bulk import can load it without configuring django
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hash_password(password, rounds=12):
+    # bcrypt returns ascii bytes, store them as text
+    return bcrypt.hashpw(
+        password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)
+    ).decode("ascii")
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="password-hash",
+                )
+    return _executor
+
+
+def submit_hash(password):
+    """
+    Queue a hash on the shared bounded pool, for the async views. bcrypt
+    releases the GIL, so the pool caps how many cores signups on the event loop
+    can hold at once and the loop keeps serving other requests meanwhile.
+    """
+    return get_executor().submit(hash_password, password, settings.BCRYPT_ROUNDS)
+
+
+def make_password(password):
+    # the sync views hash inline, their request thread would wait on the pool
+    # all the same and the handoff only adds to it
+    return hash_password(password, settings.BCRYPT_ROUNDS)
+
+
+async def ahash_password(password):
+    # await the pooled hash without blocking the event loop
+    return await asyncio.wrap_future(submit_hash(password))
@@ -0,0 +1,91 @@
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from books.models import Book
+from borrows.models import Borrow
+from users.models import User
+
+# list querysets shared by the views, kept in one place so the query plan
+# tests in apis/tests.py explain exactly what the endpoints run
+
+
+def books_queryset(validate_query):
+    filters = {}
+
+    if validate_query.author_name is not None:
+        filters["author_name"] = validate_query.author_name
+
+    if validate_query.category is not None:
+        filters["category"] = validate_query.category
+
+    return Book.objects.filter(**filters)
+
+
+def borrows_queryset(validate_query):
+    filters = {}
+
+    if validate_query.book_id is not None:
+        filters["book_id"] = validate_query.book_id
+
+    if validate_query.user_id is not None:
+        filters["user_id"] = validate_query.user_id
+
+    if validate_query.is_returned is not None and validate_query.is_returned == True:
+        filters["is_returned"] = validate_query.is_returned
+
+    return Borrow.objects.filter(**filters)
+
+
+def users_queryset(validate_query):
+    if validate_query.filter_by == "first_to_add":
+        return User.objects.all().order_by("created_at")
+
+    if validate_query.filter_by == "last_to_add":
+        return User.objects.all().order_by("-created_at")
+
+    if validate_query.filter_by == "unpaid_member":
+        return User.objects.filter(membership_paid=False)
+
+    return User.objects.all()
+
+
+# exports walk the same filters in index order, so rows stream out as they are
+# read instead of after the database has sorted the whole result
+
+
+def books_export_queryset(validate_query):
+    return books_queryset(validate_query).order_by("created_at", "id")
+
+
+def borrows_export_queryset(validate_query):
+    return borrows_queryset(validate_query).order_by("borrowed_at", "id")
+
+
+def users_export_queryset(validate_query):
+    if validate_query.filter_by == "last_to_add":
+        return users_queryset(validate_query).order_by("-created_at", "-id")
+
+    return users_queryset(validate_query).order_by("created_at", "id")
+
+
+def borrow_summaries(model, ids):
+    """
+    Total, active, returned and overdue borrow counts of the books or users in
+    ``ids`` in one grouped query. Total and active come from the counters kept
+    by apis/counters.py, overdue is a conditional aggregate over the borrows.
+    """
+    now = timezone.now()
+    # values() first so the rows are grouped on the id alone
+    return (
+        model.objects.filter(id__in=ids)
+        .values("id")
+        .annotate(
+            total_borrows=F("total_borrow_count"),
+            active_borrows=F("active_borrow_count"),
+            returned_borrows=F("total_borrow_count") - F("active_borrow_count"),
+            overdue_borrows=Count(
+                "borrow",
+                filter=Q(borrow__is_returned=False, borrow__to_return_at__lt=now),
+            ),
+        )
+    )
@@ -0,0 +1,158 @@
+import contextvars
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# GET and HEAD requests read from the aliases in settings.DATABASE_REPLICAS,
+# everything else stays on the primary. a request that writes reads from the
+# primary from then on, and its client keeps reading from the primary for
+# REPLICA_PIN_SECONDS through a cookie, so it sees its own writes while the
+# replicas catch up. queries outside of a request, like management commands,
+# always use the primary
+
+READ_METHODS = {"GET", "HEAD"}
+
+# set on responses to requests that wrote, its presence pins the client
+PIN_COOKIE = "read_primary"
+
+# present in the shared cache while the last write of any process may not
+# have reached the replicas, so one process keeps what a lagging replica
+# answers out of the caches after another one wrote
+RECENT_WRITE_KEY = "replicas:recent_write"
+
+# seconds between two writes of the key by one process, the key outlives
+# REPLICA_PIN_SECONDS by as much so it still covers the writes in between
+RECENT_WRITE_INTERVAL = 1
+
+
+class RequestState:
+    def __init__(self, replica):
+        # the request may read from a replica, until it writes
+        self.replica = replica
+        self.wrote = False
+
+
+_request_state = contextvars.ContextVar("replica_request_state", default=None)
+
+# time.monotonic() of the last write made by this process, and of the last
+# time it set RECENT_WRITE_KEY
+_last_write = 0.0
+_last_shared_write = None
+
+
+def _cache():
+    return caches[settings.REPLICA_CACHE_ALIAS]
+
+
+def note_write():
+    global _last_write, _last_shared_write
+    _last_write = time.monotonic()
+    if not settings.DATABASE_REPLICAS:
+        return
+    if (
+        _last_shared_write is None
+        or _last_write - _last_shared_write >= RECENT_WRITE_INTERVAL
+    ):
+        _last_shared_write = _last_write
+        _cache().set(
+            RECENT_WRITE_KEY,
+            True,
+            settings.REPLICA_PIN_SECONDS + RECENT_WRITE_INTERVAL,
+        )
+
+
+def start_request(request):
+    replica = (
+        bool(settings.DATABASE_REPLICAS)
+        and request.method in READ_METHODS
+        and PIN_COOKIE not in request.COOKIES
+    )
+    state = RequestState(replica)
+    return state, _request_state.set(state)
+
+
+def finish_request(state, token, response):
+    _request_state.reset(token)
+    if state.wrote and settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            PIN_COOKIE,
+            str(int(time.time())),
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def reading_replica():
+    state = _request_state.get()
+    return state is not None and state.replica and not state.wrote
+
+
+def replica_may_lag():
+    # the current request reads from a replica that may not have the last
+    # write of this or another process yet, what it reads should not go into
+    # the caches
+    if not reading_replica():
+        return False
+    if time.monotonic() - _last_write < settings.REPLICA_PIN_SECONDS:
+        return True
+    return _cache().get(RECENT_WRITE_KEY) is not None
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random replica while the current request may use one.
+    Writes always go to the primary and pin the rest of the request to it.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not reading_replica():
+            return None
+        # reads inside a transaction belong with its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema with the data, see copy_to_replicas
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    # works for the sync and the async views alike
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = start_request(request)
+        response = self.get_response(request)
+        return finish_request(state, token, response)
+
+    async def __acall__(self, request):
+        state, token = start_request(request)
+        response = await self.get_response(request)
+        return finish_request(state, token, response)
@@ -0,0 +1,63 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import replicas
+
+# cached get_books responses are keyed by a generation number next to the
+# normalized query, any book write bumps the generation so every cached list
+# goes stale at once without having to find and delete the entries
+
+BOOKS_GENERATION_KEY = "books:generation"
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def books_generation():
+    # start from the clock so a generation lost to eviction is never reused
+    generation = _cache().get(BOOKS_GENERATION_KEY)
+    if generation is None:
+        _cache().add(BOOKS_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = _cache().get(BOOKS_GENERATION_KEY)
+    return generation
+
+
+def bump_books_generation():
+    def bump():
+        try:
+            _cache().incr(BOOKS_GENERATION_KEY)
+        except ValueError:
+            _cache().add(BOOKS_GENERATION_KEY, time.time_ns(), timeout=None)
+
+    # after commit, so a concurrent request can not cache the old rows under
+    # the new generation
+    transaction.on_commit(bump)
+
+
+def books_list_key(name, validate_query, include=None):
+    # ``include`` limits the key to the fields the cached value depends on
+    query = validate_query.model_dump_json(include=include).encode("utf-8")
+    digest = hashlib.md5(query, usedforsecurity=False).hexdigest()
+    key = f"books:{name}:{books_generation()}:{digest}"
+    # a lagging replica may answer with books older than the generation, such
+    # a response gets a key, and so an ETag, that no later request matches
+    if replicas.replica_may_lag():
+        key += f":{uuid.uuid4().hex}"
+    return key
+
+
+def load(key):
+    return _cache().get(key)
+
+
+def store(key, body):
+    # a lagging replica would keep its old rows in the cache for the timeout
+    if replicas.replica_may_lag():
+        return
+    _cache().set(key, body, settings.RESPONSE_CACHE_TIMEOUT)
@@ -0,0 +1,122 @@
+import re
+import uuid
+from typing import Annotated
+
+from django.db import connection, connections, router, transaction
+from pydantic import AfterValidator
+from pydantic_core import PydanticCustomError
+
+from books.models import Book
+from .serializers.rows import book_rows
+
+# ranked book search on the books_book_fts index from books/0005_book_search.
+# a query matches books holding every word of it in the book or author name,
+# the last word also as a prefix so results follow a search box as it is typed
+
+FTS_TABLE = "books_book_fts"
+
+# the triggers of books/0005_book_search that keep the index in step with
+# books_book. sqlite drops them when a migration rebuilds books_book, as an
+# AlterField does, so rebuild_index creates them again and apis/checks.py
+# reports them missing
+TRIGGERS = {
+    "books_book_fts_insert": f"""
+        CREATE TRIGGER books_book_fts_insert AFTER INSERT ON books_book BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, book_name, author_name)
+            VALUES (new.rowid, new.book_name, new.author_name);
+        END
+    """,
+    "books_book_fts_delete": f"""
+        CREATE TRIGGER books_book_fts_delete AFTER DELETE ON books_book BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, book_name, author_name)
+            VALUES ('delete', old.rowid, old.book_name, old.author_name);
+        END
+    """,
+    "books_book_fts_update": f"""
+        CREATE TRIGGER books_book_fts_update
+        AFTER UPDATE OF book_name, author_name ON books_book BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, book_name, author_name)
+            VALUES ('delete', old.rowid, old.book_name, old.author_name);
+            INSERT INTO {FTS_TABLE}(rowid, book_name, author_name)
+            VALUES (new.rowid, new.book_name, new.author_name);
+        END
+    """,
+}
+
+# the page of matches in rank order, joined back to books_book on its rowid
+SEARCH_SQL = f"""
+    SELECT book.id
+    FROM (
+        SELECT rowid, rank FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY rank
+        LIMIT %s OFFSET %s
+    ) AS hit
+    JOIN books_book AS book ON book.rowid = hit.rowid
+    ORDER BY hit.rank
+"""
+
+WORD_RE = re.compile(r"\w+")
+
+
+def match_expression(q):
+    """
+    Turn a search box query into an fts5 MATCH expression. Each word is quoted,
+    so operators and column filters typed by the user are matched as text.
+    """
+    words = WORD_RE.findall(q)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def check_search_query(q):
+    if match_expression(q) is None:
+        raise PydanticCustomError(
+            "search_query_empty", "The search needs at least one word."
+        )
+    return q
+
+
+# query parameter type for the validators, rejects queries with no words
+SearchQuery = Annotated[str, AfterValidator(check_search_query)]
+
+
+def search_book_ids(q, limit, offset):
+    # a raw query, so ask the router where book reads go
+    with connections[router.db_for_read(Book)].cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [match_expression(q), limit, offset])
+        return [uuid.UUID(id) for id, in cursor.fetchall()]
+
+
+def search_books(q, limit, offset):
+    # book_rows of one page of matches, best match first
+    ids = search_book_ids(q, limit, offset)
+    rows = {row.id: row for row in book_rows.values(Book.objects.filter(id__in=ids))}
+    return [rows[id] for id in ids if id in rows]
+
+
+def missing_triggers(connection):
+    # the TRIGGERS not on books_book, none while the index does not exist yet
+    if FTS_TABLE not in connection.introspection.table_names():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND tbl_name = 'books_book'"
+        )
+        found = {name for name, in cursor.fetchall()}
+    return [name for name in TRIGGERS if name not in found]
+
+
+def rebuild_index():
+    """
+    Create the index triggers again and reindex every book from books_book.
+    Needed after a VACUUM moved rowids, or a migration rebuilt books_book and
+    with it dropped the triggers and renumbered the rowids.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name, create_trigger in TRIGGERS.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(create_trigger)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
@@ -7,13 +7,16 @@ from borrows.models import Borrow
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = "__all__"
+        # the password hash never leaves the server, the borrow counters are
+        # internal and read through the borrow summary endpoints
+        exclude = ["password", "active_borrow_count", "total_borrow_count"]
 
 
 class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
-        fields = "__all__"
+        # the borrow counters are internal, see UserSerializer
+        exclude = ["active_borrow_count", "total_borrow_count"]
 
 
 class BorrowSerializer(serializers.ModelSerializer):
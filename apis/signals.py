@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from books.models import Book
+from borrows.models import Borrow
+from users.models import User
+from . import object_cache, response_cache, suggest
+
+
+# queryset.delete() sends post_delete for every row as well, the collector only
+# skips signals for models without receivers, so the filter(...).delete()
+# calls in the views are covered here too
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Borrow)
+@receiver(post_delete, sender=Borrow)
+def invalidate_cached_object(sender, instance, **kwargs):
+    object_cache.invalidate(sender, instance.id)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_books_generation(sender, instance, **kwargs):
+    response_cache.bump_books_generation()
+
+
+@receiver(post_save, sender=Book)
+def index_book_names(sender, instance, update_fields=None, **kwargs):
+    # saves of the quantity or the counters leave the names alone
+    if update_fields is not None and not {"book_name", "author_name"} & set(
+        update_fields
+    ):
+        return
+    suggest.books_saved([instance])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book_names(sender, instance, **kwargs):
+    suggest.book_deleted(instance.id)
@@ -0,0 +1,47 @@
+from django.db.models import F
+from django.utils import timezone
+from books.models import Book
+from . import object_cache, response_cache
+
+# stock changes are single conditional UPDATEs so concurrent borrows and
+# returns never read-modify-write the quantity column, call them inside
+# transaction.atomic() together with the borrow row change they belong to
+
+
+def take_copies(book_id, count=1):
+    # decrement only if enough copies are left, returns True on success
+    updated = Book.objects.filter(id=book_id, quantity__gte=count).update(
+        quantity=F("quantity") - count, updated_at=timezone.now()
+    )
+    if updated:
+        object_cache.invalidate(Book, book_id)
+        response_cache.bump_books_generation()
+    return updated == 1
+
+
+def take_available_copies(book_id, count):
+    """
+    Take up to ``count`` copies, as many as are left, and return how many were
+    taken. A failed decrement means the stock moved since it was read, so read
+    it again and retry with what is left now.
+    """
+    while count > 0:
+        available = (
+            Book.objects.filter(id=book_id).values_list("quantity", flat=True).first()
+        )
+        if available is None or available < 1:
+            return 0
+        granted = min(count, available)
+        if take_copies(book_id, granted):
+            return granted
+    return 0
+
+
+def put_back_copies(book_id, count=1):
+    updated = Book.objects.filter(id=book_id).update(
+        quantity=F("quantity") + count, updated_at=timezone.now()
+    )
+    if updated:
+        object_cache.invalidate(Book, book_id)
+        response_cache.bump_books_generation()
+    return updated == 1
@@ -0,0 +1,351 @@
+import array
+import bisect
+import sys
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from books.models import Book
+from . import response_cache
+
+# in-process prefix index over book and author names for books/suggest, so a
+# search box can ask on every keystroke without a database query. every word
+# start of a name is a key, "hob" finds "The Hobbit", searched with bisect. it
+# is loaded from the books table on first use and then changed book by book
+# from the signal receivers and the importers, never rebuilt. unlike the
+# shared caches it lives in one process and sees the writes of that process
+# right away. the writes of other processes come in by polling: at most every
+# SUGGEST_REFRESH_SECONDS a request checks the shared books generation of
+# apis/response_cache.py, and when it moved the books changed since the last
+# poll are read back by updated_at and the books gone from the table dropped
+
+# low key bits holding where a word starts within its name
+OFFSET_BITS = 16
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def normalize(text):
+    # casefolded without accents and with single spaces, "Café  Crème" and
+    # "cafe creme" share their keys
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(
+            char
+            for char in unicodedata.normalize("NFKD", text)
+            if not unicodedata.combining(char)
+        )
+    return " ".join(text.split())
+
+
+def word_offsets(text):
+    # "the hobbit" -> [0, 4]
+    return [0] + [offset + 1 for offset, char in enumerate(text) if char == " "]
+
+
+class PrefixIndex:
+    """
+    A sorted array of word starts. Each indexed name gets a slot holding its
+    normalized text, and each word of it a ``slot << OFFSET_BITS | offset``
+    key in ``keys``, ordered by the text from that word on. A book name is
+    indexed per book, an author name once however many books they have. All
+    methods are thread safe, writers take turns on ``write_lock`` and a large
+    batch of keys is merged into a copy of ``keys`` that lookups keep reading
+    the old array during.
+    """
+
+    def __init__(self):
+        self.keys = array.array("q")
+        # slot -> (normalized text, kind, value), None when free
+        self.names = []
+        self.free_slots = []
+        # book id -> (slot, book_name, author_name)
+        self.books = {}
+        # author name -> (slot, number of indexed books by them)
+        self.authors = {}
+        self.loaded = False
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def suffix(self, key):
+        # the name text from the key's word on, what the keys are sorted by
+        return self.names[key >> OFFSET_BITS][0][key & OFFSET_MASK :]
+
+    def _name_keys(self, text, kind, value):
+        text = normalize(text)
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.names[slot] = (text, kind, value)
+        else:
+            slot = len(self.names)
+            self.names.append((text, kind, value))
+        return slot, [slot << OFFSET_BITS | offset for offset in word_offsets(text)]
+
+    def _new_keys(self, id, book_name, author_name):
+        # keys a book adds, its author only with their first book
+        slot, keys = self._name_keys(book_name, "book", id)
+        self.books[id] = (slot, book_name, author_name)
+
+        author_slot, count = self.authors.get(author_name, (None, 0))
+        if author_slot is None:
+            author_slot, author_keys = self._name_keys(
+                author_name, "author", author_name
+            )
+            keys += author_keys
+        self.authors[author_name] = (author_slot, count + 1)
+        return keys
+
+    def _merged(self, keys):
+        """
+        A copy of ``keys`` with the new ``keys`` merged in. The batch is sorted
+        on its own and each new key finds its place by bisecting on from the
+        last one, the existing keys are copied over in slices between them.
+        Only called while holding ``write_lock``, which keeps ``keys`` and the
+        slots of the new keys as they are.
+        """
+        merged = array.array("q")
+        start = 0
+        for key in sorted(keys, key=self.suffix):
+            position = bisect.bisect_right(
+                self.keys, self.suffix(key), lo=start, key=self.suffix
+            )
+            merged += self.keys[start:position]
+            merged.append(key)
+            start = position
+        merged += self.keys[start:]
+        return merged
+
+    def _insert(self, keys):
+        # with write_lock held. an insort moves the array once per key, past a
+        # few hundred keys a merge into a copy costs less, and lookups go on
+        # reading the old array until the merged one is swapped in
+        if len(keys) < 256:
+            with self.lock:
+                for key in keys:
+                    bisect.insort(self.keys, key, key=self.suffix)
+        else:
+            merged = self._merged(keys)
+            with self.lock:
+                self.keys = merged
+
+    def _remove_name(self, slot):
+        text = self.names[slot][0]
+        for offset in word_offsets(text):
+            key = slot << OFFSET_BITS | offset
+            # keys of equal suffixes sit together in no particular order
+            position = bisect.bisect_left(self.keys, text[offset:], key=self.suffix)
+            while self.keys[position] != key:
+                position += 1
+            del self.keys[position]
+        self.names[slot] = None
+        self.free_slots.append(slot)
+
+    def _remove(self, id):
+        slot, book_name, author_name = self.books.pop(id)
+        self._remove_name(slot)
+
+        author_slot, count = self.authors.pop(author_name)
+        if count > 1:
+            self.authors[author_name] = (author_slot, count - 1)
+        else:
+            self._remove_name(author_slot)
+
+    def load(self, rows):
+        # (id, book_name, author_name) rows of every book, once
+        with self.write_lock:
+            if self.loaded:
+                return
+            keys = []
+            with self.lock:
+                for id, book_name, author_name in rows:
+                    keys += self._new_keys(id, book_name, author_name)
+            self._insert(keys)
+            self.loaded = True
+
+    def add(self, books):
+        # new or renamed books as (id, book_name, author_name), a no-op until
+        # loaded since the load reads them from the table
+        with self.write_lock:
+            if not self.loaded:
+                return
+            keys = []
+            with self.lock:
+                for id, book_name, author_name in books:
+                    if id in self.books:
+                        self._remove(id)
+                    keys += self._new_keys(id, book_name, author_name)
+            self._insert(keys)
+
+    def discard(self, id):
+        with self.write_lock, self.lock:
+            if id in self.books:
+                self._remove(id)
+
+    def changed(self, books):
+        # the (id, book_name, author_name) rows not indexed with these names
+        with self.lock:
+            return [
+                (id, book_name, author_name)
+                for id, book_name, author_name in books
+                if self.books.get(id, (None, None, None))[1:]
+                != (book_name, author_name)
+            ]
+
+    def ids(self):
+        with self.lock:
+            return set(self.books)
+
+    def lookup(self, prefix, limit):
+        """
+        Up to ``limit`` books and authors with a name word starting with
+        ``prefix``, in key order, as dicts ready for the response.
+        """
+        started_at = time.perf_counter()
+        prefix = normalize(prefix)
+        found = []
+        seen = set()
+        with self.lock:
+            position = bisect.bisect_left(self.keys, prefix, key=self.suffix)
+            while len(found) < limit and position < len(self.keys):
+                key = self.keys[position]
+                if not self.suffix(key).startswith(prefix):
+                    break
+                position += 1
+
+                _, kind, value = self.names[key >> OFFSET_BITS]
+                if (kind, value) in seen:
+                    continue
+                seen.add((kind, value))
+                if kind == "book":
+                    found.append(
+                        {"type": kind, "id": value, "text": self.books[value][1]}
+                    )
+                else:
+                    found.append({"type": kind, "text": value})
+
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - started_at
+        return found
+
+    def stats(self):
+        # bytes are a sys.getsizeof estimate of the keys, the slots and their
+        # normalized texts, the containers of books and authors are left out
+        with self.lock:
+            return {
+                "books": len(self.books),
+                "authors": len(self.authors),
+                "keys": len(self.keys),
+                "bytes": (
+                    sys.getsizeof(self.keys)
+                    + sys.getsizeof(self.names)
+                    + sum(
+                        sys.getsizeof(name) + sys.getsizeof(name[0])
+                        for name in self.names
+                        if name is not None
+                    )
+                ),
+                "lookups": self.lookups,
+                "lookup_seconds": self.lookup_seconds,
+            }
+
+
+index = PrefixIndex()
+
+
+# how far back each poll reads again, for writes stamped before the last poll
+# began that had not committed yet, or by a clock running behind
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+_refresh_lock = threading.Lock()
+# the books generation and the time the index is up to date with, and the
+# time.monotonic() of the next poll
+_generation = None
+_since = None
+_next_poll = 0.0
+
+
+def book_rows(books=Book.objects):
+    # ids as text, the form they take in the keys and the response
+    for id, book_name, author_name in books.values_list(
+        "id", "book_name", "author_name"
+    ).iterator(chunk_size=10000):
+        yield str(id), book_name, author_name
+
+
+def changed_books(since):
+    # served by book_updated_idx
+    return Book.objects.filter(updated_at__gte=since)
+
+
+def _polled(generation, since):
+    global _generation, _since, _next_poll
+    _generation, _since = generation, since
+    _next_poll = time.monotonic() + settings.SUGGEST_REFRESH_SECONDS
+
+
+def _load():
+    with _refresh_lock:
+        if index.loaded:
+            return
+        # read before the rows, a write after them moves the generation on
+        generation, since = response_cache.books_generation(), timezone.now()
+        index.load(book_rows())
+        _polled(generation, since)
+
+
+def _refresh():
+    generation, since = response_cache.books_generation(), timezone.now()
+    if generation != _generation:
+        changed = book_rows(changed_books(_since - REFRESH_OVERLAP))
+        index.add(index.changed(changed))
+        # a deleted book leaves no row to read back, only the index holding
+        # more books than the table
+        if len(index.books) != Book.objects.count():
+            ids = {str(id) for id in Book.objects.values_list("id", flat=True)}
+            for id in index.ids() - ids:
+                index.discard(id)
+    _polled(generation, since)
+
+
+def refresh_due():
+    return not index.loaded or time.monotonic() >= _next_poll
+
+
+def ensure_current():
+    """
+    Load the index on first use, then every SUGGEST_REFRESH_SECONDS apply the
+    book writes of other processes. A thread finding another one refreshing
+    answers from the index as it is.
+    """
+    if not index.loaded:
+        _load()
+    elif refresh_due() and _refresh_lock.acquire(blocking=False):
+        try:
+            _refresh()
+        finally:
+            _refresh_lock.release()
+
+
+def suggestions(prefix, limit):
+    ensure_current()
+    return index.lookup(prefix, limit)
+
+
+def books_saved(books):
+    # after commit, so rolled back writes never reach the index
+    changes = [(str(book.id), book.book_name, book.author_name) for book in books]
+    transaction.on_commit(lambda: index.add(changes))
+
+
+def book_deleted(id):
+    transaction.on_commit(lambda: index.discard(str(id)))
+
+
+def stats():
+    return index.stats()
@@ -1,3 +1,1809 @@
-from django.test import TestCase
+import csv
+import gc
+import io
+import json
+import re
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import bcrypt
+
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils import timezone as django_timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from books.models import BOOK_CATEGORIES, Book
+from borrows.models import Borrow, OverdueBorrow, OverdueScan
+from users.models import User
+from .handlers import borrows as borrow_handlers
+from .pagination import decode_cursor, encode_cursor, keyset_page, keyset_queryset
+from .serializers import rows, serializers
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .validators import book_validators, borrow_validators, user_validators
+from . import (
+    checks,
+    counters,
+    exporters,
+    facets,
+    importers,
+    metrics,
+    object_cache,
+    overdue,
+    passwords,
+    queries,
+    relations,
+    replicas,
+    response_cache,
+    search,
+    stock,
+    suggest,
+    validation,
+)
+
+# a plan line that reads the whole table without an index, e.g. "SCAN books_book"
+TABLE_SCAN = re.compile(r"\bSCAN (\w+)\b(?! USING)")
+
+# a sort of the whole result before the first row comes out
+TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY")
+
+CURSOR = encode_cursor(datetime(2024, 1, 1, tzinfo=timezone.utc), uuid.uuid4())
+
+
+class QueryPlanTests(TestCase):
+    """
+    Run EXPLAIN on the ORM queries behind the list, export and duplicate-check paths
+    and fail when any of them falls back to a full table scan.
+    """
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertIsNone(
+            TABLE_SCAN.search(plan), f"table scan in plan:\n{plan}\n{queryset.query}"
+        )
+
+    def assertPagesUseIndex(self, queryset, sort_field, descending=False):
+        # offset paging and both first and later cursor pages
+        for cursor in ["", CURSOR]:
+            self.assertUsesIndex(
+                keyset_queryset(queryset, sort_field, cursor, descending)[:11]
+            )
+
+    def test_get_books_filters(self):
+        shapes = [
+            {"category": "Science"},
+            {"author_name": "Ursula K. Le Guin"},
+            {"category": "Science", "author_name": "Ursula K. Le Guin"},
+        ]
+        for shape in shapes:
+            with self.subTest(**shape):
+                validate_query = book_validators.get_books_query_validators(**shape)
+                books = queries.books_queryset(validate_query)
+                self.assertUsesIndex(books[0:10])
+                self.assertPagesUseIndex(books, "created_at")
+
+    def test_book_facets(self):
+        # a facet drops its own filter, so only a filter on the other field is
+        # left to use an index
+        for field, shape in [
+            ("category", {"author_name": "Ursula K. Le Guin"}),
+            ("author_name", {"category": "Science"}),
+        ]:
+            with self.subTest(field=field):
+                validate_query = book_validators.get_books_query_validators(**shape)
+                self.assertUsesIndex(facets.facet_queryset(validate_query, field))
+
+    def test_suggest_poll(self):
+        self.assertUsesIndex(
+            suggest.changed_books(django_timezone.now()).values_list(
+                "id", "book_name", "author_name"
+            )
+        )
+
+    def test_get_books_unfiltered_cursor(self):
+        validate_query = book_validators.get_books_query_validators()
+        self.assertPagesUseIndex(queries.books_queryset(validate_query), "created_at")
+
+    def test_get_borrows_filters(self):
+        shapes = [
+            {"book_id": uuid.uuid4()},
+            {"user_id": uuid.uuid4()},
+            {"is_returned": True},
+            {"book_id": uuid.uuid4(), "is_returned": True},
+            {"user_id": uuid.uuid4(), "is_returned": True},
+            {"book_id": uuid.uuid4(), "user_id": uuid.uuid4()},
+        ]
+        for shape in shapes:
+            with self.subTest(**shape):
+                validate_query = borrow_validators.get_borrows_validator(**shape)
+                borrows = queries.borrows_queryset(validate_query)
+                self.assertUsesIndex(borrows[0:10])
+                self.assertPagesUseIndex(borrows, "borrowed_at")
+
+    def test_get_borrows_unfiltered_cursor(self):
+        validate_query = borrow_validators.get_borrows_validator()
+        self.assertPagesUseIndex(
+            queries.borrows_queryset(validate_query), "borrowed_at"
+        )
+
+    def test_expanded_borrows_join_on_primary_keys(self):
+        validate_query = borrow_validators.get_borrows_validator(
+            user_id=uuid.uuid4(), expand="book,user"
+        )
+        borrows = rows.expanded_borrow_rows(validate_query.expand).values(
+            queries.borrows_queryset(validate_query)
+        )
+        self.assertPagesUseIndex(borrows, "borrowed_at")
+
+    def test_active_borrows_prefetch(self):
+        for relation in ["book_id", "user_id"]:
+            with self.subTest(relation=relation):
+                self.assertUsesIndex(
+                    relations.active_borrows_queryset().filter(
+                        **{relation: uuid.uuid4()}
+                    )
+                )
+
+    def test_get_users_filters(self):
+        for filter_by in ["first_to_add", "last_to_add", "unpaid_member"]:
+            with self.subTest(filter_by=filter_by):
+                validate_query = user_validators.get_users(filter_by=filter_by)
+                users = queries.users_queryset(validate_query)
+                self.assertUsesIndex(users[0:10])
+                self.assertPagesUseIndex(
+                    users, "created_at", descending=filter_by == "last_to_add"
+                )
+
+    def test_borrow_summaries(self):
+        for model in [Book, User]:
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(
+                    queries.borrow_summaries(model, [uuid.uuid4(), uuid.uuid4()])
+                )
+
+    def test_overdue_scan_batches(self):
+        # every batch seeks past the watermark on borrow_due_idx, unsorted
+        for cursor in ["", CURSOR]:
+            with self.subTest(cursor=cursor):
+                batch = keyset_queryset(
+                    overdue.overdue_queryset(django_timezone.now()),
+                    "to_return_at",
+                    cursor,
+                )[:1000]
+                self.assertUsesIndex(batch)
+                self.assertIsNone(TEMP_SORT.search(batch.explain()))
+
+    def test_overdue_rescan_batches(self):
+        # the second pass reads borrows changed since the last run off
+        # borrow_open_changed_idx, unsorted
+        now = django_timezone.now()
+        scan = OverdueScan(last_due_at=now, last_borrow_id=uuid.uuid4(), scanned_at=now)
+        for cursor in ["", CURSOR]:
+            with self.subTest(cursor=cursor):
+                batch = keyset_queryset(
+                    overdue.changed_queryset(now, scan), "updated_at", cursor
+                )[:1000]
+                self.assertUsesIndex(batch)
+                self.assertIn("borrow_open_changed_idx", batch.explain())
+                self.assertIsNone(TEMP_SORT.search(batch.explain()))
+
+    def test_exports_stream_in_index_order(self):
+        # exports read every matching row, they must not scan or sort
+        exports = [
+            queries.books_export_queryset(
+                book_validators.export_books_validator(**shape)
+            )
+            for shape in [{}, {"category": "Science"}, {"author_name": "Dune"}]
+        ]
+        exports += [
+            queries.borrows_export_queryset(
+                borrow_validators.export_borrows_validator(**shape)
+            )
+            for shape in [
+                {},
+                {"book_id": uuid.uuid4()},
+                {"user_id": uuid.uuid4()},
+                {"is_returned": True},
+            ]
+        ]
+        exports += [
+            queries.users_export_queryset(
+                user_validators.export_users_validator(filter_by=filter_by)
+            )
+            for filter_by in [None, "first_to_add", "last_to_add", "unpaid_member"]
+        ]
+        for queryset in exports:
+            with self.subTest(query=str(queryset.query)):
+                plan = queryset.explain()
+                self.assertIsNone(TEMP_SORT.search(plan), f"sort in plan:\n{plan}")
+                self.assertUsesIndex(queryset)
+
+    def test_duplicate_checks(self):
+        self.assertUsesIndex(Book.objects.filter(book_name="Dune"))
+        self.assertUsesIndex(User.objects.filter(email="reader@example.com"))
+        self.assertUsesIndex(User.objects.filter(phone_number="+8801700000000"))
+
+
+class CacheInvalidationTests(TestCase):
+    """
+    A stock change drops the cached book and every cached book list, and the
+    deploy checks want both caches shared by every worker process.
+    """
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_stock_change_invalidates_detail_and_list(self):
+        book = Book.objects.create(
+            book_name="Dune",
+            author_name="Frank Herbert",
+            category="Science",
+            quantity=2,
+        )
+        user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+
+        def quantities():
+            detail = self.client.get(f"/api/v1/books/{book.id}").json()["data"]
+            page = self.client.get("/api/v1/books/q").json()["data"]
+            return detail["quantity"], page[0]["quantity"]
+
+        self.assertEqual(quantities(), (2, 2))
+        self.assertIsNotNone(object_cache.peek(Book, book.id))
+        self.assertEqual(quantities(), (2, 2))
+
+        # the entries are dropped once the borrow commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/v1/borrows",
+                {
+                    "book_id": str(book.id),
+                    "user_id": str(user.id),
+                    "to_return_at": django_timezone.now().isoformat(),
+                },
+                content_type="application/json",
+            )
+        self.assertIsNone(object_cache.peek(Book, book.id))
+        self.assertEqual(quantities(), (1, 1))
+
+    def test_deploy_check_wants_shared_caches(self):
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        redis = {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://localhost:6379/0",
+        }
+        with override_settings(CACHES={"default": locmem}):
+            self.assertEqual(
+                [error.id for error in checks.check_shared_caches(None)],
+                ["apis.E001"] * 3,
+            )
+        with override_settings(CACHES={"default": redis}):
+            self.assertEqual(checks.check_shared_caches(None), [])
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Detail and list routes answer a matching If-None-Match or
+    If-Modified-Since with a 304, until a write changes what they would send.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            book_name="Dune", author_name="Frank Herbert", category="Science"
+        )
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_detail(self):
+        path = f"/api/v1/books/{self.book.id}"
+        response = self.client.get(path)
+        etag = response["ETag"]
+        self.assertEqual(self.revalidate(path, etag), 304)
+        self.assertEqual(
+            self.client.get(
+                path, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            ).status_code,
+            304,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(path, {"quantity": 5}, content_type="application/json")
+        self.assertEqual(self.revalidate(path, etag), 200)
+        self.assertNotEqual(self.client.get(path)["ETag"], etag)
+
+    def test_lists(self):
+        writes = {
+            "/api/v1/books/q": lambda: self.client.put(
+                f"/api/v1/books/{self.book.id}",
+                {"quantity": 5},
+                content_type="application/json",
+            ),
+            "/api/v1/users/q": lambda: self.client.put(
+                f"/api/v1/users/membership/{self.user.id}"
+            ),
+        }
+        for path, write in writes.items():
+            with self.subTest(path=path):
+                etag = self.client.get(path)["ETag"]
+                self.assertEqual(self.revalidate(path, etag), 304)
+                # the book list etag follows the generation bumped on commit
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(write().status_code, 200)
+                self.assertEqual(self.revalidate(path, etag), 200)
+
+
+class RelationRouteTests(TestCase):
+    """
+    ?include=active_borrows lists the open borrows of a book or user, and
+    ?expand=book,user inlines a borrow's rows into it, with an ETag that
+    follows those rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            book_name="Dune", author_name="Frank Herbert", category="Science"
+        )
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        due = django_timezone.now() + timedelta(days=7)
+        cls.open_borrow, _ = [
+            Borrow.objects.create(
+                user_id=cls.user,
+                book_id=cls.book,
+                to_return_at=due,
+                is_returned=is_returned,
+            )
+            for is_returned in [False, True]
+        ]
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_include_active_borrows(self):
+        for path in [f"books/{self.book.id}", f"users/{self.user.id}"]:
+            with self.subTest(path=path):
+                response = self.client.get(
+                    f"/api/v1/{path}", {"include": "active_borrows"}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [row["id"] for row in response.json()["data"]["active_borrows"]],
+                    [str(self.open_borrow.id)],
+                )
+
+    def test_expand_book_and_user(self):
+        path = f"/api/v1/borrows/{self.open_borrow.id}?expand=book,user"
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(data["book"]["book_name"], "Dune")
+        self.assertEqual(data["user"]["email"], "reader@example.com")
+
+        writes = {
+            "book": lambda: self.client.put(
+                f"/api/v1/books/{self.book.id}",
+                {"quantity": 5},
+                content_type="application/json",
+            ),
+            "user": lambda: self.client.put(f"/api/v1/users/membership/{self.user.id}"),
+        }
+        for name, write in writes.items():
+            with self.subTest(name=name):
+                etag = self.client.get(path)["ETag"]
+                self.assertEqual(
+                    self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304
+                )
+                # only the related row changes, the borrow stays as it was
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(write().status_code, 200)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+        data = response.json()["data"]
+        self.assertEqual(data["book"]["quantity"], 5)
+        self.assertTrue(data["user"]["membership_paid"])
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Cursors round trip the key of the last row, and walking the pages visits
+    every row once even when rows share their sort value.
+    """
+
+    def test_cursor_round_trip(self):
+        sort_value = datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        id = uuid.uuid4()
+        self.assertEqual(decode_cursor(encode_cursor(sort_value, id)), (sort_value, id))
+        self.assertIsNone(decode_cursor(""))
+        for cursor in ["not a cursor", encode_cursor(sort_value, id)[:-3]]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_pages_break_ties_on_id(self):
+        tied = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for n in range(7):
+            Book.objects.create(
+                book_name=f"Book {n}",
+                author_name="Author",
+                category="Science",
+                # five books share one created_at
+                created_at=tied + timedelta(days=max(n - 4, 0)),
+            )
+
+        for descending in [False, True]:
+            with self.subTest(descending=descending):
+                expected = sorted(
+                    Book.objects.values_list("created_at", "id"), reverse=descending
+                )
+                seen = []
+                cursor = ""
+                while cursor is not None:
+                    page, cursor = keyset_page(
+                        Book.objects.all(), "created_at", cursor, 2, descending
+                    )
+                    self.assertLessEqual(len(page), 2)
+                    seen += [(book.created_at, book.id) for book in page]
+                self.assertEqual(seen, expected)
+
+    def test_limit_is_bounded(self):
+        for query in ["limit=0", "limit=-1", "offset=-1"]:
+            for path in ["books/q", "borrows/q", "users/q"]:
+                with self.subTest(path=path, query=query):
+                    response = self.client.get(f"/api/v1/{path}?{query}")
+                    self.assertEqual(response.status_code, 400)
+
+    def test_large_limits_are_accepted(self):
+        # clients that asked for big pages before the bounds keep working
+        for path in ["books/q", "borrows/q", "users/q"]:
+            for query in ["limit=200", "limit=200&cursor="]:
+                with self.subTest(path=path, query=query):
+                    response = self.client.get(f"/api/v1/{path}?{query}")
+                    self.assertEqual(response.status_code, 200)
+
+
+class RowSerializerTests(TestCase):
+    """
+    The list endpoints serialize values_list rows with apis/serializers/rows.py,
+    their output must stay the same as the ModelSerializers'.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        book = Book.objects.create(
+            book_name="Dune", author_name="Frank Herbert", category="Science"
+        )
+        user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        Borrow.objects.create(
+            book_id=book, user_id=user, to_return_at=django_timezone.now()
+        )
+
+    def test_same_output_as_model_serializers(self):
+        pairs = [
+            (Book, serializers.BookSerializer, rows.book_rows),
+            (User, serializers.UserSerializer, rows.user_rows),
+            (Borrow, serializers.BorrowSerializer, rows.borrow_rows),
+        ]
+        for model, serializer, row_serializer in pairs:
+            with self.subTest(model=model.__name__):
+                expected = JSONRenderer().render(
+                    serializer(model.objects.all(), many=True).data
+                )
+                actual = JSONRenderer().render(
+                    row_serializer.serialize(row_serializer.values(model.objects.all()))
+                )
+                self.assertEqual(actual, expected)
+
+    def test_expanded_rows_inline_the_model_serializers(self):
+        borrow = Borrow.objects.select_related("book_id", "user_id").get()
+        expected = JSONRenderer().render(
+            [relations.expanded_data(borrow, frozenset(["book", "user"]))]
+        )
+        expanded_rows = rows.expanded_borrow_rows(frozenset(["book", "user"]))
+        actual = JSONRenderer().render(
+            expanded_rows.serialize(expanded_rows.values(Borrow.objects.all()))
+        )
+        self.assertEqual(actual, expected)
+
+    def test_password_is_never_serialized(self):
+        user = User.objects.get()
+        self.assertNotIn("password", serializers.UserSerializer(user).data)
+        self.assertNotIn("password", rows.user_rows.fields)
+
+
+class ValidationTests(TestCase):
+    """
+    Views validate their input through the @validate decorator of
+    apis/validation.py, errors come back in the same envelope everywhere.
+    """
+
+    def test_errors_use_the_standard_envelope(self):
+        paths = [
+            "/api/v1/books/q?limit=ten",
+            "/api/v1/borrows/q?is_returned=maybe",
+            "/api/v1/async/books/q?limit=ten",
+            "/api/v1/books/export?file_format=xml",
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 400)
+                body = response.json()
+                self.assertEqual(body["status"], "error")
+                self.assertEqual(body["message"], "Failed in type validation.")
+                self.assertEqual(len(body["errors"]), 1)
+
+    def test_query_reaches_the_view(self):
+        for n, paid in enumerate([True, False, False]):
+            User.objects.create(
+                name=f"Reader {n}",
+                email=f"reader-{n}@example.com",
+                phone_number=f"+88017000000{n}",
+                password="not-a-hash",
+                membership_paid=paid,
+            )
+        response = self.client.get("/api/v1/users/q?filter_by=unpaid_member&limit=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user["membership_paid"] for user in response.json()["data"]], [False]
+        )
+        self.assertIn("users_views.get_users", validation.timings())
+
+    def test_empty_cursor_starts_cursor_mode(self):
+        for n in range(3):
+            Book.objects.create(
+                book_name=f"Book {n}", author_name="Author", category="Science"
+            )
+            User.objects.create(
+                name=f"Reader {n}",
+                email=f"reader-{n}@example.com",
+                phone_number=f"+88017000000{n}",
+                password="not-a-hash",
+            )
+
+        for path in ["books/q", "users/q", "async/books/q", "async/users/q"]:
+            with self.subTest(path=path):
+                pages = []
+                cursor = ""
+                while cursor is not None:
+                    response = self.client.get(
+                        f"/api/v1/{path}", {"cursor": cursor, "limit": 2}
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    body = response.json()
+                    pages.append(len(body["data"]))
+                    cursor = body["next_cursor"]
+                self.assertEqual(pages, [2, 1])
+
+
+class BorrowStockTests(TestCase):
+    """
+    Borrowing and returning move the book quantity by one copy in the same
+    transaction as the borrow row, and a refused change leaves both alone.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            book_name="Dune",
+            author_name="Frank Herbert",
+            category="Science",
+            quantity=1,
+        )
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        cls.due = (django_timezone.now() + timedelta(days=7)).isoformat()
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def borrow(self, user_id=None):
+        return self.client.post(
+            "/api/v1/borrows",
+            {
+                "book_id": str(self.book.id),
+                "user_id": str(user_id or self.user.id),
+                "to_return_at": self.due,
+            },
+            content_type="application/json",
+        )
+
+    def quantity(self):
+        self.book.refresh_from_db()
+        return self.book.quantity
+
+    def test_unknown_user_rolls_back_the_decrement(self):
+        self.assertEqual(self.borrow(user_id=uuid.uuid4()).status_code, 404)
+        self.assertEqual(self.quantity(), 1)
+        self.assertFalse(Borrow.objects.exists())
+
+    def test_no_copies_left(self):
+        Book.objects.filter(id=self.book.id).update(quantity=0)
+        response = self.borrow()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["message"], "Not enough books in stock.")
+        self.assertFalse(Borrow.objects.exists())
+
+    def test_unreturn_with_an_empty_shelf(self):
+        self.assertEqual(self.borrow().status_code, 200)
+        borrow = Borrow.objects.get()
+        self.client.put(f"/api/v1/borrows/{borrow.id}")
+        self.assertEqual(self.quantity(), 1)
+
+        # the returned copy went out again with another borrow
+        Book.objects.filter(id=self.book.id).update(quantity=0)
+        response = self.client.put(f"/api/v1/borrows/{borrow.id}")
+        self.assertEqual(response.status_code, 409)
+        borrow.refresh_from_db()
+        self.assertTrue(borrow.is_returned)
+        self.assertEqual(self.quantity(), 0)
+
+    def test_second_return_adds_stock_once(self):
+        self.assertEqual(self.borrow().status_code, 200)
+        # two requests load the open borrow, the first returns it
+        first, second = Borrow.objects.get(), Borrow.objects.get()
+        self.assertEqual(borrow_handlers.toggle_returned(first).status, 200)
+        self.assertEqual(borrow_handlers.toggle_returned(second).status, 409)
+        self.assertEqual(self.quantity(), 1)
+
+
+class BorrowBatchTests(TestCase):
+    """
+    POST borrows/batch answers every item on its own and hands out the copies
+    left in stock to the first items of each book.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            book_name="Dune",
+            author_name="Frank Herbert",
+            category="Science",
+            quantity=3,
+        )
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        cls.due = (django_timezone.now() + timedelta(days=7)).isoformat()
+
+    def item(self, book_id=None, user_id=None):
+        return {
+            "book_id": str(book_id or self.book.id),
+            "user_id": str(user_id or self.user.id),
+            "to_return_at": self.due,
+        }
+
+    def post_batch(self, items):
+        response = self.client.post(
+            "/api/v1/borrows/batch", items, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (result["index"], result["message"]) for result in response.json()["data"]
+        ]
+
+    def test_items_are_answered_one_by_one(self):
+        results = self.post_batch(
+            [
+                self.item(),
+                {"book_id": "not a uuid", "user_id": str(self.user.id)},
+                self.item(book_id=uuid.uuid4()),
+                self.item(user_id=uuid.uuid4()),
+                self.item(),
+                self.item(),
+                self.item(),
+            ]
+        )
+        self.assertEqual(
+            results,
+            [
+                (0, "Borrow has been created."),
+                (1, "Failed in type validation."),
+                (2, "No book found with this id"),
+                (3, "No user found with this id"),
+                (4, "Borrow has been created."),
+                (5, "Borrow has been created."),
+                (6, "Not enough books in stock."),
+            ],
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.quantity, 0)
+        self.assertEqual(Borrow.objects.count(), 3)
+
+    def test_stock_moving_meanwhile_grants_what_is_left(self):
+        take_copies = stock.take_copies
+
+        def borrowed_elsewhere_first(book_id, count=1):
+            # another checkout takes a copy between the read and the decrement
+            if not Borrow.objects.exists() and count == 3:
+                take_copies(book_id)
+            return take_copies(book_id, count)
+
+        with mock.patch.object(stock, "take_copies", borrowed_elsewhere_first):
+            results = self.post_batch([self.item() for _ in range(3)])
+        self.assertEqual(
+            [message for _, message in results],
+            ["Borrow has been created."] * 2 + ["Not enough books in stock."],
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.quantity, 0)
+
+
+class BookImportTests(TestCase):
+    """
+    Imports insert the good rows and report every other row with its number,
+    a row that cannot be decoded or parsed included.
+    """
+
+    def import_books(self, lines, format):
+        rejections = []
+        counts = importers.import_books(
+            importers.iter_rows(lines, format),
+            chunk_size=2,
+            on_reject=lambda number, errors: rejections.append(
+                (number, errors[0]["type"])
+            ),
+        )
+        return counts, rejections
+
+    def test_csv_rows(self):
+        counts, rejections = self.import_books(
+            [
+                b"book_name,author_name,category,quantity\n",
+                b"Dune,Frank Herbert,Science,2\n",
+                b"Dune,Frank Herbert,Science,1\n",
+                b"Solaris,Stanislaw Lem,Space,1\n",
+                b"Caf\xe9,Unknown,Science,1\n",
+                b'"' + b"x" * 200000 + b'",Nobody,Science,1\n',
+                b'"Lud-in-the-Mist",Hope Mirrlees,Fantasy,3\n',
+            ],
+            "csv",
+        )
+        self.assertEqual(counts, (2, 4))
+        self.assertEqual(
+            rejections,
+            [
+                (2, "duplicate"),
+                (3, "enum"),
+                (4, "encoding_invalid"),
+                (5, "csv_invalid"),
+            ],
+        )
+        self.assertEqual(
+            dict(Book.objects.values_list("book_name", "quantity")),
+            {"Dune": 2, "Lud-in-the-Mist": 3},
+        )
+
+    def test_jsonl_rows(self):
+        counts, rejections = self.import_books(
+            [
+                b'{"book_name": "Dune", "author_name": "Frank Herbert", '
+                b'"category": "Science"}\n',
+                b"\n",
+                b'{"book_name": "Solaris"\n',
+                b'{"book_name": "Caf\xe9"}\n',
+                b'{"book_name": "Solaris", "author_name": "Stanislaw Lem"}\n',
+            ],
+            "jsonl",
+        )
+        self.assertEqual(counts, (1, 3))
+        self.assertEqual(
+            rejections,
+            [(3, "json_invalid"), (4, "encoding_invalid"), (5, "missing")],
+        )
+
+
+class ExportTests(TestCase):
+    """
+    The export routes stream every matching row once, as a csv file with a
+    header or as one json object per line, with the fields of the list views.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = [
+            Book.objects.create(
+                book_name=f"Book {n}",
+                author_name="Frank Herbert",
+                category="Science" if n % 2 else "Fiction",
+                quantity=n,
+            )
+            for n in range(5)
+        ]
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        cls.borrows = [
+            Borrow.objects.create(
+                user_id=cls.user,
+                book_id=book,
+                to_return_at=django_timezone.now() + timedelta(days=7),
+                is_returned=book.quantity == 0,
+            )
+            for book in cls.books[:2]
+        ]
+
+    def export(self, path, **query):
+        response = self.client.get(path, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode("utf-8")
+
+    def books_data(self, books):
+        return [
+            dict(serializers.BookSerializer(book).data, id=str(book.id))
+            for book in books
+        ]
+
+    def test_csv(self):
+        response, text = self.export("/api/v1/books/export", file_format="csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="books.csv"'
+        )
+
+        reader = csv.reader(io.StringIO(text))
+        self.assertEqual(next(reader), rows.BOOK_FIELDS)
+        self.assertEqual(
+            [dict(zip(rows.BOOK_FIELDS, row)) for row in reader],
+            [
+                {name: str(value) for name, value in book.items()}
+                for book in self.books_data(self.books)
+            ],
+        )
+
+    def test_jsonl(self):
+        response, text = self.export("/api/v1/books/export", category="Science")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="books.jsonl"'
+        )
+        self.assertEqual(
+            [json.loads(line) for line in text.splitlines()],
+            self.books_data(book for book in self.books if book.category == "Science"),
+        )
+
+        _, text = self.export("/api/v1/borrows/export", is_returned="true")
+        self.assertEqual(
+            [json.loads(line)["id"] for line in text.splitlines()],
+            [str(self.borrows[0].id)],
+        )
+
+        _, text = self.export("/api/v1/users/export")
+        self.assertEqual(
+            [json.loads(line)["email"] for line in text.splitlines()],
+            ["reader@example.com"],
+        )
+
+    def test_rows_cross_chunks_once(self):
+        books = Book.objects.order_by("created_at", "id")
+        with mock.patch.object(exporters, "FIRST_CHUNK_SIZE", 1):
+            chunks = list(exporters.iter_export(books, rows.book_rows, "csv", 2))
+
+        # the header, a first chunk of one row and then chunks of two
+        self.assertEqual([chunk.count("\n") for chunk in chunks], [1, 1, 2, 2])
+        self.assertEqual(
+            [line.split(",")[0] for line in "".join(chunks).splitlines()[1:]],
+            [str(book.id) for book in self.books],
+        )
+
+
+@override_settings(BCRYPT_ROUNDS=4)
+class SignupHashingTests(TestCase):
+    """
+    The sync signup hashes in its request thread, the async one awaits the
+    shared pool. Both store a bcrypt hash of the configured cost.
+    """
+
+    def signup(self, path, n):
+        with mock.patch.object(
+            passwords, "submit_hash", wraps=passwords.submit_hash
+        ) as submit_hash:
+            response = self.client.post(
+                path,
+                {
+                    "name": f"Reader {n}",
+                    "email": f"reader-{n}@example.com",
+                    "phone_number": f"+88017000000{n}",
+                    "password": "secret-password",
+                    "membership_paid": False,
+                },
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+        hashed = User.objects.get(email=f"reader-{n}@example.com").password
+        self.assertTrue(hashed.startswith("$2b$04$"))
+        self.assertTrue(bcrypt.checkpw(b"secret-password", hashed.encode("ascii")))
+        return submit_hash.call_count
+
+    def test_only_the_async_path_uses_the_pool(self):
+        self.assertEqual(self.signup("/api/v1/users", 1), 0)
+        self.assertEqual(self.signup("/api/v1/async/users", 2), 1)
+
+
+class AsyncRouteTests(TestCase):
+    """
+    The routes under api/v1/async/ run the same handlers as the drf views and
+    answer alike, form bodies of a PUT included.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            book_name="Dune",
+            author_name="Frank Herbert",
+            category="Science",
+            quantity=2,
+        )
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_reads_match_the_sync_routes(self):
+        borrow = Borrow.objects.create(
+            user_id=self.user,
+            book_id=self.book,
+            to_return_at=django_timezone.now() + timedelta(days=7),
+        )
+        paths = [
+            "books/q",
+            "books/search?q=dune",
+            "books/suggest?prefix=du",
+            f"books/{self.book.id}",
+            f"books/{self.book.id}?include=active_borrows",
+            f"users/{self.user.id}?include=active_borrows",
+            f"books/{self.book.id}/borrow-summary",
+            f"books/borrow-summary?ids={self.book.id}",
+            "users/q",
+            f"users/{self.user.id}",
+            f"users/{self.user.id}/borrow-summary",
+            f"users/borrow-summary?ids={self.user.id},{uuid.uuid4()}",
+            "borrows/q?expand=book,user",
+            f"books/{uuid.uuid4()}",
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                sync_response = self.client.get(f"/api/v1/{path}")
+                async_response = self.client.get(f"/api/v1/async/{path}")
+                self.assertEqual(async_response.status_code, sync_response.status_code)
+                self.assertEqual(async_response.json(), sync_response.json())
+                # the etags differ, the path is part of them
+                self.assertEqual(
+                    async_response.has_header("ETag"), sync_response.has_header("ETag")
+                )
+
+        for path in [
+            f"books/{self.book.id}?include=active_borrows",
+            f"users/{self.user.id}?include=active_borrows",
+        ]:
+            with self.subTest(path=path):
+                data = self.client.get(f"/api/v1/async/{path}").json()["data"]
+                self.assertEqual(
+                    [row["id"] for row in data["active_borrows"]], [str(borrow.id)]
+                )
+
+    def test_conditional_get(self):
+        path = f"/api/v1/async/books/{self.book.id}"
+        etag = self.client.get(path)["ETag"]
+        self.assertEqual(
+            self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+    def test_put_form_bodies(self):
+        path = f"/api/v1/async/books/{self.book.id}"
+        bodies = [
+            (5, "quantity=5", "application/x-www-form-urlencoded"),
+            (6, encode_multipart(BOUNDARY, {"quantity": 6}), MULTIPART_CONTENT),
+        ]
+        for quantity, body, content_type in bodies:
+            with self.subTest(content_type=content_type):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.put(path, body, content_type=content_type)
+                self.assertEqual(response.status_code, 200)
+                self.book.refresh_from_db()
+                self.assertEqual(self.book.quantity, quantity)
+
+    def test_borrow_writes(self):
+        response = self.client.post(
+            "/api/v1/async/borrows",
+            {
+                "book_id": str(self.book.id),
+                "user_id": str(self.user.id),
+                "to_return_at": (django_timezone.now() + timedelta(days=7)).isoformat(),
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        borrow = Borrow.objects.get(book_id=self.book)
+
+        # returning puts the copy back, reopening takes it again
+        path = f"/api/v1/async/borrows/{borrow.id}"
+        for message, quantity in [
+            ("Borrowed book has been returned.", 2),
+            ("Borrowed book has not been returned.", 1),
+        ]:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.put(path)
+            self.assertEqual(response.json()["message"], message)
+            self.book.refresh_from_db()
+            self.assertEqual(self.book.quantity, quantity)
+
+        self.assertEqual(
+            self.client.delete(f"/api/v1/async/books/{self.book.id}").status_code, 409
+        )
+        self.assertEqual(self.client.delete(path).status_code, 200)
+        self.assertFalse(Borrow.objects.exists())
+
+
+@override_settings(BCRYPT_ROUNDS=4)
+class UserImportTests(TestCase):
+    """
+    A user upload hashes on the process pool shared by every import and
+    reports the rows it rejected.
+    """
+
+    def upload(self, content):
+        response = self.client.post(
+            "/api/v1/users/import",
+            {"file": SimpleUploadedFile("users.csv", content)},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_uploads_share_the_pool(self):
+        data = self.upload(
+            b"name,email,phone_number,password,membership_paid\n"
+            b"Reader,reader@example.com,+8801700000000,secret-1,true\n"
+            b"Twin,reader@example.com,+8801700000001,secret-2,false\n"
+            b"No,not-an-email,+8801700000002,secret-3,false\n"
+            b"Caf\xe9,cafe@example.com,+8801700000003,secret-4,false\n"
+        )
+        self.assertEqual((data["imported"], data["rejected"]), (1, 3))
+        self.assertEqual(
+            sorted(rejection["row"] for rejection in data["rejections"]), [2, 3, 4]
+        )
+        # the response never echoes a password back
+        self.assertNotIn("secret", str(data["rejections"]))
+
+        user = User.objects.get()
+        self.assertTrue(bcrypt.checkpw(b"secret-1", user.password.encode("ascii")))
+
+        pool = importers.get_pool()
+        data = self.upload(
+            b"name,email,phone_number,password,membership_paid\n"
+            b"Writer,writer@example.com,+8801700000009,secret-5,false\n"
+        )
+        self.assertEqual(data["imported"], 1)
+        self.assertIs(importers.get_pool(), pool)
+
+
+class OverdueScanTests(TestCase):
+    """
+    scan_overdue records each overdue borrow once and picks up from its
+    watermark on the next run, rechecking the borrows behind it that were
+    reopened or created since.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            book_name="Dune", author_name="Frank Herbert", category="Science"
+        )
+        cls.user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+
+    def borrows(self, *due):
+        # (days from now, returned) pairs
+        today = django_timezone.now()
+        return Borrow.objects.bulk_create(
+            Borrow(
+                book_id=self.book,
+                user_id=self.user,
+                to_return_at=today + timedelta(days=days),
+                is_returned=returned,
+            )
+            for days, returned in due
+        )
+
+    def test_scan_is_incremental(self):
+        self.borrows((-3, False), (-2, True), (-1, False), (1, False))
+        # scans start after the writes before them, like a scheduled run
+        now = django_timezone.now()
+
+        self.assertEqual(overdue.scan_overdue(now=now, batch_size=1), (2, 2))
+        self.assertEqual(overdue.scan_overdue(now=now), (0, 0))
+
+        # the borrow due tomorrow is only checked once it is due
+        later = now + timedelta(days=2)
+        self.assertEqual(overdue.scan_overdue(now=later), (1, 1))
+        self.assertEqual(OverdueBorrow.objects.count(), 3)
+
+        overdue.reset_watermark()
+        self.assertEqual(overdue.scan_overdue(now=later), (3, 0))
+
+    def test_reopened_behind_the_watermark(self):
+        returned, _ = self.borrows((-2, True), (-1, False))
+        self.assertEqual(overdue.scan_overdue(), (1, 1))
+
+        # the watermark has passed the returned borrow, reopening it brings
+        # it back to the next scan
+        Book.objects.filter(id=self.book.id).update(quantity=1)
+        response = self.client.put(f"/api/v1/borrows/{returned.id}")
+        self.assertEqual(
+            response.json()["message"], "Borrowed book has not been returned."
+        )
+        self.assertEqual(overdue.scan_overdue(), (1, 1))
+        self.assertTrue(OverdueBorrow.objects.filter(borrow_id=returned).exists())
+        self.assertEqual(overdue.scan_overdue(), (0, 0))
+
+    def test_created_behind_the_watermark(self):
+        self.borrows((-1, False))
+        self.assertEqual(overdue.scan_overdue(), (1, 1))
+
+        Book.objects.filter(id=self.book.id).update(quantity=1)
+        response = self.client.post(
+            "/api/v1/borrows",
+            {
+                "book_id": str(self.book.id),
+                "user_id": str(self.user.id),
+                "to_return_at": (django_timezone.now() - timedelta(days=3)).isoformat(),
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(overdue.scan_overdue(), (1, 1))
+        self.assertEqual(OverdueBorrow.objects.count(), 2)
+
+
+class BorrowCounterTests(TestCase):
+    """
+    The borrow counters of books and users follow borrows made, returned and
+    deleted through the api, and a fresh count agrees with them.
+    """
+
+    def test_counters_follow_borrows(self):
+        book = Book.objects.create(
+            book_name="Dune",
+            author_name="Frank Herbert",
+            category="Science",
+            quantity=2,
+        )
+        user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        due = (django_timezone.now() + timedelta(days=7)).isoformat()
+
+        def borrow():
+            self.client.post(
+                "/api/v1/borrows",
+                {"book_id": str(book.id), "user_id": str(user.id), "to_return_at": due},
+                content_type="application/json",
+            )
+
+        def assertCounts(active, total):
+            for instance in (book, user):
+                instance.refresh_from_db()
+                self.assertEqual(
+                    (instance.active_borrow_count, instance.total_borrow_count),
+                    (active, total),
+                )
+
+        borrow()
+        borrow()
+        assertCounts(2, 2)
+        returned, kept = Borrow.objects.values_list("id", flat=True)
+        self.client.put(f"/api/v1/borrows/{returned}")
+        assertCounts(1, 2)
+        self.client.delete(f"/api/v1/borrows/{kept}")
+        assertCounts(0, 1)
+
+        response = self.client.delete(f"/api/v1/books/{book.id}")
+        self.assertEqual(response.status_code, 409)
+
+        for model in counters.COUNTED:
+            self.assertFalse(counters.drifted(model).exists())
+
+    def test_deleting_an_open_borrow_puts_the_copy_back(self):
+        book = Book.objects.create(
+            book_name="Dune",
+            author_name="Frank Herbert",
+            category="Science",
+            quantity=3,
+        )
+        user = User.objects.create(
+            name="Reader",
+            email="reader@example.com",
+            phone_number="+8801700000000",
+            password="not-a-hash",
+        )
+        due = django_timezone.now() + timedelta(days=7)
+        for _ in range(2):
+            self.client.post(
+                "/api/v1/borrows",
+                {
+                    "book_id": str(book.id),
+                    "user_id": str(user.id),
+                    "to_return_at": due.isoformat(),
+                },
+                content_type="application/json",
+            )
+        returned, kept = Borrow.objects.values_list("id", flat=True)
+        self.client.put(f"/api/v1/borrows/{returned}")
+        book.refresh_from_db()
+        self.assertEqual(book.quantity, 2)
+
+        # a returned borrow already gave its copy back
+        self.client.delete(f"/api/v1/borrows/{returned}")
+        book.refresh_from_db()
+        self.assertEqual(book.quantity, 2)
+
+        self.client.delete(f"/api/v1/borrows/{kept}")
+        book.refresh_from_db()
+        self.assertEqual((book.quantity, book.active_borrow_count), (3, 0))
+
+
+class BorrowSummaryTests(TestCase):
+    """
+    The borrow summaries count total, active, returned and overdue borrows per
+    book and user, zero for one without borrows, in one query for many ids.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book, cls.idle_book = [
+            Book.objects.create(
+                book_name=book_name, author_name="Frank Herbert", category="Science"
+            )
+            for book_name in ["Dune", "Dune Messiah"]
+        ]
+        cls.user, cls.idle_user = [
+            User.objects.create(
+                name=name,
+                email=f"{name.lower()}@example.com",
+                phone_number=f"+88017000000{n}",
+                password="not-a-hash",
+            )
+            for n, name in enumerate(["Reader", "Idle"])
+        ]
+
+        # open and late, open and not due yet, returned after its due date
+        now = django_timezone.now()
+        for days, is_returned in [(-1, False), (7, False), (-3, True)]:
+            Borrow.objects.create(
+                user_id=cls.user,
+                book_id=cls.book,
+                to_return_at=now + timedelta(days=days),
+                is_returned=is_returned,
+            )
+        for model in counters.COUNTED:
+            counters.rebuild(model)
+
+    def counts(self, id, total, active, returned, overdue):
+        return {
+            "id": str(id),
+            "total_borrows": total,
+            "active_borrows": active,
+            "returned_borrows": returned,
+            "overdue_borrows": overdue,
+        }
+
+    def test_single(self):
+        for path, id, counts in [
+            ("books", self.book.id, (3, 2, 1, 1)),
+            ("books", self.idle_book.id, (0, 0, 0, 0)),
+            ("users", self.user.id, (3, 2, 1, 1)),
+            ("users", self.idle_user.id, (0, 0, 0, 0)),
+        ]:
+            with self.subTest(path=path, id=id):
+                response = self.client.get(f"/api/v1/{path}/{id}/borrow-summary")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["data"], self.counts(id, *counts))
+
+        response = self.client.get(f"/api/v1/books/{uuid.uuid4()}/borrow-summary")
+        self.assertEqual(response.status_code, 404)
+
+    def test_many(self):
+        missing = uuid.uuid4()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                "/api/v1/users/borrow-summary",
+                {"ids": f"{self.idle_user.id},{self.user.id},{missing},{self.user.id}"},
+            )
+        self.assertEqual(
+            response.json()["data"],
+            [
+                self.counts(self.idle_user.id, 0, 0, 0, 0),
+                self.counts(self.user.id, 3, 2, 1, 1),
+            ],
+        )
+        self.assertEqual(response.json()["not_found"], [str(missing)])
+
+
+class BookSearchTests(TestCase):
+    """
+    The fts5 index follows book writes through its triggers and ranks name
+    matches above author matches.
+    """
+
+    def names(self, q):
+        return [row.book_name for row in search.search_books(q, 10, 0)]
+
+    def test_search_follows_book_writes(self):
+        for book_name, author_name in [
+            ("Frankenstein", "Mary Shelley"),
+            ("Dune", "Frank Herbert"),
+            ("The Hobbit", "J. R. R. Tolkien"),
+        ]:
+            Book.objects.create(
+                book_name=book_name, author_name=author_name, category="Science"
+            )
+
+        self.assertEqual(self.names("frank"), ["Frankenstein", "Dune"])
+        # typed operators are words to match, not fts5 syntax
+        self.assertEqual(self.names('dune" OR hobbit'), [])
+
+        Book.objects.filter(book_name="The Hobbit").update(book_name="Dune Hobbit")
+        self.assertEqual(self.names("hobbit"), ["Dune Hobbit"])
+        Book.objects.filter(book_name="Dune Hobbit").delete()
+        self.assertEqual(self.names("hobbit"), [])
+
+    def test_rebuild_recreates_dropped_triggers(self):
+        book = Book.objects.create(
+            book_name="Dune", author_name="Frank Herbert", category="Science"
+        )
+        self.assertEqual(checks.check_book_search_triggers(None, ["default"]), [])
+
+        # what a migration rebuilding books_book leaves behind
+        with connection.cursor() as cursor:
+            for name in search.TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {name}")
+        Book.objects.filter(id=book.id).update(book_name="Children of Dune")
+        self.assertEqual(
+            [
+                error.id
+                for error in checks.check_book_search_triggers(None, ["default"])
+            ],
+            ["apis.E002"] * 3,
+        )
+        self.assertEqual(self.names("children"), [])
+
+        call_command("rebuild_book_search", stdout=io.StringIO())
+        self.assertEqual(checks.check_book_search_triggers(None, ["default"]), [])
+        self.assertEqual(self.names("children"), ["Children of Dune"])
+        Book.objects.filter(id=book.id).update(book_name="Dune Messiah")
+        self.assertEqual(self.names("messiah"), ["Dune Messiah"])
+
+    def test_query_needs_a_word(self):
+        response = self.client.get("/api/v1/books/search", {"q": "?!"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["type"], "search_query_empty")
+
+
+class PrefixIndexTests(TestCase):
+    """
+    The suggest index finds names by the start of any of their words, takes
+    book changes one at a time and polls for those of other processes.
+    """
+
+    def texts(self, index, prefix):
+        return [(found["type"], found["text"]) for found in index.lookup(prefix, 10)]
+
+    def test_changes_are_incremental(self):
+        index = suggest.PrefixIndex()
+        index.load(
+            [
+                ("1", "Dune", "Frank Herbert"),
+                ("2", "Dune Messiah", "Frank Herbert"),
+                ("3", "The Hobbit", "J. R. R. Tolkien"),
+            ]
+        )
+
+        self.assertEqual(self.texts(index, "DUNE m"), [("book", "Dune Messiah")])
+        self.assertEqual(self.texts(index, "hob"), [("book", "The Hobbit")])
+        self.assertEqual(self.texts(index, "herb"), [("author", "Frank Herbert")])
+
+        index.add([("3", "Café Crème", "J. R. R. Tolkien")])
+        self.assertEqual(self.texts(index, "hob"), [])
+        self.assertEqual(self.texts(index, "creme"), [("book", "Café Crème")])
+
+        # the author stays while any of their books does
+        index.discard("1")
+        self.assertEqual(self.texts(index, "frank"), [("author", "Frank Herbert")])
+        index.discard("2")
+        self.assertEqual(self.texts(index, "frank"), [])
+        self.assertEqual(index.stats()["keys"], 2 + 4)
+
+    def test_large_batches_are_merged_in_order(self):
+        index = suggest.PrefixIndex()
+        index.load([(str(n), f"Book {n:03}", "Author") for n in range(0, 600, 2)])
+        # 300 books of two words each, past the insort threshold
+        index.add([(str(n), f"Book {n:03}", "Author") for n in range(1, 600, 2)])
+        index.add([("1", "Renamed", "Author")])
+
+        suffixes = [index.suffix(key) for key in index.keys]
+        self.assertEqual(suffixes, sorted(suffixes))
+        self.assertEqual(index.stats()["keys"], 2 * 599 + 1 + 1)
+        self.assertEqual(
+            self.texts(index, "book 00"),
+            [("book", f"Book {n:03}") for n in [0, 2, 3, 4, 5, 6, 7, 8, 9]],
+        )
+        self.assertEqual(self.texts(index, "ren"), [("book", "Renamed")])
+
+    def test_writes_of_other_processes_come_in_by_polling(self):
+        dune, hobbit = [
+            Book.objects.create(
+                book_name=book_name, author_name=author_name, category="Science"
+            )
+            for book_name, author_name in [
+                ("Dune", "Frank Herbert"),
+                ("The Hobbit", "J. R. R. Tolkien"),
+            ]
+        ]
+        state = {"_generation": None, "_since": None, "_next_poll": 0.0}
+        with mock.patch.multiple(suggest, index=suggest.PrefixIndex(), **state):
+            index = suggest.index
+            suggest.ensure_current()
+
+            # another process, with an index of its own, renames, deletes and
+            # creates books
+            with mock.patch.object(suggest, "index", suggest.PrefixIndex()):
+                with self.captureOnCommitCallbacks(execute=True):
+                    dune.book_name = "Dune Messiah"
+                    dune.save()
+                    hobbit.delete()
+                    Book.objects.create(
+                        book_name="Lud-in-the-Mist",
+                        author_name="Hope Mirrlees",
+                        category="Fantasy",
+                    )
+
+            # seen at the next poll
+            suggest.ensure_current()
+            self.assertEqual(self.texts(index, "hob"), [("book", "The Hobbit")])
+            suggest._next_poll = 0.0
+            suggest.ensure_current()
+            self.assertEqual(self.texts(index, "dune m"), [("book", "Dune Messiah")])
+            self.assertEqual(self.texts(index, "hob"), [])
+            self.assertEqual(self.texts(index, "tolk"), [])
+            self.assertEqual(self.texts(index, "lud"), [("book", "Lud-in-the-Mist")])
+
+
+class BookFacetTests(TestCase):
+    """
+    Facet counts apply the other filters but not their own, and a book write
+    makes the cached counts stale.
+    """
+
+    def test_facets_follow_filters_and_writes(self):
+        for book_name, author_name, category, quantity in [
+            ("Dune", "Frank Herbert", "Science", 1),
+            ("Dune Messiah", "Frank Herbert", "Science", 0),
+            ("Lud-in-the-Mist", "Hope Mirrlees", "Fantasy", 2),
+        ]:
+            Book.objects.create(
+                book_name=book_name,
+                author_name=author_name,
+                category=category,
+                quantity=quantity,
+            )
+
+        def get_facets(**query):
+            response = self.client.get("/api/v1/books/q", {**query, "limit": 1})
+            return {
+                field: {row["value"]: (row["count"], row["in_stock"]) for row in rows}
+                for field, rows in response.json()["facets"].items()
+            }
+
+        found = get_facets(facets="category,author_name", category="Science")
+        self.assertEqual(len(found["category"]), len(BOOK_CATEGORIES))
+        self.assertEqual(found["category"]["Science"], (2, 1))
+        self.assertEqual(found["category"]["Fantasy"], (1, 1))
+        self.assertEqual(found["author_name"], {"Frank Herbert": (2, 1)})
+
+        # the generation bump waits for the commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(book_name="Dune Messiah").delete()
+        found = get_facets(facets="category,author_name", category="Science")
+        self.assertEqual(found["category"]["Science"], (1, 1))
+        self.assertEqual(found["author_name"], {"Frank Herbert": (1, 1)})
+
+
+class JSONParityTests(SimpleTestCase):
+    """
+    The orjson renderer and parser give the same bytes and values as drf's
+    JSONRenderer and JSONParser.
+    """
+
+    def test_renderer(self):
+        data = {
+            "id": uuid.uuid4(),
+            "created_at": datetime(2024, 5, 1, 12, 30, 5, 123456, tzinfo=timezone.utc),
+            "local": datetime(2024, 5, 1, 12, 30, tzinfo=timezone(timedelta(hours=6))),
+            "naive": datetime(2024, 5, 1, 12, 30),
+            "day": date(2024, 5, 1),
+            "price": Decimal("12.50"),
+            "name": "Café Crème 東京 \u2028\u2029",
+            "values": [1, 2.5, None, True],
+            3: "non-string key",
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), JSONRenderer().render(None))
+
+        # floats in exponent form are written apart but read back the same
+        data = {"values": [1e20, 1e-7]}
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data)),
+        )
+
+    def test_parser(self):
+        bodies = [
+            ('{"name": "Café \\u00e9 東京", "price": 12.50, "ids": [1, null]}', {}),
+            ('{"name": "Caf\xe9"}'.encode("latin-1"), {"encoding": "latin-1"}),
+        ]
+        for body, parser_context in bodies:
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            with self.subTest(body=body):
+                self.assertEqual(
+                    FastJSONParser().parse(io.BytesIO(body), None, parser_context),
+                    JSONParser().parse(io.BytesIO(body), None, parser_context),
+                )
+
+        for parser in (FastJSONParser(), JSONParser()):
+            with self.subTest(parser=parser), self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(b'{"name": '))
+
+
+class SQLitePragmaTests(TestCase):
+    """
+    Every new sqlite connection runs settings.SQLITE_PRAGMAS.
+    """
+
+    # python's sqlite3 waits 5 seconds by default, the setting's value as well
+    @override_settings(SQLITE_PRAGMAS={**settings.SQLITE_PRAGMAS, "busy_timeout": 1234})
+    def test_new_connections_get_the_pragmas(self):
+        connection = connections.create_connection("default")
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA busy_timeout")
+                busy_timeout = cursor.fetchone()[0]
+                cursor.execute("PRAGMA synchronous")
+                synchronous = cursor.fetchone()[0]
+        finally:
+            connection.close()
+
+        self.assertEqual(busy_timeout, settings.SQLITE_PRAGMAS["busy_timeout"])
+        # sqlite answers with the level's number
+        levels = ["off", "normal", "full", "extra"]
+        self.assertEqual(levels[synchronous], settings.SQLITE_PRAGMAS["synchronous"])
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    GET requests read from a replica until they write, a write keeps the
+    client on the primary through the pin cookie.
+    """
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_reads_follow_writes(self):
+        router = replicas.ReplicaRouter()
+        factory = RequestFactory()
+        read_from = []
+
+        def view(request):
+            read_from.append(router.db_for_read(Book))
+            if "write" in request.GET:
+                router.db_for_write(Book)
+                read_from.append(router.db_for_read(Book))
+            return HttpResponse()
+
+        middleware = replicas.ReplicaMiddleware(view)
+
+        response = middleware(factory.get("/"))
+        self.assertEqual(read_from, ["replica"])
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+        read_from.clear()
+        response = middleware(factory.get("/", {"write": ""}))
+        self.assertEqual(read_from, ["replica", None])
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        read_from.clear()
+        pinned = factory.get("/")
+        pinned.COOKIES[replicas.PIN_COOKIE] = response.cookies[
+            replicas.PIN_COOKIE
+        ].value
+        middleware(pinned)
+        middleware(factory.post("/"))
+        self.assertEqual(read_from, [None, None])
+
+        # outside of a request everything stays on the primary
+        self.assertIsNone(router.db_for_read(Book))
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_writes_of_other_processes_keep_replica_reads_out_of_caches(self):
+        caches["default"].clear()
+        router = replicas.ReplicaRouter()
+        body = {"status": "success"}
+
+        def view(request):
+            response_cache.store("books:list", body)
+            return HttpResponse(str(replicas.replica_may_lag()))
+
+        middleware = replicas.ReplicaMiddleware(view)
+
+        # each process only knows its own writes through _last_write, the
+        # shared cache stands in for the others
+        def process(last_write, last_shared_write):
+            return mock.patch.multiple(
+                replicas,
+                _last_write=last_write,
+                _last_shared_write=last_shared_write,
+            )
+
+        with process(0.0, None):
+            self.assertEqual(middleware(RequestFactory().get("/")).content, b"False")
+            self.assertEqual(response_cache.load("books:list"), body)
+        caches["default"].clear()
+
+        # process a writes, process b reads from a replica right after
+        with process(0.0, None):
+            router.db_for_write(Book)
+        with process(0.0, None):
+            self.assertEqual(middleware(RequestFactory().get("/")).content, b"True")
+            self.assertIsNone(response_cache.load("books:list"))
+
+        # once the replicas had the time to catch up b fills the caches again
+        caches["default"].delete(replicas.RECENT_WRITE_KEY)
+        with process(0.0, None):
+            self.assertEqual(middleware(RequestFactory().get("/")).content, b"False")
+            self.assertEqual(response_cache.load("books:list"), body)
+
+
+class MetricsTests(TestCase):
+    """
+    /metrics lists each route once whatever its ids, with the sql queries its
+    requests ran.
+    """
+
+    def test_requests_are_counted_per_route(self):
+        book = Book.objects.create(
+            book_name="Dune", author_name="Frank Herbert", category="Science"
+        )
+        before = metrics.merged_series()
+        for _ in range(2):
+            self.client.get(f"/api/v1/books/{book.id}", {"include": "active_borrows"})
+        self.client.get(f"/api/v1/books/{uuid.uuid4()}")
+
+        key = ("api/v1/books/<uuid:id>", "GET", 200)
+        values = metrics.merged_series()[key]
+        previous = before.get(key)
+        count = previous[metrics.COUNT] if previous else 0
+        queries = previous[metrics.QUERIES] if previous else 0
+        # the book and its open borrows, each time
+        self.assertEqual(values[metrics.COUNT] - count, 2)
+        self.assertEqual(values[metrics.QUERIES] - queries, 4)
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{route="api/v1/books/<uuid:id>",'
+            'method="GET",status="404"}',
+            body,
+        )
+        self.assertIn("bookstore_object_cache_lookups_total", body)
+
+    def test_streams_are_counted_once_read(self):
+        for n in range(3):
+            Book.objects.create(
+                book_name=f"Book {n}", author_name="Author", category="Science"
+            )
+        key = ("api/v1/books/export", "GET", 200)
+
+        def counts():
+            values = metrics.merged_series().get(key)
+            return (
+                (values[metrics.COUNT], values[metrics.QUERIES]) if values else (0, 0)
+            )
+
+        before = counts()
+        response = self.client.get("/api/v1/books/export", {"file_format": "csv"})
+        self.assertEqual(counts(), before)
+
+        # the export query runs while the stream is read
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 4)
+        self.assertEqual(counts(), (before[0] + 1, before[1] + 1))
+
+    def test_metrics_are_not_public(self):
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8"]):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(
+                self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 200
+            )
+
+        with override_settings(METRICS_ALLOWED_IPS=[]):
+            self.client.force_login(
+                AuthUser.objects.create(username="staff", is_staff=True)
+            )
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_finished_threads_are_retired(self):
+        key = ("threads", "GET", 200)
+        threads = [
+            threading.Thread(target=metrics.record, args=(*key, 0.01, 2, 0.001))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+
+        # their counts stay, their dicts go
+        self.assertEqual(
+            metrics.merged_series()[key][: metrics.SQL_SECONDS], [5, 0.05, 10]
+        )
+        with metrics._thread_series_lock:
+            self.assertFalse(any(key in series for series in metrics._thread_series))
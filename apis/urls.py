@@ -5,24 +5,48 @@ urlpatterns = [
     # users urls
     # create user
     path("users", users_views.create_user),
+    # import users from a csv or jsonl upload
+    path("users/import", users_views.import_users),
     # update membership status
     path("users/membership/<uuid:id>", users_views.update_membership),
     # get a list of users
     path("users/q", users_views.get_users),
+    # stream every user matching the list filters
+    path("users/export", users_views.export_users),
     # user action using an id
     path("users/<uuid:id>", users_views.user_actions),
+    # borrow counts of many users at once, ?ids=<uuid>,<uuid>
+    path("users/borrow-summary", users_views.users_borrow_summary),
+    # active, returned and overdue borrow counts of a user
+    path("users/<uuid:id>/borrow-summary", users_views.user_borrow_summary),
     # books urls
     # create book
     path("books", books_views.create_book),
+    # import books from a csv or jsonl upload
+    path("books/import", books_views.import_books),
     # get a list of books through query filtering
     path("books/q", books_views.get_books),
+    # ranked full text search over book and author names, ?q=
+    path("books/search", books_views.search_books),
+    # book and author names starting with ?prefix=, for a search box
+    path("books/suggest", books_views.suggest_books),
+    # stream every book matching the list filters
+    path("books/export", books_views.export_books),
     # books actions by id
     path("books/<uuid:id>", books_views.books_actions),
+    # borrow counts of many books at once, ?ids=<uuid>,<uuid>
+    path("books/borrow-summary", books_views.books_borrow_summary),
+    # outstanding, returned and overdue loans of a book
+    path("books/<uuid:id>/borrow-summary", books_views.book_borrow_summary),
     # borrow url
     # route for creating a borrow
     path("borrows", borrows_views.create_borrow),
+    # create many borrows in one request
+    path("borrows/batch", borrows_views.create_borrows_batch),
     # get a list of borrows based on queries
     path("borrows/q", borrows_views.get_borrows),
+    # stream the borrow history matching the list filters
+    path("borrows/export", borrows_views.export_borrows),
     # boorrow actions using the id url parameter
     path("borrows/<uuid:id>", borrows_views.borrow_actions),
 ]
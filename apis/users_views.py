@@ -1,80 +1,40 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from .validators import user_validators
+from .validation import validate
 from pydantic import ValidationError
 from rest_framework import status
-from users.models import User
-import bcrypt
-from .serializers import serializers
-from borrows.models import Borrow
+from django.http import StreamingHttpResponse
+from .serializers.rows import user_rows
+from .handlers import respond, users as user_handlers
+from . import exporters, importers, queries
+import time
+
+# rejected rows listed in an import response
+MAX_REPORTED_REJECTIONS = 1000
 
 
 @api_view(["POST"])
-def create_user(request):
-    try:
-        # validate req data
-        validate_data = user_validators.create_user_validator(**request.data)
-    except ValidationError as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Failed in type validation",
-                "errors": e.errors(),
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+@validate(body=user_validators.create_user_validator)
+def create_user(request, validate_data):
+    return respond(user_handlers.create_user(validate_data))
 
-        # check duplicate values exists
-    if User.objects.filter(email=validate_data.email).exists():
-        return Response(
-            {"status": "error", "message": "User with this email already exists."},
-            status=status.HTTP_409_CONFLICT,
-        )
 
-    if User.objects.filter(phone_number=validate_data.phone_number).exists():
+@api_view(["POST"])
+def import_users(request):
+    upload = request.FILES.get("file")
+    if upload is None:
         return Response(
-            {
-                "status": "error",
-                "message": "User with this phone number already exists.",
-            },
-            status=status.HTTP_409_CONFLICT,
+            {"status": "error", "message": "No file has been uploaded."},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
     try:
-        # password hashing
-        bytes = validate_data.password.encode("utf-8")
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(bytes, salt)
-
-        # create the user
-        User.objects.create(
-            name=validate_data.name,
-            email=validate_data.email,
-            phone_number=validate_data.phone_number,
-            password=hashed_password,
-            membership_paid=validate_data.membership_paid,
-        )
-
-        return Response(
-            {"status": "success", "message": "User has been created"},
-            status=status.HTTP_201_CREATED,
+        # validate the format, guessed from the file name when not given
+        format_raw = (
+            request.data.get("format") or upload.name.rsplit(".", 1)[-1].lower()
         )
-
-    except Exception as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Internal server error.",
-            },
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
-
-
-@api_view(["PUT"])
-def update_membership(request, id):
-    try:
-        # validate req id
-        validate_data = user_validators.update_membership_validator(id=id)
+        validate_data = user_validators.import_users_validator(format=format_raw)
     except ValidationError as e:
         return Response(
             {
@@ -85,256 +45,91 @@ def update_membership(request, id):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        # find the user
-        found_user = User.objects.get(id=validate_data.id)
-    except User.DoesNotExist:
-        return Response(
-            {"status": "error", "message": "No user has been found."},
-            status=status.HTTP_404_NOT_FOUND,
-        )
-
-    # if the membership is already paid
-    if found_user.membership_paid == True:
-        return Response(
-            {"status": "error", "message": "Membership is already paid."},
-            status=status.HTTP_409_CONFLICT,
-        )
-
-    try:
-        # update the user
-        found_user.membership_paid = True
-        found_user.save()
-
-        return Response(
-            {"status": "success", "message": "User has been updated."},
-            status=status.HTTP_200_OK,
-        )
-    except Exception as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Internal server error.",
-            },
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    # keep the response bounded, the counts still cover every row
+    rejections = []
 
+    def on_reject(number, errors):
+        if len(rejections) < MAX_REPORTED_REJECTIONS:
+            rejections.append({"row": number, "errors": errors})
 
-@api_view(["GET"])
-def get_users(request):
     try:
-        # validate queries
-        filter_by_raw_query = request.query_params.get("filter_by")
-        limit_raw_query = request.query_params.get("limit")
-        offset_raw_query = request.query_params.get("offset")
-
-        validate_query = user_validators.get_users(
-            filter_by_raw_query=filter_by_raw_query,
-            limit_raw_query=limit_raw_query,
-            offset_raw_query=offset_raw_query,
+        started_at = time.perf_counter()
+        imported, rejected = importers.import_users(
+            importers.iter_rows(upload, validate_data.format),
+            on_reject=on_reject,
         )
+        elapsed = time.perf_counter() - started_at
 
-    except ValidationError as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Failed in type validation.",
-                "errors": e.errors(),
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    try:
-        # get data based on query and return data
-        if validate_query.filter_by == "first_to_add":
-            user_data = User.objects.all().order_by("created_at")[
-                validate_query.offset : validate_query.offset + validate_query.limit
-            ]
-            serialized_user_data = serializers.UserSerializer(user_data)
-
-            return Response(
-                {
-                    "status": "success",
-                    "message": "User data has been fetched.",
-                    "data": serialized_user_data.data,
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        # get data based on query and return data
-        elif validate_query.filter_by == "last_to_add":
-            user_data = User.objects.all().order_by("-created_at")[
-                validate_query.offset : validate_query.offset + validate_query.limit
-            ]
-            serialized_user_data = serializers.UserSerializer(user_data)
-
-            return Response(
-                {
-                    "status": "success",
-                    "message": "User data has been fetched.",
-                    "data": serialized_user_data.data,
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        # get data based on query and return data
-        elif validate_query.filter_by == "unpaid_member":
-            user_data = User.objects.filter(membership_paid=False)[
-                validate_query.offset : validate_query.offset + validate_query.limit
-            ]
-            serialized_user_data = serializers.UserSerializer(user_data)
-
-            return Response(
-                {
-                    "status": "success",
-                    "message": "User data has been fetched.",
-                    "data": serialized_user_data.data,
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        # get data based if no query and return data
-        user_data = User.objects.all()[
-            validate_query.offset : validate_query.offset + validate_query.limit
-        ]
-        serialized_user_data = serializers.UserSerializer(user_data, many=True)
         return Response(
             {
                 "status": "success",
-                "message": "User data has been fetched.",
-                "data": serialized_user_data.data,
+                "message": f"{imported} users have been imported.",
+                "data": {
+                    "imported": imported,
+                    "rejected": rejected,
+                    "seconds": round(elapsed, 3),
+                    "users_per_second": round(imported / elapsed, 1),
+                    "rejections": rejections,
+                },
             },
             status=status.HTTP_200_OK,
         )
-    except Exception as e:
+    except Exception:
         return Response(
             {"status": "error", "message": "Internal server error."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
 
-@api_view(["GET", "PUT", "DELETE"])
-def user_actions(request, id):
-    try:
-        # validate req params
-        validate_param = user_validators.update_membership_validator(id=id)
-    except ValidationError as e:
-        return Response(
-            {
-                "status": "error",
-                "message": "Failed in type validation.",
-                "errors": e.errors(),
-            },
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+@api_view(["PUT"])
+@validate(path=user_validators.update_membership_validator)
+def update_membership(request, validate_param):
+    return respond(user_handlers.update_membership(validate_param))
 
-    try:
-        # check if the data exists
-        found_user = User.objects.get(id=validate_param.id)
-    except User.DoesNotExist:
-        return Response(
-            {"status": "error", "message": "No user found with this id."},
-            status=status.HTTP_404_NOT_FOUND,
-        )
 
-    # if the method was get
-    if request.method == "GET":
-        try:
-            # serialize and then send the data
-            serialized_data = serializers.UserSerializer(found_user)
+@api_view(["GET"])
+@validate(query=user_validators.get_users)
+def get_users(request, validate_query):
+    return respond(user_handlers.get_users(request, validate_query))
 
-            return Response(
-                {
-                    "status": "success",
-                    "message": "User data has been fetched.",
-                    "data": serialized_data.data,
-                },
-                status=status.HTTP_200_OK,
-            )
-        except Exception:
-            return Response(
-                {"status": "error", "message": "Internal server error."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
 
-    # if the method was put
-    elif request.method == "PUT":
-        try:
-            validate_data = user_validators.UpdateUser(**request.data)
-        except ValidationError as e:
-            return Response(
-                {
-                    "status": "error",
-                    "message": "Failed in type validation.",
-                    "errors": e.errors(),
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+@api_view(["GET"])
+@validate(query=user_validators.export_users_validator)
+def export_users(request, validate_query):
+    # stream every matching user in a stable order, one chunk at a time
+    users = queries.users_export_queryset(validate_query)
 
-        # check if the data is same as the current values
-        if (
-            (found_user.name == validate_data.name)
-            or (found_user.email == validate_data.email)
-            or (found_user.phone_number == validate_data.phone_number)
-        ):
-            return Response(
-                {"status": "error", "message": "No changes found to update."},
-                status=status.HTTP_409_CONFLICT,
-            )
+    response = StreamingHttpResponse(
+        exporters.iter_export(users, user_rows, validate_query.format),
+        content_type=exporters.CONTENT_TYPES[validate_query.format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="users.{validate_query.format}"'
+    )
+    return response
 
-        # check for duplicate values
-        if User.objects.filter(email=validate_data.email).exists():
-            return Response(
-                {"status": "error", "message": "User with this email already exists."},
-                status=status.HTTP_409_CONFLICT,
-            )
-        if User.objects.filter(phone_number=validate_data.phone_number).exists():
-            return Response(
-                {
-                    "status": "error",
-                    "message": "User with this phone number already exists.",
-                },
-                status=status.HTTP_409_CONFLICT,
-            )
 
-        try:
-            # update the user
-            found_user.name = validate_data.name
-            found_user.email = validate_data.email
-            found_user.phone_number = validate_data.phone_number
+@api_view(["GET", "PUT", "DELETE"])
+@validate(
+    path=user_validators.update_membership_validator,
+    query=user_validators.user_actions_query_validator,
+    body=user_validators.UpdateUser,
+)
+def user_actions(request, validate_param, validate_query, validate_data):
+    return respond(
+        user_handlers.user_actions(
+            request, validate_param, validate_query, validate_data
+        )
+    )
 
-            found_user.save()
-            return Response(
-                {"status": "success", "message": "User has been updated."},
-                status=status.HTTP_200_OK,
-            )
-        except Exception as e:
-            return Response(
-                {"status": "error", "message": "Internal server error."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-    # if the method is a delete
-    elif request.method == "DELETE":
-        # check if the user has some borrowed books
-        found_borrows_by_user = Borrow.objects.filter(user_id=found_user.id)
-        if len(found_borrows_by_user) > 0:
-            return Response(
-                {
-                    "status": "error",
-                    "message": f"User has {len(found_borrows_by_user)} books borrowed.",
-                },
-                status=status.HTTP_409_CONFLICT,
-            )
 
-        try:
-            # delete the user
-            User.objects.filter(id=found_user.id).delete()
+@api_view(["GET"])
+@validate(path=user_validators.update_membership_validator)
+def user_borrow_summary(request, validate_param):
+    return respond(user_handlers.user_borrow_summary(validate_param))
+
 
-            return Response(
-                {"status": "success", "message": "User has been deleted."},
-                status=status.HTTP_200_OK,
-            )
-        except Exception:
-            return Response(
-                {"status": "error", "message": "Internal server error."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+@api_view(["GET"])
+@validate(query=user_validators.users_borrow_summary_validator)
+def users_borrow_summary(request, validate_query):
+    return respond(user_handlers.users_borrow_summary(validate_query))
@@ -1,6 +1,10 @@
-from pydantic import BaseModel, Field, UUID4
+from pydantic import BaseModel, BeforeValidator, Field, UUID4
 from enum import Enum
-from typing import Optional
+from typing import Annotated, Literal, Optional
+from ..facets import Facets
+from ..pagination import Cursor
+from ..relations import Include, comma_separated
+from ..search import SearchQuery
 
 
 class BookCategory(str, Enum):
@@ -54,16 +58,53 @@ class create_book_validator(BaseModel):
     quantity: int = Field(default=1)
 
 
+class import_books_validator(BaseModel):
+    format: Literal["csv", "jsonl"]
+
+
 class get_books_query_validators(BaseModel):
     category: Optional[BookCategory] = Field(default=None)
     author_name: Optional[str] = Field(default=None)
-    limit: Optional[int] = Field(default=10)
-    offset: Optional[int] = Field(default=0)
+    limit: int = Field(default=10, ge=1)
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[Cursor] = Field(default=None)
+    # ?facets=category,author_name
+    facets: Facets = Field(default=frozenset())
+
+
+class search_books_query_validators(BaseModel):
+    q: SearchQuery = Field(max_length=100)
+    # every page ranks all the matches before it, so pages stay shallow
+    limit: int = Field(default=10, ge=1, le=100)
+    offset: int = Field(default=0, ge=0, le=1000)
+
+
+class suggest_books_query_validators(BaseModel):
+    prefix: str = Field(min_length=1, max_length=50)
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class export_books_validator(BaseModel):
+    category: Optional[BookCategory] = Field(default=None)
+    author_name: Optional[str] = Field(default=None)
+    # "format" is taken, drf reads it to pick a renderer
+    format: Literal["csv", "jsonl"] = Field(default="jsonl", alias="file_format")
 
 
 class books_actions_validators(BaseModel):
     id: UUID4
 
 
+class books_actions_query_validators(BaseModel):
+    include: Include = Field(default=frozenset())
+
+
 class update_book_by_id(BaseModel):
     quantity: int = Field(ge=1)
+
+
+class books_borrow_summary_validators(BaseModel):
+    # ?ids=<uuid>,<uuid>,...
+    ids: Annotated[list[UUID4], BeforeValidator(comma_separated)] = Field(
+        min_length=1, max_length=100
+    )
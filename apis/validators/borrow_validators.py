@@ -1,18 +1,36 @@
-from pydantic import BaseModel, UUID4, Field
+from pydantic import BaseModel, UUID4, Field, RootModel
 from datetime import datetime
-from typing import Optional
+from typing import Any, Literal, Optional
+from ..pagination import Cursor
+from ..relations import Expand
 
 class create_borrow_validators(BaseModel):
     book_id: UUID4
     user_id: UUID4
     to_return_at: datetime
 
+class create_borrows_batch_validators(RootModel):
+    # items are checked one by one against create_borrow_validators
+    root: list[Any] = Field(min_length=1, max_length=100)
+
 class get_borrows_validator(BaseModel):
     book_id: Optional[UUID4] = Field(default=None)
     user_id: Optional[UUID4] = Field(default=None)
     is_returned: Optional[bool] = Field(default=None)
-    limit: Optional[int] = Field(default=10)
-    offset: Optional[int] = Field(default=0)
+    limit: int = Field(default=10, ge=1)
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[Cursor] = Field(default=None)
+    expand: Expand = Field(default=frozenset())
+
+class export_borrows_validator(BaseModel):
+    book_id: Optional[UUID4] = Field(default=None)
+    user_id: Optional[UUID4] = Field(default=None)
+    is_returned: Optional[bool] = Field(default=None)
+    # "format" is taken, drf reads it to pick a renderer
+    format: Literal["csv", "jsonl"] = Field(default="jsonl", alias="file_format")
 
 class borrow_actions_validators(BaseModel):
-    id: UUID4
\ No newline at end of file
+    id: UUID4
+
+class borrow_actions_query_validators(BaseModel):
+    expand: Expand = Field(default=frozenset())
\ No newline at end of file
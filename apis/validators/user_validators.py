@@ -1,6 +1,8 @@
-from pydantic import BaseModel, EmailStr, Field, UUID4, model_validator
+from pydantic import BaseModel, BeforeValidator, EmailStr, Field, UUID4, model_validator
 from enum import Enum
-from typing import Optional
+from typing import Annotated, Literal, Optional
+from ..pagination import Cursor
+from ..relations import Include, comma_separated
 
 
 class FilterEnum(str, Enum):
@@ -17,17 +19,39 @@ class create_user_validator(BaseModel):
     membership_paid: bool
 
 
+class import_users_validator(BaseModel):
+    format: Literal["csv", "jsonl"]
+
+
 class update_membership_validator(BaseModel):
     id: UUID4
 
 
+class user_actions_query_validator(BaseModel):
+    include: Include = Field(default=frozenset())
+
+
 class get_users(BaseModel):
     filter_by: Optional[FilterEnum] = Field(default=None)
-    limit: int = Field(default=10)
-    offset: int = Field(default=0)
+    limit: int = Field(default=10, ge=1)
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[Cursor] = Field(default=None)
+
+
+class export_users_validator(BaseModel):
+    filter_by: Optional[FilterEnum] = Field(default=None)
+    # "format" is taken, drf reads it to pick a renderer
+    format: Literal["csv", "jsonl"] = Field(default="jsonl", alias="file_format")
 
 
 class UpdateUser(BaseModel):
     name: str = Field(min_length=3, max_length=50)
     email: EmailStr
     phone_number: str = Field(max_length=14)
+
+
+class users_borrow_summary_validator(BaseModel):
+    # ?ids=<uuid>,<uuid>,...
+    ids: Annotated[list[UUID4], BeforeValidator(comma_separated)] = Field(
+        min_length=1, max_length=100
+    )
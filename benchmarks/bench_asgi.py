@@ -0,0 +1,163 @@
+"""
+Throughput and tail latency of the sync views under WSGI vs the async views
+under ASGI.
+
+Many concurrent clients run on one event loop and keep reading a book and a
+page of users, with every ``--signup-every``-th request a signup. The WSGI runs
+hand each request to a fixed pool of worker threads, like a threaded WSGI
+server would, so latency includes the wait for a free worker. The ASGI runs go
+through django's async request handler, once with the DRF views and once with
+the views under api/v1/async/.
+
+Requests go through django's test client handlers in process, so this measures
+the handler and the views, not a server or the network. To compare real
+deployments, point a load generator at e.g.
+
+    gunicorn --threads 8 bookstore_subscription_apis.wsgi
+    uvicorn bookstore_subscription_apis.asgi:application
+
+    python benchmarks/bench_asgi.py --concurrency 64 --wsgi-threads 8
+"""
+
+import argparse
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Timer, format_stats, percentiles, setup_django, teardown_django
+
+# unique emails and phone numbers across every run
+signup_numbers = itertools.count()
+
+
+def next_request(count, signup_every, book_id):
+    if signup_every and count % signup_every == 0:
+        n = next(signup_numbers)
+        return (
+            "signup",
+            "post",
+            "users",
+            {
+                "name": f"bench user {n}",
+                "email": f"user-{n}@bench.example",
+                "phone_number": f"+{n:013d}",
+                "password": "benchmark-password",
+                "membership_paid": False,
+            },
+        )
+    if count % 2:
+        return "read", "get", f"books/{book_id}", None
+    return "read", "get", "users/q?limit=10", None
+
+
+async def run(label, send, args, book_id):
+    samples = {"read": [], "signup": []}
+    deadline = time.perf_counter() + args.duration
+
+    async def client(number):
+        for count in itertools.count(number):
+            if time.perf_counter() >= deadline:
+                return
+            kind, method, path, body = next_request(count, args.signup_every, book_id)
+            started_at = time.perf_counter()
+            await send(method, path, body)
+            samples[kind].append(time.perf_counter() - started_at)
+
+    with Timer() as timer:
+        await asyncio.gather(*(client(number) for number in range(args.concurrency)))
+
+    total = len(samples["read"]) + len(samples["signup"])
+    print(f"{label}: {total / timer.elapsed:.1f} requests/s")
+    print(format_stats("  reads", percentiles(samples["read"]), timer.elapsed))
+    if args.signup_every:
+        print(format_stats("  signups", percentiles(samples["signup"]), timer.elapsed))
+
+
+def wsgi_sender(threads):
+    from django.test import Client
+
+    pool = ThreadPoolExecutor(max_workers=threads)
+    local = threading.local()
+
+    def call(method, path, body):
+        if not hasattr(local, "client"):
+            local.client = Client()
+        if body is None:
+            return getattr(local.client, method)(f"/api/v1/{path}")
+        return getattr(local.client, method)(
+            f"/api/v1/{path}", body, content_type="application/json"
+        )
+
+    async def send(method, path, body):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, call, method, path, body)
+
+    return send, pool
+
+
+def asgi_sender(prefix):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+
+    async def send(method, path, body):
+        if body is None:
+            return await getattr(client, method)(f"{prefix}{path}")
+        return await getattr(client, method)(
+            f"{prefix}{path}", body, content_type="application/json"
+        )
+
+    return send
+
+
+async def main_async(args, book_id):
+    send, pool = wsgi_sender(args.wsgi_threads)
+    await run(f"wsgi, {args.wsgi_threads} threads, sync views", send, args, book_id)
+    pool.shutdown()
+
+    await run("asgi, sync views", asgi_sender("/api/v1/"), args, book_id)
+    await run("asgi, async views", asgi_sender("/api/v1/async/"), args, book_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--wsgi-threads", type=int, default=8)
+    parser.add_argument("--signup-every", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from books.models import Book
+    from users.models import User
+
+    if args.rounds is not None:
+        settings.BCRYPT_ROUNDS = args.rounds
+    print(f"bcrypt rounds: {settings.BCRYPT_ROUNDS}, concurrency: {args.concurrency}")
+
+    book = Book.objects.create(
+        book_name="Benchmark", author_name="Bench", category="Science", quantity=5
+    )
+    User.objects.bulk_create(
+        User(
+            name=f"reader {n}",
+            email=f"reader-{n}@bench.example",
+            phone_number=f"+1{n:012d}",
+            password="not-a-hash",
+            membership_paid=False,
+        )
+        for n in range(100)
+    )
+
+    try:
+        asyncio.run(main_async(args, book.id))
+    finally:
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Render and parse speed of DRF's JSONRenderer/JSONParser vs the orjson backed
+FastJSONRenderer/FastJSONParser.
+
+Payloads are built from seeded rows the way the endpoints build them: a books
+page and a borrows page from the list serializers, a borrow detail from the
+ModelSerializer, the borrow batch response with raw UUIDs in it and the batch
+request body. Every payload is checked to render the same bytes both ways.
+
+    python benchmarks/bench_json.py --page-size 100 --repeat 200
+"""
+
+import argparse
+import io
+
+from common import best_rate, seed_rows, setup_django, teardown_django
+
+
+def payloads(page_size):
+    from django.utils import timezone
+    from apis.serializers import rows, serializers
+    from books.models import Book
+    from borrows.models import Borrow
+
+    books = rows.book_rows.values(Book.objects.order_by("created_at", "id"))
+    borrows = rows.borrow_rows.values(Borrow.objects.order_by("borrowed_at", "id"))
+    borrow_ids = list(Borrow.objects.values_list("id", "book_id", "user_id"))
+
+    return [
+        (
+            "books page",
+            {
+                "status": "success",
+                "message": "Books data have been fetched.",
+                "data": rows.book_rows.serialize(books[:page_size]),
+                "next_cursor": "WyIyMDI0LTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgIjEiXQ",
+            },
+        ),
+        (
+            "borrows page",
+            {
+                "status": "success",
+                "message": "Borrow data has been fetched.",
+                "data": rows.borrow_rows.serialize(borrows[:page_size]),
+            },
+        ),
+        (
+            "borrow detail",
+            {
+                "status": "success",
+                "message": "Borrow data has been fetched.",
+                "data": serializers.BorrowSerializer(Borrow.objects.first()).data,
+            },
+        ),
+        (
+            "batch response",
+            {
+                "status": "success",
+                "message": f"{page_size} of {page_size} borrows have been created.",
+                "data": [
+                    {
+                        "index": index,
+                        "status": "success",
+                        "message": "Borrow has been created.",
+                        "id": id,
+                    }
+                    for index, (id, _, _) in enumerate(borrow_ids[:page_size])
+                ],
+            },
+        ),
+        (
+            "batch request",
+            [
+                {
+                    "book_id": book_id,
+                    "user_id": user_id,
+                    "to_return_at": timezone.now(),
+                }
+                for _, book_id, user_id in borrow_ids[:page_size]
+            ],
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from apis.parsers import FastJSONParser
+    from apis.renderers import FastJSONRenderer, orjson
+
+    seed_rows(args.page_size)
+    parser_context = {"encoding": "utf-8"}
+
+    try:
+        print(f"orjson: {orjson.__version__ if orjson else 'not installed'}")
+        print(f"best of {args.repeat}, payloads/s")
+        print(f"{'':<16} {'':<6} {'drf':>10} {'fast':>10} {'speedup':>8} {'bytes':>8}")
+        for name, payload in payloads(args.page_size):
+            body = JSONRenderer().render(payload)
+            # the payloads must come out the same before timing means anything
+            assert FastJSONRenderer().render(payload) == body, name
+
+            timings = [
+                (
+                    "render",
+                    lambda: JSONRenderer().render(payload),
+                    lambda: FastJSONRenderer().render(payload),
+                ),
+                (
+                    "parse",
+                    lambda: JSONParser().parse(io.BytesIO(body), None, parser_context),
+                    lambda: FastJSONParser().parse(
+                        io.BytesIO(body), None, parser_context
+                    ),
+                ),
+            ]
+            for label, slow, fast in timings:
+                slow_rate = best_rate(slow, 1, args.repeat)
+                fast_rate = best_rate(fast, 1, args.repeat)
+                print(
+                    f"{name:<16} {label:<6} {slow_rate:10.0f} {fast_rate:10.0f} "
+                    f"{fast_rate / slow_rate:7.1f}x {len(body):8d}"
+                )
+    finally:
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
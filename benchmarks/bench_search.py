@@ -0,0 +1,78 @@
+"""
+Book search latency, fts5 index vs an icontains scan.
+
+Seeds books with names drawn from a fixed vocabulary, then times each query
+through search.search_books and through the icontains filter a search would
+otherwise need, a LIKE '%word%' over both name columns that reads every row.
+Terms range from common to absent. A scan that finds a full page early stops
+early, while the index ranks every match, so a word found in a large share of
+the books is the worst case for the index and the best one for the scan.
+
+    python benchmarks/bench_search.py --books 1000000 --repeat 20
+"""
+
+import argparse
+import time
+
+from common import (
+    Timer,
+    format_stats,
+    percentiles,
+    seed_books,
+    setup_django,
+    teardown_django,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Q
+    from apis import search
+    from apis.serializers.rows import book_rows
+    from books.models import Book
+
+    try:
+        with Timer() as timer:
+            seed_books(args.books)
+        print(f"{args.books} books seeded in {timer.elapsed:.1f}s")
+
+        def icontains(q):
+            words = q.split()
+            books = Book.objects.all()
+            for word in words:
+                books = books.filter(
+                    Q(book_name__icontains=word) | Q(author_name__icontains=word)
+                )
+            return list(book_rows.values(books)[: args.limit])
+
+        def fts(q):
+            return search.search_books(q, args.limit, 0)
+
+        queries = [
+            ("common word", "river"),
+            ("two words", "river stone"),
+            ("author", "quill"),
+            ("one book", f"{args.books // 2}"),
+            ("no match", "zeppelin"),
+        ]
+        print(f"{args.repeat} runs per query, first {args.limit} matches")
+        for label, q in queries:
+            for name, function in [("icontains", icontains), ("fts5", fts)]:
+                samples = []
+                for _ in range(args.repeat):
+                    started_at = time.perf_counter()
+                    function(q)
+                    samples.append(time.perf_counter() - started_at)
+                print(format_stats(f"{label} ({name})", percentiles(samples)))
+    finally:
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Rows per second of the ModelSerializers vs the values_list row serializers.
+
+For each model, times serializing a page of rows both ways, once for the
+serializer alone on rows already in memory and once including the query that
+loads them, and checks that both produce the same JSON.
+
+    python benchmarks/bench_serializers.py --rows 1000 --repeat 20
+"""
+
+import argparse
+
+from common import best_rate, seed_rows, setup_django, teardown_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from apis.serializers import rows, serializers
+    from books.models import Book
+    from borrows.models import Borrow
+    from users.models import User
+
+    seed_rows(args.rows)
+    cases = [
+        ("books", Book, serializers.BookSerializer, rows.book_rows),
+        ("users", User, serializers.UserSerializer, rows.user_rows),
+        ("borrows", Borrow, serializers.BorrowSerializer, rows.borrow_rows),
+    ]
+
+    try:
+        print(f"{args.rows} rows, best of {args.repeat}, rows/s")
+        print(f"{'':<8} {'':<16} {'serializer':>12} {'rows':>12} {'speedup':>8}")
+        for name, model, serializer, row_serializer in cases:
+            instances = list(model.objects.all())
+            values = list(row_serializer.values(model.objects.all()))
+
+            # both paths must agree before their speed means anything
+            assert JSONRenderer().render(
+                serializer(instances, many=True).data
+            ) == JSONRenderer().render(row_serializer.serialize(values))
+
+            timings = [
+                (
+                    "serialize only",
+                    lambda: serializer(instances, many=True).data,
+                    lambda: row_serializer.serialize(values),
+                ),
+                (
+                    "query + serialize",
+                    lambda: serializer(model.objects.all(), many=True).data,
+                    lambda: row_serializer.serialize(
+                        row_serializer.values(model.objects.all())
+                    ),
+                ),
+            ]
+            for label, slow, fast in timings:
+                slow_rate = best_rate(slow, args.rows, args.repeat)
+                fast_rate = best_rate(fast, args.rows, args.repeat)
+                print(
+                    f"{name:<8} {label:<16} {slow_rate:12.0f} {fast_rate:12.0f} "
+                    f"{fast_rate / slow_rate:7.1f}x"
+                )
+    finally:
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
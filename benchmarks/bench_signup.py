@@ -0,0 +1,127 @@
+"""
+Signup latency and its effect on concurrent reads.
+
+Reader threads keep fetching a book while signup threads keep creating users.
+Runs once with hashing inline in the request thread, what the sync create_user
+does, and once per pool size with each hash handed to the shared pool the
+async create_user awaits, and prints latency for both kinds of request.
+
+    python benchmarks/bench_signup.py --signup-threads 8 --reader-threads 8
+"""
+
+import argparse
+import itertools
+import threading
+import time
+
+from common import Timer, format_stats, percentiles, setup_django, teardown_django
+
+# unique emails and phone numbers across every run
+signup_numbers = itertools.count()
+
+
+def run(label, duration, signup_threads, reader_threads, book_id):
+    from django.test import Client
+
+    stop = threading.Event()
+    read_samples = []
+    signup_samples = []
+
+    def reader():
+        client = Client()
+        while not stop.is_set():
+            started_at = time.perf_counter()
+            client.get(f"/api/v1/books/{book_id}")
+            read_samples.append(time.perf_counter() - started_at)
+
+    def signup():
+        client = Client()
+        while not stop.is_set():
+            n = next(signup_numbers)
+            started_at = time.perf_counter()
+            client.post(
+                "/api/v1/users",
+                {
+                    "name": f"bench user {n}",
+                    "email": f"user-{n}@bench.example",
+                    "phone_number": f"+{n:013d}",
+                    "password": "benchmark-password",
+                    "membership_paid": False,
+                },
+                content_type="application/json",
+            )
+            signup_samples.append(time.perf_counter() - started_at)
+
+    threads = [threading.Thread(target=reader) for _ in range(reader_threads)]
+    threads += [threading.Thread(target=signup) for _ in range(signup_threads)]
+    with Timer() as timer:
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    print(format_stats(f"{label}: reads", percentiles(read_samples), timer.elapsed))
+    if signup_threads:
+        print(
+            format_stats(
+                f"{label}: signups", percentiles(signup_samples), timer.elapsed
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--signup-threads", type=int, default=8)
+    parser.add_argument("--reader-threads", type=int, default=8)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rounds", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from apis import passwords
+    from books.models import Book
+
+    if args.rounds is not None:
+        settings.BCRYPT_ROUNDS = args.rounds
+    print(f"bcrypt rounds: {settings.BCRYPT_ROUNDS}")
+
+    book = Book.objects.create(
+        book_name="Benchmark", author_name="Bench", category="Science", quantity=5
+    )
+
+    try:
+        run("no signups", args.duration, 0, args.reader_threads, book.id)
+
+        # every request thread hashes on its own
+        run(
+            "inline hashing",
+            args.duration,
+            args.signup_threads,
+            args.reader_threads,
+            book.id,
+        )
+
+        # the request threads wait on the pool, the test client runs no loop
+        passwords.make_password = lambda password: passwords.submit_hash(
+            password
+        ).result()
+        for pool_size in args.pool_sizes:
+            settings.PASSWORD_HASH_WORKERS = pool_size
+            passwords._executor = None
+            run(
+                f"pool of {pool_size}",
+                args.duration,
+                args.signup_threads,
+                args.reader_threads,
+                book.id,
+            )
+    finally:
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Memory and lookup latency of the books/suggest prefix index.
+
+Seeds books, loads the index from them and reports its size, then times
+lookups for prefixes of one to five letters straight on the index and through
+the endpoint, and the incremental add and discard of a single book.
+
+    python benchmarks/bench_suggest.py --books 1000000 --repeat 1000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from common import (
+    WORDS,
+    Timer,
+    format_stats,
+    percentiles,
+    seed_books,
+    setup_django,
+    teardown_django,
+)
+
+
+def timed(function, arguments):
+    samples = []
+    for argument in arguments:
+        started_at = time.perf_counter()
+        function(argument)
+        samples.append(time.perf_counter() - started_at)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from apis import suggest
+
+    try:
+        with Timer() as timer:
+            seed_books(args.books)
+        print(f"{args.books} books seeded in {timer.elapsed:.1f}s")
+
+        with Timer() as timer:
+            suggest.ensure_current()
+        stats = suggest.stats()
+
+        # a second copy under tracemalloc, which slows the load down a lot
+        rows = list(suggest.book_rows())
+        tracemalloc.start()
+        copy = suggest.PrefixIndex()
+        copy.load(rows)
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del copy, rows
+
+        print(
+            f"loaded in {timer.elapsed:.1f}s: {stats['keys']} keys, "
+            f"{stats['bytes'] / 2**20:.1f} MiB estimated, "
+            f"{traced / 2**20:.1f} MiB traced"
+        )
+
+        rng = random.Random(2)
+        client = Client()
+        for length in range(1, 6):
+            prefixes = [rng.choice(WORDS)[:length] for _ in range(args.repeat)]
+            print(
+                format_stats(
+                    f"{length} letters (index)",
+                    timed(
+                        lambda prefix: suggest.index.lookup(prefix, args.limit),
+                        prefixes,
+                    ),
+                )
+            )
+            print(
+                format_stats(
+                    f"{length} letters (endpoint)",
+                    timed(
+                        lambda prefix: client.get(
+                            "/api/v1/books/suggest",
+                            {"prefix": prefix, "limit": args.limit},
+                        ),
+                        prefixes,
+                    ),
+                )
+            )
+
+        names = [(f"bench-{n}", f"Added Book {n}", "New Author") for n in range(100)]
+        print(
+            format_stats(
+                "add one book", timed(lambda book: suggest.index.add([book]), names)
+            )
+        )
+        print(
+            format_stats(
+                "discard one book",
+                timed(suggest.index.discard, [id for id, _, _ in names]),
+            )
+        )
+    finally:
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Write throughput of concurrent borrows and signups under each sqlite setup.
+
+Writer threads keep creating borrows and signing users up through the test
+client, first with sqlite's defaults and a connection per request, then with
+SQLITE_PRAGMAS, then with SQLITE_PRAGMAS and persistent connections. Prints
+latency and throughput of each kind of write and how many failed, e.g. with
+"database is locked".
+
+    python benchmarks/bench_writes.py --borrow-threads 8 --signup-threads 4
+"""
+
+import argparse
+import itertools
+import threading
+import time
+
+from common import Timer, format_stats, percentiles, setup_django, teardown_django
+
+# unique emails and phone numbers across every run
+signup_numbers = itertools.count()
+
+
+def run(label, duration, borrow_threads, signup_threads, book_id, user_ids):
+    from datetime import timedelta
+    from django.db import close_old_connections
+    from django.test import Client
+    from django.utils import timezone
+
+    stop = threading.Event()
+    samples = {"borrows": [], "signups": []}
+    failures = {"borrows": 0, "signups": 0}
+    to_return_at = (timezone.now() + timedelta(days=14)).isoformat()
+
+    def write(kind, request):
+        client = Client()
+        while not stop.is_set():
+            started_at = time.perf_counter()
+            response = request(client)
+            # what a server does at request_finished, the test client skips it
+            close_old_connections()
+            if response.status_code >= 300:
+                failures[kind] += 1
+            else:
+                samples[kind].append(time.perf_counter() - started_at)
+
+    def borrow(client):
+        return client.post(
+            "/api/v1/borrows",
+            {
+                "book_id": str(book_id),
+                "user_id": str(user_ids[next(signup_numbers) % len(user_ids)]),
+                "to_return_at": to_return_at,
+            },
+            content_type="application/json",
+        )
+
+    def signup(client):
+        n = next(signup_numbers)
+        return client.post(
+            "/api/v1/users",
+            {
+                "name": f"bench user {n}",
+                "email": f"user-{n}@bench.example",
+                "phone_number": f"+{n:013d}",
+                "password": "benchmark-password",
+                "membership_paid": False,
+            },
+            content_type="application/json",
+        )
+
+    threads = [
+        threading.Thread(target=write, args=("borrows", borrow))
+        for _ in range(borrow_threads)
+    ]
+    threads += [
+        threading.Thread(target=write, args=("signups", signup))
+        for _ in range(signup_threads)
+    ]
+    with Timer() as timer:
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    for kind, kind_samples in samples.items():
+        print(
+            format_stats(f"{label}: {kind}", percentiles(kind_samples), timer.elapsed)
+            + f" failed={failures[kind]}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--borrow-threads", type=int, default=8)
+    parser.add_argument("--signup-threads", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connections
+    from books.models import Book
+    from users.models import User
+
+    # cheap hashes, so signups wait on the database rather than on bcrypt
+    settings.BCRYPT_ROUNDS = args.rounds
+    tuned_pragmas = settings.SQLITE_PRAGMAS
+
+    book = Book.objects.create(
+        book_name="Benchmark", author_name="Bench", category="Science", quantity=10**9
+    )
+    user_ids = [
+        user.id
+        for user in User.objects.bulk_create(
+            User(
+                name=f"reader {n}",
+                email=f"reader-{n}@bench.example",
+                phone_number=f"+1{n:012d}",
+                password="not-a-hash",
+            )
+            for n in range(100)
+        )
+    ]
+
+    setups = [
+        # journal_mode is kept in the file, go back to the default explicitly
+        ("defaults", {"journal_mode": "delete"}, 0),
+        ("pragmas", tuned_pragmas, 0),
+        ("pragmas, persistent", tuned_pragmas, 600),
+    ]
+    try:
+        for label, pragmas, conn_max_age in setups:
+            settings.SQLITE_PRAGMAS = pragmas
+            connections.settings["default"]["CONN_MAX_AGE"] = conn_max_age
+            # new connections for every setup, the writer threads open their own
+            connections.close_all()
+            run(
+                label,
+                args.duration,
+                args.borrow_threads,
+                args.signup_threads,
+                book.id,
+                user_ids,
+            )
+    finally:
+        settings.SQLITE_PRAGMAS = tuned_pragmas
+        teardown_django()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Shared setup for the scripts in this directory. Each benchmark runs against a
+throwaway migrated sqlite file so it never touches db.sqlite3, run them from
+the repository root, e.g. ``python benchmarks/bench_signup.py``.
+"""
+
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookstore_subscription_apis.settings")
+
+
+def setup_django(database_path=None):
+    import django
+
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ["*"]
+    # 4xx/5xx responses would otherwise be logged for every request
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+    # a file instead of the shared in-memory database so threads get real
+    # sqlite connections with their own locking
+    if database_path is None:
+        database_path = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    connection.settings_dict["TEST"]["NAME"] = str(database_path)
+    connection.creation.create_test_db(verbosity=0, serialize=False)
+    return database_path
+
+
+def teardown_django():
+    from django.db import connection
+
+    connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+def seed_rows(rows):
+    # one book, one user and one borrow of that book by that user per row
+    from django.utils import timezone
+    from books.models import Book
+    from borrows.models import Borrow
+    from users.models import User
+
+    books = Book.objects.bulk_create(
+        Book(
+            book_name=f"Benchmark {n}",
+            author_name="Bench",
+            category="Science",
+            quantity=5,
+        )
+        for n in range(rows)
+    )
+    users = User.objects.bulk_create(
+        User(
+            name=f"reader {n}",
+            email=f"reader-{n}@bench.example",
+            phone_number=f"+1{n:012d}",
+            password="not-a-hash",
+        )
+        for n in range(rows)
+    )
+    Borrow.objects.bulk_create(
+        Borrow(
+            book_id=book,
+            user_id=user,
+            to_return_at=timezone.now() + timedelta(days=14),
+        )
+        for book, user in zip(books, users)
+    )
+
+
+# words and authors of the books from seed_books
+WORDS = (
+    "river stone night garden shadow empire winter silver ocean forest "
+    "crown storm glass paper iron golden broken hidden last secret"
+).split()
+AUTHORS = ["Ada Byron", "Leo Marsh", "Nora Quill", "Omar Reyes", "Ivy Chen"]
+
+
+def seed_books(books, chunk_size=10000):
+    # books named after three random words and a number, the same every run
+    from books.models import Book
+
+    rng = random.Random(1)
+    for start in range(0, books, chunk_size):
+        Book.objects.bulk_create(
+            Book(
+                book_name=" ".join(rng.sample(WORDS, 3)) + f" {n}",
+                author_name=rng.choice(AUTHORS),
+                category="Science",
+            )
+            for n in range(start, min(start + chunk_size, books))
+        )
+
+
+def percentiles(samples):
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": at(0.50) * 1000,
+        "p95_ms": at(0.95) * 1000,
+        "p99_ms": at(0.99) * 1000,
+    }
+
+
+def format_stats(label, stats, elapsed=None):
+    if not stats["n"]:
+        return f"{label:<32} no samples"
+    line = (
+        f"{label:<32} n={stats['n']:<7} mean={stats['mean_ms']:8.2f}ms "
+        f"p50={stats['p50_ms']:8.2f}ms p95={stats['p95_ms']:8.2f}ms "
+        f"p99={stats['p99_ms']:8.2f}ms"
+    )
+    if elapsed:
+        line += f" {stats['n'] / elapsed:9.1f}/s"
+    return line
+
+
+def best_rate(function, rows, repeat):
+    # best of ``repeat`` runs, in rows per second
+    best = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return rows / best
+
+
+class Timer:
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started_at
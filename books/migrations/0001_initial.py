@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:13
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('book_name', models.CharField(max_length=50)),
+                ('author_name', models.CharField(max_length=50)),
+                ('category', models.CharField(choices=[('Non-Fiction', 'Non-Fiction'), ('Science', 'Science'), ('Fantasy', 'Fantasy'), ('History', 'History'), ('Biography', 'Biography'), ('Mystery', 'Mystery'), ('Romance', 'Romance'), ('Thriller', 'Thriller'), ('Horror', 'Horror'), ('Self-Help', 'Self-Help'), ('Health', 'Health'), ('Travel', 'Travel'), ('Children', 'Children'), ('Religion', 'Religion'), ('Science Fiction', 'Science Fiction'), ('Poetry', 'Poetry'), ('Comics', 'Comics'), ('Art', 'Art'), ('Business', 'Business'), ('Cooking', 'Cooking'), ('Education', 'Education'), ('Technology', 'Technology'), ('Sports', 'Sports'), ('Music', 'Music'), ('Drama', 'Drama'), ('Philosophy', 'Philosophy'), ('Psychology', 'Psychology'), ('Politics', 'Politics'), ('Adventure', 'Adventure'), ('Anthology', 'Anthology'), ('Dystopian', 'Dystopian'), ('Young Adult', 'Young Adult'), ('Classic', 'Classic'), ('Memoir', 'Memoir'), ('True Crime', 'True Crime'), ('Parenting', 'Parenting'), ('Spirituality', 'Spirituality'), ('Environmental', 'Environmental'), ('Crafts', 'Crafts'), ('Short Stories', 'Short Stories'), ('Graphic Novels', 'Graphic Novels')], max_length=30)),
+                ('quantity', models.IntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
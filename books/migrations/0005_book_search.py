@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:20
+
+from django.db import migrations
+
+# an external content fts5 index over the book and author names. it stores no
+# copy of the text, rows are read back from books_book by rowid, and the
+# triggers keep it in step with every insert, delete and name change made
+# through the orm, bulk_create or plain sql. VACUUM may renumber the rowids of
+# books_book, run rebuild_book_search after one. a later migration that
+# rebuilds books_book, as an AlterField on sqlite does, drops the triggers and
+# renumbers the rowids: `manage.py check --database default` then reports
+# apis.E002, and rebuild_book_search creates the triggers again from
+# apis/search.py and reindexes. keep those in step with the ones below
+
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE books_book_fts USING fts5(
+        book_name,
+        author_name,
+        content='books_book',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    # a word in the book name counts for more than one in the author name
+    """
+    INSERT INTO books_book_fts(books_book_fts, rank)
+    VALUES('rank', 'bm25(10.0, 5.0)')
+    """,
+    """
+    CREATE TRIGGER books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, book_name, author_name)
+        VALUES (new.rowid, new.book_name, new.author_name);
+    END
+    """,
+    """
+    CREATE TRIGGER books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, book_name, author_name)
+        VALUES ('delete', old.rowid, old.book_name, old.author_name);
+    END
+    """,
+    # quantity and counter updates leave the index alone
+    """
+    CREATE TRIGGER books_book_fts_update
+    AFTER UPDATE OF book_name, author_name ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, book_name, author_name)
+        VALUES ('delete', old.rowid, old.book_name, old.author_name);
+        INSERT INTO books_book_fts(rowid, book_name, author_name)
+        VALUES (new.rowid, new.book_name, new.author_name);
+    END
+    """,
+    # index the books written before the table existed
+    "INSERT INTO books_book_fts(books_book_fts) VALUES('rebuild')",
+]
+
+DROP_INDEX = [
+    "DROP TRIGGER books_book_fts_update",
+    "DROP TRIGGER books_book_fts_delete",
+    "DROP TRIGGER books_book_fts_insert",
+    "DROP TABLE books_book_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0004_borrow_counters"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
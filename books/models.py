@@ -57,6 +57,30 @@ class Book(models.Model):
     category = models.CharField(max_length=30, choices=BOOK_CATEGORIES)
     quantity = models.IntegerField(default=1)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # borrows of the book, kept by apis/counters.py with every borrow change
+    active_borrow_count = models.IntegerField(default=0)
+    total_borrow_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # duplicate name check on create
+            models.Index(fields=["book_name"], name="book_name_idx"),
+            # get_books filters, trailing (created_at, id) serves cursor paging
+            models.Index(
+                fields=["category", "author_name", "created_at", "id"],
+                name="book_category_author_idx",
+            ),
+            models.Index(
+                fields=["category", "created_at", "id"], name="book_category_idx"
+            ),
+            models.Index(
+                fields=["author_name", "created_at", "id"], name="book_author_idx"
+            ),
+            models.Index(fields=["created_at", "id"], name="book_created_idx"),
+            # books changed since the last poll of apis/suggest.py
+            models.Index(fields=["updated_at"], name="book_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.book_name} by {self.author_name}"
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bookstore_subscription_apis.settings')
+# no persistent database connections under ASGI, see DATABASES in settings.py
+os.environ.setdefault('CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
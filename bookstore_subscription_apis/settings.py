@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,7 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the middleware as well
+    "apis.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "apis.replicas.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -81,9 +85,109 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # keep the connection of each thread open between requests instead of
+        # reconnecting and running SQLITE_PRAGMAS again for every request.
+        # django's docs say to turn persistent connections off under ASGI,
+        # where they are not closed reliably, so asgi.py makes CONN_MAX_AGE
+        # default to 0 there. CONN_MAX_AGE in the environment overrides both
+        "CONN_MAX_AGE": int(os.environ.get("CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# read replicas, GET requests read from these aliases and every other query
+# goes to default, see apis/replicas.py. locally SQLITE_REPLICA names a second
+# sqlite file standing in for one, `manage.py copy_to_replicas` copies default
+# over it in place of replication
+SQLITE_REPLICA = os.environ.get("SQLITE_REPLICA")
+
+if SQLITE_REPLICA:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": SQLITE_REPLICA,
+        # tests read their test database through it
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = ["replica"] if SQLITE_REPLICA else []
+
+DATABASE_ROUTERS = ["apis.replicas.ReplicaRouter"]
+
+# seconds a client keeps reading from default after one of its requests wrote,
+# enough for the replicas to catch up
+REPLICA_PIN_SECONDS = 5
+
+# cache alias shared by every worker process where writes are noted, so none of
+# them caches rows a lagging replica read right after a write
+REPLICA_CACHE_ALIAS = "default"
+
+# PRAGMAs run on every new sqlite connection by apis/database.py
+SQLITE_PRAGMAS = {
+    # readers and the writer stop blocking each other, kept in the file
+    "journal_mode": "wal",
+    # sync at checkpoints rather than every commit, still safe in wal mode
+    "synchronous": "normal",
+    # wait up to 5 seconds for a lock before "database is locked"
+    "busy_timeout": 5000,
+    # read the file through a 256 MiB memory map
+    "mmap_size": 268435456,
+    # 64 MiB page cache, negative sizes are in KiB
+    "cache_size": -65536,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# the object and response caches, and the books generation with them, must be
+# shared by every worker process, or a write in one process leaves the others
+# serving the old stock until their entries expire. REDIS_URL points them at
+# redis, without it they fall back to a locmem cache that only suits a single
+# process, which `manage.py check --deploy` reports, see apis/checks.py
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# cache alias and lifetime in seconds of the detail lookup cache
+OBJECT_CACHE_ALIAS = "default"
+
+OBJECT_CACHE_TIMEOUT = 60
+
+# cache alias and lifetime in seconds of cached list responses, entries are
+# versioned so the timeout only bounds memory use
+RESPONSE_CACHE_ALIAS = "default"
+
+RESPONSE_CACHE_TIMEOUT = 300
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # json through orjson when it is installed, the stdlib module otherwise
+    "DEFAULT_RENDERER_CLASSES": [
+        "apis.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apis.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -125,3 +229,30 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Password hashing
+# bcrypt cost factor, and threads shared by async signups so hashing cannot
+# take every core away from other requests
+
+BCRYPT_ROUNDS = 12
+
+PASSWORD_HASH_WORKERS = 2
+
+# worker processes hashing passwords in bulk user imports, one pool shared by
+# every import of a process, None uses every cpu
+
+USER_IMPORT_WORKERS = None
+
+# Book suggestions
+# seconds between two polls of a worker process for the book writes of the
+# others, which its in-process suggest index only sees that way
+
+SUGGEST_REFRESH_SECONDS = 5
+
+# Metrics
+# addresses and networks allowed to read /metrics besides staff users, matched
+# against REMOTE_ADDR, which behind a proxy is the proxy's address. a comma
+# separated METRICS_ALLOWED_IPS replaces the loopback default
+
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
@@ -18,4 +18,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-urlpatterns = [path("admin/", admin.site.urls), path("api/v1/", include("apis.urls"))]
+from apis import metrics
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    # native async views, serve them through asgi.py
+    path("api/v1/async/", include("apis.async_urls")),
+    path("api/v1/", include("apis.urls")),
+    # request, cache and validation metrics in the prometheus text format
+    path("metrics", metrics.metrics_view),
+]
@@ -6,3 +6,5 @@ from . import models
 admin.site.register(
     models.Borrow,
 )
+admin.site.register(models.OverdueBorrow)
+admin.site.register(models.OverdueScan)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrows', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['book_id', 'borrowed_at', 'id'], name='borrow_book_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['user_id', 'borrowed_at', 'id'], name='borrow_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_returned', True)), fields=['borrowed_at', 'id'], name='borrow_returned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['borrowed_at', 'id'], name='borrow_borrowed_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    # rows written before the field existed were last changed at creation
+    Borrow = apps.get_model("borrows", "Borrow")
+    Borrow.objects.update(updated_at=models.F("borrowed_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrows', '0002_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrow',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
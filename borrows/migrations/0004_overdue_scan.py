@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrows", "0003_borrow_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OverdueBorrow",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("due_at", models.DateTimeField()),
+                (
+                    "detected_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OverdueScan",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("last_due_at", models.DateTimeField(null=True)),
+                ("last_borrow_id", models.UUIDField(null=True)),
+                ("scanned_at", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                condition=models.Q(("is_returned", False)),
+                fields=["to_return_at", "id"],
+                name="borrow_due_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="overdueborrow",
+            name="borrow_id",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE, to="borrows.borrow"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrows", "0004_overdue_scan"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrow",
+            index=models.Index(
+                condition=models.Q(("is_returned", False)),
+                fields=["updated_at", "id"],
+                name="borrow_open_changed_idx",
+            ),
+        ),
+    ]
@@ -13,6 +13,62 @@ class Borrow(models.Model):
     is_returned = models.BooleanField(default=False)
     borrowed_at = models.DateTimeField(default=timezone.now)
     to_return_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # get_borrows filters, trailing (borrowed_at, id) serves cursor paging
+            models.Index(
+                fields=["book_id", "borrowed_at", "id"], name="borrow_book_idx"
+            ),
+            models.Index(
+                fields=["user_id", "borrowed_at", "id"], name="borrow_user_idx"
+            ),
+            # is_returned=True compiles to a bare "is_returned" predicate, which
+            # only a partial index with the same condition can serve
+            models.Index(
+                fields=["borrowed_at", "id"],
+                condition=models.Q(is_returned=True),
+                name="borrow_returned_idx",
+            ),
+            models.Index(fields=["borrowed_at", "id"], name="borrow_borrowed_idx"),
+            # the overdue scan walks open borrows in due order, the condition
+            # matches the "NOT is_returned" predicate is_returned=False compiles to
+            models.Index(
+                fields=["to_return_at", "id"],
+                condition=models.Q(is_returned=False),
+                name="borrow_due_idx",
+            ),
+            # its second pass, open borrows changed since the last run
+            models.Index(
+                fields=["updated_at", "id"],
+                condition=models.Q(is_returned=False),
+                name="borrow_open_changed_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.to_return_at.isoformat()
+
+
+class OverdueBorrow(models.Model):
+    # a borrow found still out past to_return_at by the overdue scan
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    borrow_id = models.OneToOneField(Borrow, on_delete=models.CASCADE)
+    due_at = models.DateTimeField()
+    detected_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.due_at.isoformat()
+
+
+class OverdueScan(models.Model):
+    # how far the overdue scan has got, the (to_return_at, id) key of the last
+    # borrow it checked, so the next run starts right after it
+    name = models.CharField(max_length=50, primary_key=True)
+    last_due_at = models.DateTimeField(null=True)
+    last_borrow_id = models.UUIDField(null=True)
+    scanned_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:49
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_borrow_counters(apps, schema_editor):
+    # count the borrows written before the counters existed
+    User = apps.get_model("users", "User")
+    Borrow = apps.get_model("borrows", "Borrow")
+
+    def counted(**filters):
+        return Coalesce(
+            models.Subquery(
+                Borrow.objects.filter(user_id=models.OuterRef("id"), **filters)
+                .values("user_id")
+                .annotate(count=models.Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+
+    User.objects.update(
+        active_borrow_count=counted(is_returned=False),
+        total_borrow_count=counted(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_user_updated_at"),
+        ("borrows", "0004_overdue_scan"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="active_borrow_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="total_borrow_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_borrow_counters, migrations.RunPython.noop),
+    ]
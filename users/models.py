@@ -18,6 +18,24 @@ class User(models.Model):
         max_length=300,
     )
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # borrows of the user, kept by apis/counters.py with every borrow change
+    active_borrow_count = models.IntegerField(default=0)
+    total_borrow_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # duplicate phone number check on create and update
+            models.Index(fields=["phone_number"], name="user_phone_idx"),
+            # get_users created_at ordering, and the unpaid_member filter which
+            # sqlite compiles to "NOT membership_paid" so it needs a partial index
+            models.Index(fields=["created_at", "id"], name="user_created_idx"),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(membership_paid=False),
+                name="user_unpaid_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name